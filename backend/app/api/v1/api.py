@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.v1.endpoints import violations, cameras, analytics, auth, upload
+from app.api.v1.endpoints import violations, cameras, analytics, auth, upload, pipeline
 
 api_router = APIRouter()
 
@@ -8,4 +8,5 @@ api_router.include_router(auth.router, prefix="/auth", tags=["Authentication"])
 api_router.include_router(violations.router, prefix="/violations", tags=["Violations"])
 api_router.include_router(cameras.router, prefix="/cameras", tags=["Cameras"])
 api_router.include_router(analytics.router, prefix="/analytics", tags=["Analytics"])
-api_router.include_router(upload.router, prefix="/upload", tags=["File Upload"])
\ No newline at end of file
+api_router.include_router(upload.router, prefix="/upload", tags=["File Upload"])
+api_router.include_router(pipeline.router, prefix="/pipeline", tags=["Detection Pipeline"])
\ No newline at end of file
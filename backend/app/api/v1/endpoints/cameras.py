@@ -9,10 +9,11 @@ from app.core.database import get_db
 from app.models.camera import Camera, CameraStatus, CameraType
 from app.schemas.camera import (
     CameraCreate, CameraUpdate, CameraResponse, 
-    CameraFilter, CameraStats, CameraBatch
+    CameraFilter, CameraStats, CameraBatch, CameraDetectionZones
 )
 from app.core.auth import get_current_active_user, get_current_admin_user
 from app.models.user import User
+from app.services.violation_detection import ViolationDetectionService, get_violation_detector
 
 router = APIRouter()
 
@@ -180,7 +181,8 @@ async def get_camera(
 async def create_camera(
     camera: CameraCreate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    current_user: User = Depends(get_current_admin_user),
+    detector: ViolationDetectionService = Depends(get_violation_detector)
 ):
     """
     Create a new camera (admin only)
@@ -204,6 +206,9 @@ async def create_camera(
         await db.commit()
         await db.refresh(db_camera)
         
+        if db_camera.detection_zones:
+            detector.set_camera_zones(str(db_camera.id), db_camera.detection_zones)
+        
         return db_camera
         
     except HTTPException:
@@ -220,7 +225,8 @@ async def update_camera(
     camera_id: str = Path(..., description="Camera ID"),
     camera_update: CameraUpdate = ...,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    current_user: User = Depends(get_current_admin_user),
+    detector: ViolationDetectionService = Depends(get_violation_detector)
 ):
     """
     Update an existing camera (admin only)
@@ -245,6 +251,9 @@ async def update_camera(
         await db.commit()
         await db.refresh(db_camera)
         
+        if "detection_zones" in update_data:
+            detector.set_camera_zones(str(db_camera.id), db_camera.detection_zones)
+        
         return db_camera
         
     except ValueError:
@@ -265,7 +274,8 @@ async def update_camera(
 async def delete_camera(
     camera_id: str = Path(..., description="Camera ID"),
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    current_user: User = Depends(get_current_admin_user),
+    detector: ViolationDetectionService = Depends(get_violation_detector)
 ):
     """
     Delete a camera (admin only)
@@ -282,9 +292,12 @@ async def delete_camera(
                 detail="Camera not found"
             )
         
+        deleted_id = str(db_camera.id)
         await db.delete(db_camera)
         await db.commit()
         
+        detector.set_camera_zones(deleted_id, None)
+        
     except ValueError:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -297,6 +310,88 @@ async def delete_camera(
             detail=f"Error deleting camera: {str(e)}"
         )
 
+@router.get("/{camera_id}/detection-zones", response_model=CameraDetectionZones)
+async def get_detection_zones(
+    camera_id: str = Path(..., description="Camera ID"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Get the detection zones (regions of interest) of a camera
+    """
+    try:
+        query = select(Camera).where(Camera.id == uuid.UUID(camera_id))
+        result = await db.execute(query)
+        camera = result.scalar_one_or_none()
+        
+        if not camera:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Camera not found"
+            )
+        
+        return CameraDetectionZones(detection_zones=camera.detection_zones or [])
+    
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid camera ID format"
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error retrieving detection zones: {str(e)}"
+        )
+
+@router.put("/{camera_id}/detection-zones", response_model=CameraDetectionZones)
+async def update_detection_zones(
+    camera_id: str = Path(..., description="Camera ID"),
+    zones: CameraDetectionZones = ...,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user),
+    detector: ViolationDetectionService = Depends(get_violation_detector)
+):
+    """
+    Replace the detection zones of a camera (admin only)
+    
+    Frames from the camera are cropped to the zones before AI analysis and motion
+    is only looked for inside them. An empty list analyzes the full frame.
+    """
+    try:
+        query = select(Camera).where(Camera.id == uuid.UUID(camera_id))
+        result = await db.execute(query)
+        camera = result.scalar_one_or_none()
+        
+        if not camera:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Camera not found"
+            )
+        
+        detection_zones = [zone.dict() for zone in zones.detection_zones]
+        camera.detection_zones = detection_zones
+        await db.commit()
+        
+        detector.set_camera_zones(str(camera.id), detection_zones)
+        
+        return CameraDetectionZones(detection_zones=detection_zones)
+    
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid camera ID format"
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error updating detection zones: {str(e)}"
+        )
+
 @router.post("/{camera_id}/test-connection")
 async def test_camera_connection(
     camera_id: str = Path(..., description="Camera ID"),
@@ -0,0 +1,25 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Dict, Any
+
+from app.core.auth import get_current_active_user
+from app.models.user import User
+from app.services.violation_detection import ViolationDetectionService, get_violation_detector
+
+router = APIRouter()
+
+@router.get("/stats", response_model=Dict[str, Any])
+async def get_pipeline_stats(
+    current_user: User = Depends(get_current_active_user),
+    detector: ViolationDetectionService = Depends(get_violation_detector)
+):
+    """
+    Get runtime statistics of the AI detection pipeline
+    """
+    try:
+        return detector.get_stats()
+    
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error retrieving pipeline stats: {str(e)}"
+        )
\ No newline at end of file
@@ -13,7 +13,7 @@ from app.core.database import get_db
 from app.core.config import settings
 from app.core.auth import get_current_active_user
 from app.models.user import User
-from app.services.violation_detection import ViolationDetectionService
+from app.services.violation_detection import ViolationDetectionService, get_violation_detector
 
 router = APIRouter()
 
@@ -23,8 +23,11 @@ async def upload_image(
     camera_id: Optional[str] = Form(None, description="Camera ID"),
     location: Optional[str] = Form(None, description="Location"),
     analyze: bool = Form(False, description="Run AI analysis on upload"),
+    deadline: Optional[float] = Form(None, ge=0, description="AI analysis time budget in seconds (0 for none)"),
+    include_raw: bool = Form(False, description="Include the raw Llama/GPT-4o responses"),
     current_user: User = Depends(get_current_active_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    detector: ViolationDetectionService = Depends(get_violation_detector)
 ):
     """
     Upload an image file and optionally run AI analysis
@@ -75,13 +78,13 @@ async def upload_image(
         # Run AI analysis if requested
         if analyze and camera_id and location:
             try:
-                async with ViolationDetectionService() as detector:
-                    analysis_results = await detector.process_frame(
-                        frame_data=file_content,
-                        camera_id=camera_id,
-                        location=location
-                    )
-                response_data["ai_analysis"] = analysis_results
+                analysis_results = await detector.process_frame(
+                    frame_data=file_content,
+                    camera_id=camera_id,
+                    location=location,
+                    deadline=deadline
+                )
+                response_data["ai_analysis"] = analysis_results.to_dict(include_raw=include_raw)
             except Exception as e:
                 response_data["analysis_error"] = f"AI analysis failed: {str(e)}"
         
@@ -323,7 +326,10 @@ async def analyze_uploaded_image(
     filename: str,
     camera_id: str,
     location: str,
-    current_user: User = Depends(get_current_active_user)
+    deadline: Optional[float] = Query(None, ge=0, description="AI analysis time budget in seconds (0 for none)"),
+    include_raw: bool = Query(False, description="Include the raw Llama/GPT-4o responses"),
+    current_user: User = Depends(get_current_active_user),
+    detector: ViolationDetectionService = Depends(get_violation_detector)
 ):
     """
     Analyze a previously uploaded image
@@ -349,14 +355,14 @@ async def analyze_uploaded_image(
             file_content = await f.read()
         
         # Run AI analysis
-        async with ViolationDetectionService() as detector:
-            results = await detector.process_frame(
-                frame_data=file_content,
-                camera_id=camera_id,
-                location=location
-            )
+        results = await detector.process_frame(
+            frame_data=file_content,
+            camera_id=camera_id,
+            location=location,
+            deadline=deadline
+        )
         
-        return results
+        return results.to_dict(include_raw=include_raw)
         
     except HTTPException:
         raise
@@ -12,7 +12,7 @@ from app.schemas.violation import (
     ViolationCreate, ViolationUpdate, ViolationResponse, 
     ViolationFilter, ViolationBatch, ViolationStats
 )
-from app.services.violation_detection import ViolationDetectionService
+from app.services.violation_detection import ViolationDetectionService, get_violation_detector
 from app.core.auth import get_current_active_user
 from app.models.user import User
 
@@ -380,7 +380,10 @@ async def analyze_frame(
     frame_data: bytes,
     location: str,
     camera_type: str = "general",
-    current_user: User = Depends(get_current_active_user)
+    deadline: Optional[float] = Query(None, ge=0, description="Time budget in seconds (0 for none)"),
+    include_raw: bool = Query(False, description="Include the raw Llama/GPT-4o responses"),
+    current_user: User = Depends(get_current_active_user),
+    detector: ViolationDetectionService = Depends(get_violation_detector)
 ):
     """
     Analyze a single frame for violations using AI
@@ -392,15 +395,15 @@ async def analyze_frame(
                 detail="Insufficient permissions to analyze violations"
             )
         
-        async with ViolationDetectionService() as detector:
-            results = await detector.process_frame(
-                frame_data=frame_data,
-                camera_id=camera_id,
-                location=location,
-                camera_type=camera_type
-            )
+        results = await detector.process_frame(
+            frame_data=frame_data,
+            camera_id=camera_id,
+            location=location,
+            camera_type=camera_type,
+            deadline=deadline
+        )
         
-        return results
+        return results.to_dict(include_raw=include_raw)
         
     except Exception as e:
         raise HTTPException(
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List, Optional
+from typing import Dict, List, Optional
 import os
 from pathlib import Path
 
@@ -34,9 +34,29 @@ class Settings(BaseSettings):
     
     # AI API Configuration
     OPENAI_API_KEY: Optional[str] = None
+    OPENAI_API_URL: str = "https://api.openai.com/v1"
     LLAMA_API_KEY: Optional[str] = None
     LLAMA_API_URL: str = "https://api.groq.com/openai/v1"
     
+    # AI HTTP Client Pooling
+    AI_HTTP_MAX_CONNECTIONS: int = 20
+    AI_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    AI_HTTP_KEEPALIVE_EXPIRY: float = 120.0
+    AI_HTTP_CONNECT_TIMEOUT: float = 10.0
+    AI_HTTP2_ENABLED: bool = False  # Requires the optional 'h2' package
+    
+    # AI Image Preprocessing
+    AI_IMAGE_FORMAT: str = "jpeg"  # jpeg or webp
+    AI_IMAGE_QUALITY: int = 85
+    LLAMA_IMAGE_MAX_DIMENSION: int = 1280
+    LLAMA_IMAGE_MAX_BYTES: int = 1024 * 1024  # 1MB
+    LLAMA_IMAGE_DETAIL: str = "high"
+    GPT4O_IMAGE_MAX_DIMENSION: int = 2048
+    GPT4O_IMAGE_MAX_BYTES: int = 2 * 1024 * 1024  # 2MB
+    GPT4O_IMAGE_DETAIL: str = "high"
+    SCENE_CONTEXT_IMAGE_MAX_DIMENSION: int = 512  # conditions need no detail, "low" is a flat token cost
+    SCENE_CONTEXT_IMAGE_DETAIL: str = "low"
+    
     # File Upload
     MAX_UPLOAD_SIZE: int = 10 * 1024 * 1024  # 10MB
     UPLOAD_FOLDER: str = "./uploads"
@@ -64,8 +84,115 @@ class Settings(BaseSettings):
     
     # AI Processing
     VIOLATION_DETECTION_THRESHOLD: float = 0.8
-    BATCH_PROCESSING_SIZE: int = 10
-    AI_PROCESSING_TIMEOUT: int = 30
+    BATCH_PROCESSING_SIZE: int = 10  # Initial batch concurrency, adjusted at runtime (AIMD)
+    BATCH_MIN_CONCURRENCY: int = 1
+    BATCH_MAX_CONCURRENCY: int = 32
+    BATCH_TARGET_LATENCY_SECONDS: float = 10.0
+    BATCH_MAX_RETRIES: int = 2
+    AI_PROCESSING_TIMEOUT: float = 30  # Per-frame deadline in seconds across all stages, 0 disables
+    SPECULATIVE_REPORT_GENERATION: bool = True  # Start reports alongside GPT-4o verification
+    AI_STREAMING_ENABLED: bool = True  # Stream Llama completions, verify as soon as violations arrive
+    MOSAIC_BATCHING_ENABLED: bool = False  # Tile frames into one Llama request (screening accuracy trade-off)
+    MOSAIC_TILES: int = 4  # frames per request, laid out in a square-ish grid
+    MOSAIC_MAX_WAIT_MS: int = 200  # send a partial mosaic once its oldest frame waited this long
+    MOSAIC_TILE_SIZE: int = 512  # longest side of a frame in the grid
+    ANALYSIS_COALESCING_ENABLED: bool = True  # Concurrent identical frames share one AI analysis
+    
+    # Escalation Policy (GPT-4o verification of uncertain detections only)
+    ESCALATION_POLICY_ENABLED: bool = True  # Only verify detections between the drop and accept bounds
+    VERIFICATION_AUTO_ACCEPT_THRESHOLD: float = 0.95
+    ESCALATION_TYPE_THRESHOLDS: Dict[str, Dict[str, float]] = {}  # e.g. {"red_light": {"drop": 0.7, "accept": 0.9}}
+    
+    # Violation Event Tracking
+    VIOLATION_TRACKING_ENABLED: bool = True  # Merge a camera's repeated detections of one violation into one event
+    VIOLATION_TRACKING_WINDOW_SECONDS: float = 10.0  # an event closes when not seen for this long
+    VIOLATION_TRACKING_MAX_DISTANCE: float = 1.5  # box diagonals a vehicle without a readable plate may move between frames
+    
+    # Scene Context (GPT-4o scene conditions reused across a camera's frames)
+    SCENE_CONTEXT_ENABLED: bool = True  # Analyze each camera's scene conditions once and reuse them in prompts
+    SCENE_CONTEXT_TTL_SECONDS: float = 1800.0  # re-analyze a camera's scene after this long
+    SCENE_CONTEXT_MIN_REFRESH_SECONDS: float = 60.0  # at most one scene analysis per camera in this time
+    SCENE_CONTEXT_CHANGE_TRIGGER: bool = True  # also re-analyze when the frame's brightness or histogram shifts
+    SCENE_CONTEXT_BRIGHTNESS_DELTA: float = 30.0  # change of the mean gray level (0-255)
+    SCENE_CONTEXT_HISTOGRAM_DISTANCE: float = 0.3  # Bhattacharyya distance of the gray-level histograms
+    SCENE_CONTEXT_CHANGE_FRAMES: int = 5  # consecutive changed frames, so passing vehicles do not count
+    
+    # Background Report Generation
+    BACKGROUND_REPORT_GENERATION: bool = True  # Answer frames before the GPT-4o report is ready
+    REPORT_WORKERS: int = 2
+    REPORT_QUEUE_SIZE: int = 100
+    REPORT_SHUTDOWN_TIMEOUT_SECONDS: int = 30
+    
+    # Violation Sink
+    VIOLATION_SINK_ENABLED: bool = True  # Store detected violations in batched bulk inserts
+    VIOLATION_SINK_BATCH_SIZE: int = 100  # rows per insert transaction
+    VIOLATION_SINK_FLUSH_INTERVAL_MS: int = 500  # write a partial batch once its oldest row waited this long
+    VIOLATION_SINK_MAX_PENDING: int = 5000  # buffered rows before new violations are dropped
+    
+    # Image Worker Pool (decode, resize, encode off the event loop)
+    IMAGE_WORKER_POOL_ENABLED: bool = True
+    IMAGE_WORKERS: int = 0  # 0 = one per CPU, up to 8
+    IMAGE_WORK_QUEUE_SIZE: int = 64  # jobs waiting for a worker before callers are held back
+    IMAGE_WORK_BYTES_PER_SECOND: float = 20 * 1024 * 1024  # size-aware ordering: 1MB ~ 50ms later start
+    
+    # Detection Result Cache
+    DETECTION_CACHE_ENABLED: bool = True
+    DETECTION_CACHE_MAX_ENTRIES: int = 1024
+    DETECTION_CACHE_TTL_SECONDS: int = 3600
+    DETECTION_CACHE_DISK_DIR: Optional[str] = None  # e.g. ./cache/detections
+    
+    # Near-Duplicate Frame Suppression
+    FRAME_DEDUP_ENABLED: bool = True
+    FRAME_DEDUP_HASH_SIZE: int = 16  # dHash grid, 256 bits so a vehicle entering changes several
+    FRAME_DEDUP_MAX_HAMMING_DISTANCE: int = 2  # out of FRAME_DEDUP_HASH_SIZE ** 2 bits
+    FRAME_DEDUP_WINDOW_SIZE: int = 8
+    FRAME_DEDUP_MAX_AGE_SECONDS: int = 10
+    
+    # Motion Gating
+    MOTION_GATE_ENABLED: bool = True
+    MOTION_GATE_PIXEL_THRESHOLD: int = 25  # grayscale difference per pixel
+    MOTION_GATE_MIN_MOTION_RATIO: float = 0.005  # fraction of ROI pixels that changed
+    MOTION_GATE_LEARNING_RATE: float = 0.05
+    MOTION_GATE_ANALYSIS_WIDTH: int = 320
+    MOTION_GATE_MAX_SKIP_SECONDS: int = 60
+    
+    # Local Detector Cascade
+    LOCAL_DETECTOR_BACKEND: str = "none"  # none, opencv_dnn or stub
+    LOCAL_DETECTOR_MODEL_PATH: Optional[str] = None  # YOLOv5/YOLOv8 ONNX export
+    LOCAL_DETECTOR_INPUT_SIZE: int = 640
+    LOCAL_DETECTOR_SCORE_THRESHOLD: float = 0.4
+    LOCAL_DETECTOR_NMS_THRESHOLD: float = 0.45
+    LOCAL_DETECTOR_RELEVANT_CLASSES: List[str] = ["person", "bicycle", "car", "motorcycle", "bus", "truck"]
+    LOCAL_DETECTOR_CONTEXT_CLASSES: List[str] = ["traffic light", "stop sign"]  # kept in crops, never escalate a frame
+    LOCAL_DETECTOR_CROP_ENABLED: bool = False  # crops can cut off stop lines and lane markings
+    LOCAL_DETECTOR_CROP_PADDING: float = 0.15  # fraction of the detections' extent
+    LOCAL_DETECTOR_MAX_CROP_RATIO: float = 0.6  # send the full frame above this share of its area
+    
+    # Camera Regions of Interest (cameras' detection_zones)
+    ROI_ENABLED: bool = True
+    ROI_MASK_OUTSIDE: bool = True  # blank pixels outside the zones, not just crop to their bounds
+    ROI_MIN_AREA_SAVINGS: float = 0.1  # unmasked crops must drop at least this share of the frame
+    
+    # Provider Resilience
+    CIRCUIT_BREAKER_ENABLED: bool = True
+    CIRCUIT_BREAKER_WINDOW_SIZE: int = 20  # most recent calls per endpoint
+    CIRCUIT_BREAKER_MIN_CALLS: int = 10
+    CIRCUIT_BREAKER_FAILURE_RATE: float = 0.5  # 5xx, timeouts and connection errors
+    CIRCUIT_BREAKER_SLOW_CALL_SECONDS: float = 20.0
+    CIRCUIT_BREAKER_SLOW_CALL_RATE: float = 0.8
+    CIRCUIT_BREAKER_OPEN_SECONDS: float = 30.0
+    CIRCUIT_BREAKER_HALF_OPEN_PROBES: int = 2
+    HEDGED_REQUESTS_ENABLED: bool = False  # needs a secondary URL or key below
+    HEDGE_MIN_DELAY_SECONDS: float = 1.0
+    HEDGE_INITIAL_DELAY_SECONDS: float = 5.0  # until the primary has enough samples for a p95
+    LLAMA_SECONDARY_API_URL: Optional[str] = None
+    LLAMA_SECONDARY_API_KEY: Optional[str] = None
+    OPENAI_SECONDARY_API_URL: Optional[str] = None
+    OPENAI_SECONDARY_API_KEY: Optional[str] = None
+    
+    # Pipeline Metrics (Prometheus, served at /metrics)
+    METRICS_ENABLED: bool = True
+    METRICS_PER_CAMERA_LABELS: bool = True  # disable for large fleets to bound label cardinality
     
     # WebSocket
     WS_HEARTBEAT_INTERVAL: int = 30
@@ -1,4 +1,4 @@
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.staticfiles import StaticFiles
@@ -6,6 +6,7 @@ from contextlib import asynccontextmanager
 import os
 from dotenv import load_dotenv
 from loguru import logger
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
 from app.core.config import settings
 from app.api.v1.api import api_router
@@ -14,6 +15,8 @@ from app.middleware.rate_limit import RateLimitMiddleware
 from app.middleware.logging import LoggingMiddleware
 from app.websocket.manager import WebSocketManager
 from app.websocket.endpoints import router as websocket_router
+from app.services.violation_detection import ViolationDetectionService
+from app.services.image_workers import image_workers
 
 # Load environment variables
 load_dotenv()
@@ -34,12 +37,22 @@ async def lifespan(app: FastAPI):
     # Initialize WebSocket manager
     await websocket_manager.initialize()
     
+    # Create the shared detection service (pooled AI provider connections)
+    app.state.violation_detector = ViolationDetectionService()
+    try:
+        zoned = await app.state.violation_detector.load_camera_zones()
+        logger.info(f"Loaded detection zones of {zoned} cameras")
+    except Exception as e:
+        logger.warning(f"Could not load camera detection zones, analyzing full frames: {str(e)}")
+    
     logger.info("Backend startup complete")
     
     yield
     
     # Shutdown
     logger.info("Shutting down backend...")
+    await app.state.violation_detector.close()
+    image_workers.shutdown()
     await websocket_manager.cleanup()
     logger.info("Backend shutdown complete")
 
@@ -113,6 +126,11 @@ async def health_check():
         "version": "1.0.0"
     }
 
+@app.get("/metrics", tags=["Health"], include_in_schema=False)
+async def metrics():
+    """Prometheus metrics: pipeline stage latencies, token usage and payload sizes"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
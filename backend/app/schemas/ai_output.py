@@ -0,0 +1,218 @@
+from pydantic import BaseModel, validator
+from typing import Optional, Dict, Any, List
+
+def _to_text(v):
+    return None if v is None else str(v)
+
+def _to_confidence(v):
+    try:
+        value = float(str(v).strip().rstrip('%'))
+    except (TypeError, ValueError):
+        return 0.0
+    
+    # Some answers use percentages
+    if 1.0 < value <= 100.0:
+        value /= 100.0
+    return min(1.0, max(0.0, value))
+
+def _to_section(v):
+    """Sections are expected to be objects; wrap anything else instead of failing the whole answer"""
+    if v is None or isinstance(v, dict):
+        return v
+    return {"summary": v}
+
+class DetectedViolation(BaseModel):
+    """Violation as reported by a vision model"""
+    type: Optional[str] = None
+    severity: Optional[str] = None
+    confidence: float = 0.0
+    license_plate: Optional[str] = None
+    vehicle_type: Optional[str] = None
+    vehicle_color: Optional[str] = None
+    description: Optional[str] = None
+    bounding_box: Optional[List[float]] = None
+    evidence_points: Optional[List[str]] = None
+    
+    class Config:
+        extra = "allow"
+    
+    @validator('type', 'severity', pre=True)
+    def normalize_label(cls, v):
+        if v is None:
+            return None
+        return str(v).strip().lower().replace(" ", "_").replace("-", "_") or None
+    
+    @validator('confidence', pre=True)
+    def normalize_confidence(cls, v):
+        return _to_confidence(v)
+    
+    @validator('license_plate', 'vehicle_type', 'vehicle_color', 'description', pre=True)
+    def coerce_text(cls, v):
+        return _to_text(v)
+    
+    @validator('bounding_box', pre=True)
+    def validate_bounding_box(cls, v):
+        if not isinstance(v, (list, tuple)) or len(v) != 4:
+            return None
+        try:
+            return [float(value) for value in v]
+        except (TypeError, ValueError):
+            return None
+    
+    @validator('evidence_points', pre=True)
+    def coerce_evidence_points(cls, v):
+        if v is None:
+            return None
+        if not isinstance(v, list):
+            v = [v]
+        return [str(point) for point in v]
+
+def _violation_dicts(v):
+    """Keep only object entries of a violations list"""
+    if not isinstance(v, list):
+        return []
+    return [entry for entry in v if isinstance(entry, dict)]
+
+class SceneAnalysis(BaseModel):
+    """Scene conditions reported alongside the violations"""
+    weather: Optional[str] = None
+    lighting: Optional[str] = None
+    traffic_density: Optional[str] = None
+    road_conditions: Optional[str] = None
+    visibility: Optional[str] = None
+    
+    class Config:
+        extra = "allow"
+    
+    @validator('weather', 'lighting', 'traffic_density', 'road_conditions', 'visibility', pre=True)
+    def coerce_text(cls, v):
+        return _to_text(v)
+
+class SceneContext(BaseModel):
+    """Slowly changing conditions of a camera's location, from GPT-4o"""
+    weather: Optional[str] = None
+    lighting: Optional[str] = None
+    visibility: Optional[str] = None
+    road_conditions: Optional[str] = None
+    road_infrastructure: Optional[str] = None
+    hazards: Optional[str] = None
+    
+    @validator('weather', 'lighting', 'visibility', 'road_conditions', 'road_infrastructure', 'hazards', pre=True)
+    def coerce_text(cls, v):
+        if isinstance(v, dict):
+            return "; ".join(f"{key}: {value}" for key, value in v.items())
+        if isinstance(v, list):
+            return "; ".join(str(value) for value in v)
+        return _to_text(v)
+
+class LlamaDetection(BaseModel):
+    """Llama detection answer"""
+    violations: List[DetectedViolation] = []
+    scene_analysis: SceneAnalysis = SceneAnalysis()
+    overall_confidence: Optional[float] = None
+    
+    class Config:
+        extra = "allow"
+    
+    @validator('violations', pre=True)
+    def filter_violations(cls, v):
+        return _violation_dicts(v)
+    
+    @validator('scene_analysis', pre=True)
+    def coerce_scene_analysis(cls, v):
+        return v if isinstance(v, dict) else {}
+    
+    @validator('overall_confidence', pre=True)
+    def coerce_overall_confidence(cls, v):
+        return _to_confidence(v) if v is not None else None
+
+class MosaicTileDetection(LlamaDetection):
+    """Llama detection answer for one tile of a mosaic"""
+    tile: Optional[int] = None
+    
+    @validator('tile', pre=True)
+    def coerce_tile(cls, v):
+        try:
+            return int(str(v).strip().lstrip('#'))
+        except (TypeError, ValueError):
+            return None
+
+class LlamaMosaicDetection(BaseModel):
+    """Llama detection answer for a mosaic of several frames"""
+    tiles: List[MosaicTileDetection] = []
+    
+    class Config:
+        extra = "allow"
+    
+    @validator('tiles', pre=True)
+    def filter_tiles(cls, v):
+        return _violation_dicts(v)
+
+class VerificationSection(BaseModel):
+    """Confirmed, disputed and additional violations from GPT-4o"""
+    confirmed_violations: List[Dict[str, Any]] = []
+    disputed_violations: List[Dict[str, Any]] = []
+    additional_violations: List[DetectedViolation] = []
+    
+    class Config:
+        extra = "allow"
+    
+    @validator('confirmed_violations', 'disputed_violations', pre=True)
+    def normalize_references(cls, v):
+        # GPT-4o sometimes lists bare violation types instead of objects
+        if not isinstance(v, list):
+            return []
+        return [
+            entry if isinstance(entry, dict) else {"type": str(entry)}
+            for entry in v
+            if entry is not None
+        ]
+    
+    @validator('additional_violations', pre=True)
+    def filter_violations(cls, v):
+        return _violation_dicts(v)
+
+class GPT4oVerification(BaseModel):
+    """GPT-4o verification answer"""
+    verification: Optional[VerificationSection] = None
+    accuracy_assessment: Optional[Dict[str, Any]] = None
+    contextual_analysis: Optional[Dict[str, Any]] = None
+    evidence_quality: Optional[Dict[str, Any]] = None
+    recommendations: Optional[Dict[str, Any]] = None
+    
+    class Config:
+        extra = "allow"
+    
+    @validator('verification', pre=True)
+    def coerce_verification(cls, v):
+        return v if v is None or isinstance(v, dict) else {}
+    
+    @validator('accuracy_assessment', 'contextual_analysis', 'evidence_quality', 'recommendations', pre=True)
+    def coerce_section(cls, v):
+        return _to_section(v)
+
+class ViolationReport(BaseModel):
+    """GPT-4o violation report"""
+    report_id: Optional[str] = None
+    executive_summary: Optional[str] = None
+    violation_details: Optional[Dict[str, Any]] = None
+    evidence_analysis: Optional[Dict[str, Any]] = None
+    legal_context: Optional[Dict[str, Any]] = None
+    recommendations: Optional[Dict[str, Any]] = None
+    appeal_information: Optional[Dict[str, Any]] = None
+    quality_assurance: Optional[Dict[str, Any]] = None
+    
+    class Config:
+        extra = "allow"
+    
+    @validator('report_id', 'executive_summary', pre=True)
+    def coerce_text(cls, v):
+        return _to_text(v)
+    
+    @validator(
+        'violation_details', 'evidence_analysis', 'legal_context',
+        'recommendations', 'appeal_information', 'quality_assurance',
+        pre=True
+    )
+    def coerce_section(cls, v):
+        return _to_section(v)
\ No newline at end of file
@@ -5,6 +5,23 @@ import uuid
 
 from app.models.camera import CameraStatus, CameraType
 
+class DetectionZone(BaseModel):
+    """Region of the camera image that is analyzed, points are normalized (x, y) in 0..1"""
+    name: Optional[str] = Field(None, max_length=100)
+    polygon: List[List[float]] = Field(..., description="At least three [x, y] points")
+    enabled: bool = True
+    
+    @validator('polygon')
+    def validate_polygon(cls, v):
+        if len(v) < 3:
+            raise ValueError('Polygon needs at least three points')
+        for point in v:
+            if len(point) != 2:
+                raise ValueError('Polygon points must be [x, y] pairs')
+            if not all(0 <= value <= 1 for value in point):
+                raise ValueError('Polygon points must be normalized to 0..1')
+        return v
+
 class CameraBase(BaseModel):
     """Base camera schema"""
     name: str = Field(..., min_length=1, max_length=100)
@@ -27,7 +44,7 @@ class CameraCreate(CameraBase):
     ai_enabled: bool = True
     recording_enabled: bool = True
     alert_enabled: bool = True
-    detection_zones: Optional[List[Dict[str, Any]]] = None
+    detection_zones: Optional[List[DetectionZone]] = None
     sensitivity_settings: Optional[Dict[str, Any]] = None
     notification_settings: Optional[Dict[str, Any]] = None
     
@@ -61,7 +78,7 @@ class CameraUpdate(BaseModel):
     ai_enabled: Optional[bool] = None
     recording_enabled: Optional[bool] = None
     alert_enabled: Optional[bool] = None
-    detection_zones: Optional[List[Dict[str, Any]]] = None
+    detection_zones: Optional[List[DetectionZone]] = None
     sensitivity_settings: Optional[Dict[str, Any]] = None
     notification_settings: Optional[Dict[str, Any]] = None
     
@@ -107,6 +124,10 @@ class CameraResponse(CameraBase):
     class Config:
         from_attributes = True
 
+class CameraDetectionZones(BaseModel):
+    """Schema for reading and replacing a camera's detection zones"""
+    detection_zones: List[DetectionZone] = []
+
 class CameraFilter(BaseModel):
     """Schema for filtering cameras"""
     status: Optional[CameraStatus] = None
@@ -0,0 +1,117 @@
+import hashlib
+import json
+from typing import Dict, Any, Optional, List, Tuple
+import numpy as np
+from loguru import logger
+
+from app.core.config import settings
+from app.services.image_preprocessing import PreparedFrame
+from app.services.image_workers import image_workers
+
+Polygon = List[List[float]]
+
+def zone_polygons(zones: Optional[List[Dict[str, Any]]]) -> List[Polygon]:
+    """Polygons of a camera's enabled detection zones (normalized (x, y) points)"""
+    polygons = []
+    for zone in zones or []:
+        if not isinstance(zone, dict) or not zone.get("enabled", True):
+            continue
+        polygon = zone.get("polygon")
+        if isinstance(polygon, list) and len(polygon) >= 3:
+            polygons.append([[float(x), float(y)] for x, y in polygon])
+    return polygons
+
+class CameraRegionRegistry:
+    """
+    Per-camera regions of interest, taken from the detection zones of the camera record
+    
+    Frames are cropped to the bounding box of a camera's zones (and optionally masked
+    outside them) before they are sent to the providers, so sky, sidewalks and buildings
+    are not paid for in vision tokens. Coordinates returned for the crop map back to the
+    full frame through the crop's offset.
+    """
+    
+    def __init__(self, mask_outside: bool = None, min_savings: float = None):
+        self.mask_outside = mask_outside if mask_outside is not None else settings.ROI_MASK_OUTSIDE
+        self.min_savings = min_savings if min_savings is not None else settings.ROI_MIN_AREA_SAVINGS
+        
+        # camera_id -> (polygons, signature)
+        self._regions: Dict[str, Tuple[List[Polygon], str]] = {}
+        
+        # Counters
+        self.frames = 0
+        self.cropped = 0
+        self.area_sent = 0.0
+    
+    def set_zones(self, camera_id: str, zones: Optional[List[Dict[str, Any]]]) -> List[Polygon]:
+        """Set (or clear, with no enabled zones) the regions of a camera"""
+        polygons = zone_polygons(zones)
+        if polygons:
+            signature = hashlib.sha1(json.dumps(polygons).encode()).hexdigest()[:8]
+            self._regions[str(camera_id)] = (polygons, signature)
+        else:
+            self._regions.pop(str(camera_id), None)
+        logger.info(f"Camera {camera_id} has {len(polygons)} detection zones")
+        return polygons
+    
+    def get(self, camera_id: str) -> Optional[List[Polygon]]:
+        region = self._regions.get(str(camera_id))
+        return region[0] if region else None
+    
+    def signature(self, camera_id: str) -> str:
+        """Short hash of the camera's regions, empty without regions - part of cache keys"""
+        region = self._regions.get(str(camera_id))
+        return region[1] if region else ""
+    
+    async def apply(self, camera_id: str, frame: PreparedFrame) -> PreparedFrame:
+        """
+        Crop (and mask) a frame to the camera's regions
+        
+        Returns:
+            The cropped frame, or the frame itself without regions or when cropping
+            would not save enough
+        """
+        polygons = self.get(camera_id)
+        if not polygons:
+            return frame
+        
+        self.frames += 1
+        try:
+            cropped, area_ratio = await image_workers.run("roi_crop", self._crop, frame, polygons, cost=len(frame.data))
+        except Exception as e:
+            logger.error(f"ROI crop failed for camera {camera_id}, sending full frame: {str(e)}")
+            return frame
+        
+        self.area_sent += area_ratio
+        if cropped is not frame:
+            self.cropped += 1
+        return cropped
+    
+    def _crop(self, frame: PreparedFrame, polygons: List[Polygon]) -> Tuple[PreparedFrame, float]:
+        image = frame.decoded
+        if image is None:
+            return frame, 1.0
+        
+        height, width = image.shape[:2]
+        points = [
+            np.array([[round(x * (width - 1)), round(y * (height - 1))] for x, y in polygon], dtype=np.int32)
+            for polygon in polygons
+        ]
+        stacked = np.concatenate(points)
+        x1, y1 = np.clip(stacked.min(axis=0), 0, [width - 1, height - 1])
+        x2, y2 = np.clip(stacked.max(axis=0) + 1, 1, [width, height])
+        
+        area_ratio = (x2 - x1) * (y2 - y1) / (width * height)
+        if area_ratio > 1 - self.min_savings and not self.mask_outside:
+            return frame, 1.0
+        
+        return frame.crop([int(x1), int(y1), int(x2), int(y2)], points if self.mask_outside else None), area_ratio
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get ROI statistics"""
+        return {
+            "cameras": len(self._regions),
+            "frames": self.frames,
+            "cropped": self.cropped,
+            "avg_area_sent": round(float(self.area_sent) / self.frames, 4) if self.frames else 1.0
+        }
\ No newline at end of file
@@ -0,0 +1,113 @@
+import asyncio
+import time
+from typing import Dict, Any, Optional
+
+from app.core.config import settings
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD concurrency limit for requests to the AI providers
+    
+    The limit grows by roughly one slot per round-trip while latency stays under
+    the target, and is cut multiplicatively on 429/5xx responses or slow responses.
+    A Retry-After from the provider pauses all new dispatches until it has passed.
+    """
+    
+    def __init__(self,
+                 initial_limit: int = None,
+                 min_limit: int = None,
+                 max_limit: int = None,
+                 target_latency: float = None,
+                 backoff_ratio: float = 0.5):
+        self.limit = float(initial_limit if initial_limit is not None else settings.BATCH_PROCESSING_SIZE)
+        self.min_limit = min_limit if min_limit is not None else settings.BATCH_MIN_CONCURRENCY
+        self.max_limit = max_limit if max_limit is not None else settings.BATCH_MAX_CONCURRENCY
+        self.target_latency = target_latency if target_latency is not None else settings.BATCH_TARGET_LATENCY_SECONDS
+        self.backoff_ratio = backoff_ratio
+        self.limit = min(float(self.max_limit), max(float(self.min_limit), self.limit))
+        
+        self.in_flight = 0
+        self._condition = asyncio.Condition()
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._smoothed_latency: Optional[float] = None
+        
+        # Counters
+        self.completed = 0
+        self.overloaded = 0
+        self.decreases = 0
+    
+    async def acquire(self):
+        """Wait for a free slot (and for any Retry-After pause to pass)"""
+        async with self._condition:
+            while True:
+                pause = self._paused_until - time.monotonic()
+                if pause > 0:
+                    try:
+                        await asyncio.wait_for(self._condition.wait(), timeout=pause)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                
+                if self.in_flight < max(1, int(self.limit)):
+                    break
+                
+                await self._condition.wait()
+            
+            self.in_flight += 1
+    
+    async def release(self,
+                      latency: Optional[float] = None,
+                      overloaded: bool = False,
+                      retry_after: Optional[float] = None):
+        """
+        Free a slot and feed the outcome back into the limit
+        
+        Args:
+            latency: Provider latency of the request in seconds, None if no provider was called
+            overloaded: Whether the provider answered 429 or 5xx
+            retry_after: Seconds the provider asked us to wait, if any
+        """
+        async with self._condition:
+            self.in_flight = max(0, self.in_flight - 1)
+            self.completed += 1
+            self._record(latency, overloaded, retry_after)
+            self._condition.notify_all()
+    
+    def _record(self, latency: Optional[float], overloaded: bool, retry_after: Optional[float]):
+        now = time.monotonic()
+        
+        if latency is not None:
+            self._smoothed_latency = latency if self._smoothed_latency is None else (
+                0.8 * self._smoothed_latency + 0.2 * latency
+            )
+        
+        if retry_after:
+            self._paused_until = max(self._paused_until, now + retry_after)
+        
+        if overloaded:
+            self.overloaded += 1
+        
+        if overloaded or (latency is not None and latency > self.target_latency):
+            # Decrease at most once per round-trip so one burst of failures halves the limit once
+            if now - self._last_decrease >= (self._smoothed_latency or 1.0):
+                self.limit = max(float(self.min_limit), self.limit * self.backoff_ratio)
+                self._last_decrease = now
+                self.decreases += 1
+        elif latency is not None:
+            # Additive increase: about +1 per limit-many successful requests
+            self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get limiter statistics"""
+        return {
+            "limit": round(self.limit, 2),
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "overloaded": self.overloaded,
+            "decreases": self.decreases,
+            "smoothed_latency": round(self._smoothed_latency, 4) if self._smoothed_latency else None,
+            "paused_for": round(max(0.0, self._paused_until - time.monotonic()), 2)
+        }
\ No newline at end of file
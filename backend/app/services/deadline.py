@@ -0,0 +1,60 @@
+import asyncio
+import time
+from typing import Dict, Any, Optional, List, Awaitable
+from loguru import logger
+
+from app.core.config import settings
+from app.services.pipeline_metrics import record_deadline_miss
+
+class Deadline:
+    """
+    End-to-end time budget of one frame, shared by all stages of process_frame
+    
+    Stages await through run(), which gives up once the budget is spent and records the
+    stage as missed - the frame then completes with what the earlier stages produced.
+    A budget of 0 (or less) means no deadline.
+    """
+    
+    __slots__ = ("budget", "expires_at", "missed")
+    
+    def __init__(self, seconds: float = None):
+        self.budget = seconds if seconds is not None else settings.AI_PROCESSING_TIMEOUT
+        self.expires_at = time.monotonic() + self.budget if self.budget > 0 else None
+        self.missed: List[str] = []
+    
+    def remaining(self) -> Optional[float]:
+        """Seconds left, None without a deadline"""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+    
+    @property
+    def expired(self) -> bool:
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+    
+    def miss(self, stage: str):
+        """Record a stage skipped or cut short by the deadline"""
+        if stage not in self.missed:
+            self.missed.append(stage)
+            record_deadline_miss(stage)
+            logger.warning(f"Deadline of {self.budget}s spent, {stage} stage incomplete")
+    
+    async def run(self, stage: str, awaitable: Awaitable[Any], default: Any = None) -> Any:
+        """
+        Await a stage within the remaining budget
+        
+        Returns:
+            The stage's result, or default if the deadline passed first (the stage is
+            then cancelled)
+        """
+        try:
+            return await asyncio.wait_for(awaitable, self.remaining())
+        except asyncio.TimeoutError:
+            self.miss(stage)
+            return default
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "budget_seconds": self.budget,
+            "missed_stages": list(self.missed)
+        }
\ No newline at end of file
@@ -0,0 +1,222 @@
+from typing import Dict, Any, Optional, List
+
+class ViolationRecord:
+    """A processed violation of one frame, as produced by ViolationDetectionService"""
+    
+    __slots__ = (
+        "id", "type", "severity", "confidence", "license_plate", "vehicle_type", "vehicle_color",
+        "description", "bounding_box", "evidence_points", "detection_source", "location",
+        "camera_id", "timestamp", "status", "verified", "requires_review",
+        "verification_confidence", "verification_notes", "escalation", "event", "is_repeat"
+    )
+    
+    # Serialized only once set
+    OPTIONAL_FIELDS = ("verification_confidence", "verification_notes", "escalation", "event")
+    
+    def __init__(self,
+                 id: str,
+                 type: str,
+                 severity: str,
+                 confidence: float,
+                 license_plate: Optional[str] = None,
+                 vehicle_type: Optional[str] = None,
+                 vehicle_color: Optional[str] = None,
+                 description: str = "",
+                 bounding_box: Optional[List[float]] = None,
+                 evidence_points: Optional[List[str]] = None,
+                 detection_source: str = "llama",
+                 location: Optional[str] = None,
+                 camera_id: Optional[str] = None,
+                 timestamp: Optional[str] = None,
+                 status: str = "detected",
+                 verified: bool = False,
+                 requires_review: bool = False):
+        self.id = id
+        self.type = type
+        self.severity = severity
+        self.confidence = confidence
+        self.license_plate = license_plate
+        self.vehicle_type = vehicle_type
+        self.vehicle_color = vehicle_color
+        self.description = description
+        self.bounding_box = bounding_box if bounding_box is not None else []
+        self.evidence_points = evidence_points if evidence_points is not None else []
+        self.detection_source = detection_source
+        self.location = location
+        self.camera_id = camera_id
+        self.timestamp = timestamp
+        self.status = status
+        self.verified = verified
+        self.requires_review = requires_review
+        self.verification_confidence: Optional[float] = None
+        self.verification_notes: Optional[str] = None
+        self.escalation: Optional[str] = None
+        self.event: Optional[Dict[str, Any]] = None
+        self.is_repeat = False
+    
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            "id": self.id,
+            "type": self.type,
+            "severity": self.severity,
+            "confidence": self.confidence,
+            "license_plate": self.license_plate,
+            "vehicle_type": self.vehicle_type,
+            "vehicle_color": self.vehicle_color,
+            "description": self.description,
+            "bounding_box": self.bounding_box,
+            "evidence_points": self.evidence_points,
+            "detection_source": self.detection_source,
+            "location": self.location,
+            "camera_id": self.camera_id,
+            "timestamp": self.timestamp,
+            "status": self.status,
+            "verified": self.verified,
+            "requires_review": self.requires_review
+        }
+        for field in self.OPTIONAL_FIELDS:
+            value = getattr(self, field)
+            if value is not None:
+                data[field] = value
+        if self.is_repeat:
+            data["is_repeat"] = True
+        return data
+
+class AnalysisResult:
+    """Combined and validated Llama/GPT-4o analysis of one frame"""
+    
+    __slots__ = ("violations", "scene_analysis", "confidence_metrics", "recommendations", "detailed_report")
+    
+    def __init__(self):
+        self.violations: List[ViolationRecord] = []
+        self.scene_analysis: Dict[str, Any] = {}
+        self.confidence_metrics: Dict[str, Any] = {}
+        self.recommendations: Dict[str, Any] = {}
+        self.detailed_report: Optional[Dict[str, Any]] = None
+    
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            "violations": [violation.to_dict() for violation in self.violations],
+            "scene_analysis": self.scene_analysis,
+            "confidence_metrics": self.confidence_metrics,
+            "recommendations": self.recommendations
+        }
+        if self.detailed_report is not None:
+            data["detailed_report"] = self.detailed_report
+        return data
+
+class FrameResult:
+    """
+    Outcome of ViolationDetectionService.process_frame
+    
+    Stays a compact record while it travels through the pipeline and batches; the
+    response dict is only built by to_dict() when the result is serialized. The raw
+    provider results - every model response in full, mostly repeating "results" - are
+    left out of it unless include_raw is asked for.
+    """
+    
+    __slots__ = (
+        "detection_id", "status", "context", "error", "processing_time", "violations_detected",
+        "new_violations", "report_status", "persist_status", "degraded", "deadline", "failed_stages",
+        "cache_hit", "coalesced", "near_duplicate", "motion_gated", "motion_ratio", "roi_applied",
+        "local_detector", "stage_timings", "results", "raw_analysis", "frame_index"
+    )
+    
+    def __init__(self,
+                 detection_id: Optional[str],
+                 status: str,
+                 context: Dict[str, Any],
+                 error: Optional[str] = None,
+                 processing_time: float = 0.0,
+                 violations_detected: int = 0,
+                 new_violations: int = 0,
+                 report_status: Optional[str] = None,
+                 persist_status: Optional[str] = None,
+                 degraded: bool = False,
+                 deadline: Optional[Dict[str, Any]] = None,
+                 failed_stages: Optional[List[str]] = None,
+                 cache_hit: bool = False,
+                 coalesced: bool = False,
+                 near_duplicate: bool = False,
+                 motion_gated: bool = False,
+                 motion_ratio: Optional[float] = None,
+                 roi_applied: bool = False,
+                 local_detector: Optional[Dict[str, Any]] = None,
+                 stage_timings: Optional[Dict[str, float]] = None,
+                 results: Optional[AnalysisResult] = None,
+                 raw_analysis: Optional[Dict[str, Any]] = None):
+        self.detection_id = detection_id
+        self.status = status
+        self.context = context
+        self.error = error
+        self.processing_time = processing_time
+        self.violations_detected = violations_detected
+        self.new_violations = new_violations
+        self.report_status = report_status
+        self.persist_status = persist_status
+        self.degraded = degraded
+        self.deadline = deadline
+        self.failed_stages = failed_stages or []
+        self.cache_hit = cache_hit
+        self.coalesced = coalesced
+        self.near_duplicate = near_duplicate
+        self.motion_gated = motion_gated
+        self.motion_ratio = motion_ratio
+        self.roi_applied = roi_applied
+        self.local_detector = local_detector
+        self.stage_timings = stage_timings or {}
+        self.results = results
+        self.raw_analysis = raw_analysis
+        self.frame_index: Optional[int] = None
+    
+    @classmethod
+    def failed(cls, detection_id: Optional[str], error: str, context: Dict[str, Any] = None) -> "FrameResult":
+        return cls(detection_id, "error", context or {}, error=error)
+    
+    @property
+    def ok(self) -> bool:
+        return self.status == "completed"
+    
+    def to_dict(self, include_raw: bool = False) -> Dict[str, Any]:
+        """
+        Response representation
+        
+        Args:
+            include_raw: Add the raw Llama/GPT-4o results ("raw_analysis"), if still held
+        """
+        if not self.ok:
+            data = {
+                "detection_id": self.detection_id,
+                "status": self.status,
+                "error": self.error,
+                "context": self.context
+            }
+        else:
+            data = {
+                "detection_id": self.detection_id,
+                "status": self.status,
+                "processing_time": self.processing_time,
+                "violations_detected": self.violations_detected,
+                "new_violations": self.new_violations,
+                "report_status": self.report_status,
+                "persist_status": self.persist_status,
+                "degraded": self.degraded,
+                "deadline": self.deadline,
+                "failed_stages": self.failed_stages,
+                "cache_hit": self.cache_hit,
+                "coalesced": self.coalesced,
+                "near_duplicate": self.near_duplicate,
+                "motion_gated": self.motion_gated,
+                "motion_ratio": self.motion_ratio,
+                "roi_applied": self.roi_applied,
+                "local_detector": self.local_detector,
+                "stage_timings": self.stage_timings,
+                "results": self.results.to_dict() if self.results else None
+            }
+            if include_raw and self.raw_analysis is not None:
+                data["raw_analysis"] = self.raw_analysis
+            data["context"] = self.context
+        
+        if self.frame_index is not None:
+            data["frame_index"] = self.frame_index
+        return data
\ No newline at end of file
@@ -0,0 +1,90 @@
+from typing import Dict, Any, List, Tuple, Callable
+from loguru import logger
+
+from app.core.config import settings
+from app.services.pipeline_metrics import record_escalation
+
+ACCEPT = "accept"
+ESCALATE = "escalate"
+DROP = "drop"
+
+class EscalationPolicy:
+    """
+    Decides which Llama detections need GPT-4o verification
+    
+    A violation at or above the accept bound is taken without verification, one below
+    the drop bound (VIOLATION_DETECTION_THRESHOLD by default) is discarded, and only
+    the band in between is escalated. Bounds can be set per violation type. A frame is
+    verified when at least one of its violations is escalated.
+    """
+    
+    def __init__(self,
+                 enabled: bool = None,
+                 accept_threshold: float = None,
+                 drop_threshold: float = None,
+                 type_thresholds: Dict[str, Dict[str, float]] = None):
+        self.enabled = enabled if enabled is not None else settings.ESCALATION_POLICY_ENABLED
+        self.accept_threshold = accept_threshold if accept_threshold is not None else settings.VERIFICATION_AUTO_ACCEPT_THRESHOLD
+        self.drop_threshold = drop_threshold if drop_threshold is not None else settings.VIOLATION_DETECTION_THRESHOLD
+        self.type_thresholds = type_thresholds if type_thresholds is not None else settings.ESCALATION_TYPE_THRESHOLDS
+        
+        for violation_type in self.type_thresholds:
+            drop, accept = self.thresholds(violation_type)
+            if drop > accept:
+                logger.warning(f"Escalation drop bound {drop} above accept bound {accept} for {violation_type}")
+        
+        # Counters
+        self.frames = 0
+        self.escalated_frames = 0
+        self.decisions: Dict[str, Dict[str, int]] = {}
+    
+    def thresholds(self, violation_type: str) -> Tuple[float, float]:
+        """(drop, accept) bounds of a violation type"""
+        bounds = self.type_thresholds.get(violation_type) or {}
+        return bounds.get("drop", self.drop_threshold), bounds.get("accept", self.accept_threshold)
+    
+    def decide(self, violation_type: str, confidence: float) -> str:
+        """Decision for one violation: accept, escalate or drop"""
+        drop, accept = self.thresholds(violation_type)
+        if confidence < drop:
+            return DROP
+        if self.enabled and confidence >= accept:
+            return ACCEPT
+        return ESCALATE
+    
+    def triage(self, violations: List[Dict[str, Any]], type_of: Callable[[str], str]) -> List[str]:
+        """
+        Decide a frame's detections and count the decisions
+        
+        Args:
+            violations: Violations as reported by Llama
+            type_of: Maps a reported type to the stored violation type the bounds are keyed by
+        
+        Returns:
+            Decision per violation - GPT-4o verifies the frame if any is ESCALATE
+        """
+        decisions = []
+        for violation in violations:
+            violation_type = type_of(violation.get("type") or "other")
+            decision = self.decide(violation_type, float(violation.get("confidence", 0.0)))
+            decisions.append(decision)
+            
+            counts = self.decisions.setdefault(violation_type, {ACCEPT: 0, ESCALATE: 0, DROP: 0})
+            counts[decision] += 1
+            record_escalation(violation_type, decision)
+        
+        self.frames += 1
+        self.escalated_frames += ESCALATE in decisions
+        return decisions
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get escalation statistics"""
+        return {
+            "enabled": self.enabled,
+            "accept_threshold": self.accept_threshold,
+            "drop_threshold": self.drop_threshold,
+            "frames": self.frames,
+            "escalated_frames": self.escalated_frames,
+            "escalation_rate": round(self.escalated_frames / self.frames, 4) if self.frames else 0.0,
+            "decisions": self.decisions
+        }
\ No newline at end of file
@@ -0,0 +1,115 @@
+import time
+from collections import deque
+from typing import Dict, Any, Optional, Deque, Tuple
+import cv2
+import numpy as np
+from loguru import logger
+
+from app.core.config import settings
+
+def compute_dhash(gray_frame: Optional[np.ndarray], hash_size: int = 8) -> Optional[int]:
+    """
+    Compute a difference hash (dHash) of a grayscale frame
+    
+    Args:
+        gray_frame: Grayscale pixels (a reduced-size preview is plenty for a 9x8 hash)
+        hash_size: Hash grid size, the hash has hash_size * hash_size bits
+    
+    Returns:
+        Perceptual hash as an integer, or None if there is no decodable frame
+    """
+    if gray_frame is None:
+        return None
+    
+    resized = cv2.resize(gray_frame, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    diff = resized[:, 1:] > resized[:, :-1]
+    
+    return int.from_bytes(np.packbits(diff.flatten()).tobytes(), "big")
+
+def hamming_distance(hash_a: int, hash_b: int) -> int:
+    """Number of differing bits between two hashes"""
+    return bin(hash_a ^ hash_b).count("1")
+
+class NearDuplicateFrameGate:
+    """
+    Per-camera gate that reuses the last analysis for perceptually identical frames
+    
+    Only meant for frames without motion: a vehicle entering the scene changes few hash
+    bits, so frames the motion gate flagged as moving are not looked up at all.
+    """
+    
+    def __init__(self,
+                 max_distance: int = None,
+                 window_size: int = None,
+                 max_age_seconds: int = None,
+                 hash_size: int = None):
+        self.hash_size = hash_size if hash_size is not None else settings.FRAME_DEDUP_HASH_SIZE
+        self.max_distance = max_distance if max_distance is not None else settings.FRAME_DEDUP_MAX_HAMMING_DISTANCE
+        self.window_size = window_size if window_size is not None else settings.FRAME_DEDUP_WINDOW_SIZE
+        self.max_age_seconds = max_age_seconds if max_age_seconds is not None else settings.FRAME_DEDUP_MAX_AGE_SECONDS
+        
+        # camera_id -> ring of (hash, analyzed_at, analysis)
+        self._windows: Dict[str, Deque[Tuple[int, float, Dict[str, Any]]]] = {}
+        
+        # camera_id -> {"frames": n, "skipped": n}
+        self._camera_stats: Dict[str, Dict[str, int]] = {}
+    
+    def lookup(self, camera_id: str, frame_hash: Optional[int]) -> Optional[Dict[str, Any]]:
+        """Return a previous analysis of a near-identical frame from the same camera, if any"""
+        stats = self._camera_stats.setdefault(camera_id, {"frames": 0, "skipped": 0})
+        stats["frames"] += 1
+        
+        if frame_hash is None:
+            return None
+        
+        now = time.time()
+        window = self._windows.get(camera_id)
+        if not window:
+            return None
+        
+        # Newest entries first - consecutive frames are most likely to match
+        for previous_hash, analyzed_at, analysis in reversed(window):
+            if now - analyzed_at > self.max_age_seconds:
+                continue
+            if hamming_distance(frame_hash, previous_hash) <= self.max_distance:
+                stats["skipped"] += 1
+                return analysis
+        
+        return None
+    
+    def remember(self, camera_id: str, frame_hash: Optional[int], analysis: Dict[str, Any]):
+        """Record the analysis of a frame in the camera's hash window"""
+        if frame_hash is None:
+            return
+        
+        window = self._windows.get(camera_id)
+        if window is None:
+            window = deque(maxlen=self.window_size)
+            self._windows[camera_id] = window
+        
+        window.append((frame_hash, time.time(), analysis))
+    
+    def reset(self, camera_id: str):
+        """Forget the hash window of a camera"""
+        self._windows.pop(camera_id, None)
+        logger.info(f"Near-duplicate window reset for camera {camera_id}")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get near-duplicate suppression statistics"""
+        total_frames = sum(s["frames"] for s in self._camera_stats.values())
+        total_skipped = sum(s["skipped"] for s in self._camera_stats.values())
+        
+        return {
+            "max_distance": self.max_distance,
+            "window_size": self.window_size,
+            "frames": total_frames,
+            "skipped": total_skipped,
+            "skip_rate": round(total_skipped / total_frames, 4) if total_frames else 0.0,
+            "cameras": {
+                camera_id: {
+                    **s,
+                    "skip_rate": round(s["skipped"] / s["frames"], 4) if s["frames"] else 0.0
+                }
+                for camera_id, s in self._camera_stats.items()
+            }
+        }
\ No newline at end of file
@@ -1,40 +1,61 @@
-import httpx
-import base64
 import asyncio
-from typing import Dict, Any, Optional, List
+import time
+from typing import Dict, Any, Optional, List, Union
 from loguru import logger
 import cv2
 import numpy as np
 from PIL import Image
 import io
 import json
+from datetime import datetime
 
 from app.core.config import settings
 from app.models.violation import ViolationType, ViolationSeverity
+from app.services.http_client import ConnectionPoolMonitor, create_ai_http_client, parse_retry_after, with_timings
+from app.services.provider_resilience import CircuitOpenError, ProviderRouter
+from app.services.image_preprocessing import EncodedImage, PreparedFrame, ProviderImageBudget
+from app.services.image_workers import image_workers
+from app.services.structured_output import NO_JSON_ERROR, gpt4o_verification_parser, violation_report_parser, scene_context_parser
 
 class GPT4oVisionService:
     """GPT-4o Vision Service for advanced traffic violation analysis and reporting"""
     
     def __init__(self):
         self.api_key = settings.OPENAI_API_KEY
-        self.client = httpx.AsyncClient(timeout=45.0)
+        self.api_url = settings.OPENAI_API_URL
+        self.pool_monitor = ConnectionPoolMonitor("gpt4o")
+        self.client = create_ai_http_client(timeout=45.0, monitor=self.pool_monitor)
+        self.router = ProviderRouter(
+            "gpt4o", self.api_url, self.api_key,
+            settings.OPENAI_SECONDARY_API_URL, settings.OPENAI_SECONDARY_API_KEY
+        )
+        self.image_budget = ProviderImageBudget.for_provider("gpt4o")
+        self.scene_image_budget = ProviderImageBudget.for_provider("scene")
         
-    async def analyze_violation(self, image_data: bytes, violation_data: Dict[str, Any]) -> Dict[str, Any]:
+    async def analyze_violation(self,
+                                image_data: Union[PreparedFrame, bytes],
+                                violation_data: Dict[str, Any],
+                                scene_context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Advanced analysis using GPT-4o for violation verification and detailed reporting
         
         Args:
-            image_data: Raw image bytes
+            image_data: Prepared frame (or raw image bytes)
             violation_data: Initial violation detection results from Llama
+            scene_context: Known conditions of the camera's location, if any
             
         Returns:
             Enhanced analysis with detailed report and recommendations
         """
+        started = time.perf_counter()
+        timings: Dict[str, float] = {}
         try:
-            base64_image = base64.b64encode(image_data).decode('utf-8')
+            frame = PreparedFrame.ensure(image_data)
+            encoded_image = await image_workers.run("encode", frame.encoded_for, self.image_budget, cost=len(frame.data))
+            timings["encode"] = round(time.perf_counter() - started, 4)
             
             # Build context-aware prompt
-            prompt = self._build_verification_prompt(violation_data)
+            prompt = self._build_verification_prompt(violation_data, scene_context)
             
             payload = {
                 "model": "gpt-4o",
@@ -47,13 +68,7 @@ class GPT4oVisionService:
                         "role": "user",
                         "content": [
                             {"type": "text", "text": prompt},
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{base64_image}",
-                                    "detail": "high"
-                                }
-                            }
+                            encoded_image.to_content_part()
                         ]
                     }
                 ],
@@ -61,27 +76,35 @@ class GPT4oVisionService:
                 "temperature": 0.1
             }
             
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            response = await self.client.post(
-                "https://api.openai.com/v1/chat/completions",
-                json=payload,
-                headers=headers
-            )
+            response, request_timings = await self.router.post(self.client, "/chat/completions", payload)
+            timings.update(request_timings)
             
             if response.status_code == 200:
                 result = response.json()
-                return await self._parse_gpt4o_response(result, violation_data)
+                parse_started = time.perf_counter()
+                analysis = await self._parse_gpt4o_response(result, violation_data, encoded_image)
+                timings["parse"] = round(time.perf_counter() - parse_started, 4)
+                return with_timings(analysis, timings, started)
             else:
                 logger.error(f"GPT-4o API error: {response.status_code} - {response.text}")
-                return {"error": f"API error: {response.status_code}"}
+                return with_timings({
+                    "error": f"API error: {response.status_code}",
+                    "status_code": response.status_code,
+                    "retry_after": parse_retry_after(response.headers.get("Retry-After"))
+                }, timings, started)
                 
+        except CircuitOpenError as e:
+            logger.warning(f"Skipping GPT-4o verification: {str(e)}")
+            return with_timings({
+                "error": str(e),
+                "status_code": 503,
+                "retry_after": e.retry_after,
+                "circuit_open": True
+            }, timings, started)
+        
         except Exception as e:
             logger.error(f"Error in GPT-4o analysis: {str(e)}")
-            return {"error": str(e)}
+            return with_timings({"error": str(e)}, timings, started)
     
     async def generate_violation_report(self, violation_data: Dict[str, Any], analysis_results: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -94,6 +117,8 @@ class GPT4oVisionService:
         Returns:
             Detailed violation report with legal context
         """
+        started = time.perf_counter()
+        timings: Dict[str, float] = {}
         try:
             prompt = f"""
             Generate a comprehensive traffic violation report based on the following data:
@@ -169,29 +194,28 @@ class GPT4oVisionService:
                 "temperature": 0.1
             }
             
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            response = await self.client.post(
-                "https://api.openai.com/v1/chat/completions",
-                json=payload,
-                headers=headers
-            )
+            response, request_timings = await self.router.post(self.client, "/chat/completions", payload)
+            timings.update(request_timings)
             
             if response.status_code == 200:
                 result = response.json()
-                return self._parse_report_response(result)
+                parse_started = time.perf_counter()
+                report = self._parse_report_response(result)
+                timings["parse"] = round(time.perf_counter() - parse_started, 4)
+                return with_timings(report, timings, started)
             else:
                 logger.error(f"GPT-4o report generation error: {response.status_code}")
-                return {"error": "Failed to generate report"}
+                return with_timings({"error": "Failed to generate report"}, timings, started)
                 
+        except CircuitOpenError as e:
+            logger.warning(f"Skipping violation report: {str(e)}")
+            return with_timings({"error": str(e), "circuit_open": True}, timings, started)
+        
         except Exception as e:
             logger.error(f"Error generating violation report: {str(e)}")
-            return {"error": str(e)}
+            return with_timings({"error": str(e)}, timings, started)
     
-    def _build_verification_prompt(self, violation_data: Dict[str, Any]) -> str:
+    def _build_verification_prompt(self, violation_data: Dict[str, Any], scene_context: Optional[Dict[str, Any]] = None) -> str:
         """Build verification prompt based on initial violation detection"""
         
         base_prompt = f"""
@@ -250,27 +274,43 @@ class GPT4oVisionService:
         }}
         """
         
+        if scene_context:
+            base_prompt += f"""
+        Conditions recently observed at this location (for the environmental factors):
+        {json.dumps(scene_context)}
+        """
+        
         return base_prompt
     
-    async def _parse_gpt4o_response(self, response: Dict[str, Any], original_data: Dict[str, Any]) -> Dict[str, Any]:
+    async def _parse_gpt4o_response(self,
+                                    response: Dict[str, Any],
+                                    original_data: Dict[str, Any],
+                                    encoded_image: EncodedImage) -> Dict[str, Any]:
         """Parse GPT-4o response and combine with original data"""
         try:
             content = response['choices'][0]['message']['content']
             
-            # Extract JSON from response
-            import re
-            json_match = re.search(r'\{.*\}', content, re.DOTALL)
-            if json_match:
-                analysis_data = json.loads(json_match.group())
-            else:
+            verification, error = gpt4o_verification_parser.parse(content)
+            if verification is not None:
+                analysis_data = verification.model_dump(exclude_none=True)
+            elif error == NO_JSON_ERROR:
                 analysis_data = {"error": "Could not parse JSON response"}
+            else:
+                raise ValueError(error)
+            
+            # Violations GPT-4o adds use the downscaled payload's coordinates
+            for violation in analysis_data.get("verification", {}).get("additional_violations", []):
+                if isinstance(violation, dict) and violation.get("bounding_box"):
+                    violation["bounding_box"] = encoded_image.rescale_bounding_box(violation["bounding_box"])
             
             return {
                 "service": "gpt-4o",
                 "analysis": analysis_data,
                 "original_detection": original_data,
-                "tokens_used": response.get('usage', {}).get('total_tokens', 0),
-                "model": response.get('model', 'gpt-4o')
+                "usage": response.get('usage') or {},
+                "tokens_used": (response.get('usage') or {}).get('total_tokens', 0),
+                "model": response.get('model', 'gpt-4o'),
+                "payload": encoded_image.get_metadata()
             }
             
         except Exception as e:
@@ -286,45 +326,63 @@ class GPT4oVisionService:
         try:
             content = response['choices'][0]['message']['content']
             
-            # Extract JSON from response
-            import re
-            json_match = re.search(r'\{.*\}', content, re.DOTALL)
-            if json_match:
-                report_data = json.loads(json_match.group())
+            report, error = violation_report_parser.parse(content)
+            if report is not None:
                 return {
                     "status": "success",
-                    "report": report_data,
+                    "report": report.model_dump(exclude_none=True),
                     "generated_at": datetime.utcnow().isoformat(),
-                    "tokens_used": response.get('usage', {}).get('total_tokens', 0)
+                    "usage": response.get('usage') or {},
+                    "tokens_used": (response.get('usage') or {}).get('total_tokens', 0)
                 }
-            else:
+            elif error == NO_JSON_ERROR:
                 return {"status": "error", "message": "Could not parse report JSON"}
+            else:
+                return {"status": "error", "message": error}
                 
         except Exception as e:
             logger.error(f"Error parsing report response: {str(e)}")
             return {"status": "error", "message": str(e)}
     
-    async def analyze_scene_context(self, image_data: bytes, location_data: Dict[str, Any]) -> Dict[str, Any]:
+    async def analyze_scene_context(self,
+                                    image_data: Union[PreparedFrame, bytes],
+                                    location_data: Dict[str, Any]) -> Dict[str, Any]:
         """
-        Analyze scene context for better violation understanding
+        Analyze the slowly changing conditions of a camera's scene
+        
+        The answer describes the location rather than the frame, so it is meant to be
+        cached and reused in the prompts of later frames (see SceneContextCache).
+        
+        Args:
+            image_data: Prepared frame (or raw image bytes) of the camera
+            location_data: Camera id and location
+        
+        Returns:
+            Dict with "scene_context" (weather, lighting, visibility, road_conditions,
+            road_infrastructure, hazards) on success
         """
+        started = time.perf_counter()
+        timings: Dict[str, float] = {}
         try:
-            base64_image = base64.b64encode(image_data).decode('utf-8')
+            frame = PreparedFrame.ensure(image_data)
+            encoded_image = await image_workers.run("encode", frame.encoded_for, self.scene_image_budget, cost=len(frame.data))
+            timings["encode"] = round(time.perf_counter() - started, 4)
             
             prompt = f"""
-            Analyze this traffic scene image for contextual information that might affect violation detection and enforcement:
+            Analyze this traffic scene image for the conditions at this location that affect violation detection and enforcement.
+            Describe only conditions that persist for a while - not individual vehicles or the current traffic.
             
             Location Information: {json.dumps(location_data, indent=2)}
             
-            Provide detailed analysis of:
-            1. Environmental conditions (weather, lighting, visibility)
-            2. Road infrastructure (signs, markings, traffic lights)
-            3. Traffic density and flow patterns
-            4. Potential safety hazards or unusual conditions
-            5. Factors that might affect driver behavior
-            6. Quality and clarity of surveillance footage
-            
-            Format response as JSON with detailed observations.
+            Respond in JSON format, one short phrase per field:
+            {{
+                "weather": "clear/cloudy/rain/fog/snow",
+                "lighting": "daylight/dusk/night with street lighting/...",
+                "visibility": "excellent/good/limited/poor, with the reason",
+                "road_conditions": "dry/wet/icy/under construction/...",
+                "road_infrastructure": "visible signals, signs and lane markings and their condition",
+                "hazards": "unusual conditions or obstructions, or none"
+            }}
             """
             
             payload = {
@@ -334,44 +392,46 @@ class GPT4oVisionService:
                         "role": "user",
                         "content": [
                             {"type": "text", "text": prompt},
-                            {
-                                "type": "image_url", 
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{base64_image}",
-                                    "detail": "high"
-                                }
-                            }
+                            encoded_image.to_content_part()
                         ]
                     }
                 ],
-                "max_tokens": 1000,
+                "max_tokens": 300,
                 "temperature": 0.2
             }
             
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            response = await self.client.post(
-                "https://api.openai.com/v1/chat/completions",
-                json=payload,
-                headers=headers
-            )
+            response, request_timings = await self.router.post(self.client, "/chat/completions", payload)
+            timings.update(request_timings)
             
             if response.status_code == 200:
                 result = response.json()
                 content = result['choices'][0]['message']['content']
-                return {"status": "success", "context_analysis": content}
+                scene_context, error = scene_context_parser.parse(content)
+                if scene_context is None:
+                    return with_timings({"status": "error", "message": error, "context_analysis": content}, timings, started)
+                return with_timings({
+                    "status": "success",
+                    "scene_context": scene_context.model_dump(exclude_none=True),
+                    "context_analysis": content,
+                    "tokens_used": (result.get('usage') or {}).get('total_tokens', 0)
+                }, timings, started)
             else:
-                return {"status": "error", "message": "Failed to analyze scene context"}
+                return with_timings({"status": "error", "message": f"API error: {response.status_code}"}, timings, started)
+        
+        except CircuitOpenError as e:
+            logger.warning(f"Skipping scene context analysis: {str(e)}")
+            return with_timings({"status": "error", "message": str(e)}, timings, started)
                 
         except Exception as e:
             logger.error(f"Error in scene context analysis: {str(e)}")
-            return {"status": "error", "message": str(e)}
+            return with_timings({"status": "error", "message": str(e)}, timings, started)
+    
+    async def close(self):
+        """Close the pooled HTTP client"""
+        await self.client.aclose()
     
     async def __aenter__(self):
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        await self.client.aclose()
\ No newline at end of file
+        await self.close()
\ No newline at end of file
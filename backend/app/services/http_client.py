@@ -0,0 +1,121 @@
+import httpx
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, Optional, Tuple
+from loguru import logger
+
+from app.core.config import settings
+
+class ConnectionPoolMonitor:
+    """Tracks connection reuse of a pooled AI provider client using httpcore trace events"""
+    
+    def __init__(self, name: str):
+        self.name = name
+        self.requests = 0
+        self.connections_opened = 0
+        self.tls_handshakes = 0
+        self.connect_failures = 0
+    
+    async def on_request(self, request: httpx.Request):
+        """httpx request hook that attaches the trace callback to every outgoing request"""
+        self.requests += 1
+        request.extensions["trace"] = self._trace
+    
+    async def _trace(self, event_name: str, info: Dict[str, Any]):
+        # A TCP connect only happens when no idle keep-alive connection was available
+        if event_name == "connection.connect_tcp.complete":
+            self.connections_opened += 1
+        elif event_name == "connection.start_tls.complete":
+            self.tls_handshakes += 1
+        elif event_name == "connection.connect_tcp.failed":
+            self.connect_failures += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get connection pool statistics"""
+        reused = max(0, self.requests - self.connections_opened)
+        return {
+            "client": self.name,
+            "requests": self.requests,
+            "connections_opened": self.connections_opened,
+            "tls_handshakes": self.tls_handshakes,
+            "connect_failures": self.connect_failures,
+            "reused_connections": reused,
+            "reuse_ratio": round(reused / self.requests, 4) if self.requests else 0.0
+        }
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (delta-seconds or HTTP-date) into seconds"""
+    if not value:
+        return None
+    
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def _http2_available() -> bool:
+    """Check whether the optional h2 package needed for HTTP/2 is installed"""
+    try:
+        import h2  # noqa
+        return True
+    except ImportError:
+        return False
+
+def create_ai_http_client(timeout: float, monitor: Optional[ConnectionPoolMonitor] = None) -> httpx.AsyncClient:
+    """
+    Create a long-lived, pooled HTTP client for an AI provider
+    
+    Args:
+        timeout: Read/write timeout in seconds
+        monitor: Optional pool monitor to record connection reuse
+    
+    Returns:
+        Configured httpx.AsyncClient (caller is responsible for closing it)
+    """
+    http2 = settings.AI_HTTP2_ENABLED
+    if http2 and not _http2_available():
+        logger.warning("AI_HTTP2_ENABLED is set but the 'h2' package is not installed - falling back to HTTP/1.1")
+        http2 = False
+    
+    limits = httpx.Limits(
+        max_connections=settings.AI_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.AI_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.AI_HTTP_KEEPALIVE_EXPIRY
+    )
+    
+    event_hooks = {"request": [monitor.on_request]} if monitor else None
+    
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(timeout, connect=settings.AI_HTTP_CONNECT_TIMEOUT),
+        limits=limits,
+        http2=http2,
+        event_hooks=event_hooks
+    )
+
+async def post_timed(client: httpx.AsyncClient, url: str, **kwargs) -> Tuple[httpx.Response, Dict[str, float]]:
+    """
+    POST and read the whole response, timing the response headers and the body separately
+    
+    Returns:
+        The response (body already read) and {"ttfb": seconds, "request": seconds}
+    """
+    started = time.perf_counter()
+    async with client.stream("POST", url, **kwargs) as response:
+        ttfb = time.perf_counter() - started
+        await response.aread()
+    
+    return response, {
+        "ttfb": round(ttfb, 4),
+        "request": round(time.perf_counter() - started, 4)
+    }
+
+def with_timings(result: Dict[str, Any], timings: Dict[str, float], started: float) -> Dict[str, Any]:
+    """Attach per-step timings and the wall-clock processing time (seconds) to a service result"""
+    result["timings"] = timings
+    result["processing_time"] = round(time.perf_counter() - started, 4)
+    return result
\ No newline at end of file
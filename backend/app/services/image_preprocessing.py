@@ -0,0 +1,454 @@
+import base64
+import hashlib
+import io
+from typing import Dict, Any, Optional, List, Tuple, Union
+import cv2
+import numpy as np
+from PIL import Image
+from loguru import logger
+
+from app.core.config import settings
+
+# Lowest quality the size-budget loop will go to before shrinking the image further
+MIN_ENCODE_QUALITY = 40
+
+# Crops are re-encoded once more before the provider budget applies, keep them near lossless
+CROP_ENCODE_QUALITY = 95
+
+# Black gap between mosaic tiles so a box at a tile edge cannot run into the next frame
+MOSAIC_TILE_GAP = 8
+
+_MIME_TYPES = {
+    "jpeg": "image/jpeg",
+    "webp": "image/webp",
+    "png": "image/png"
+}
+
+def detect_image_format(image_data: bytes) -> Optional[str]:
+    """Detect the image format from its magic bytes"""
+    if image_data[:3] == b"\xff\xd8\xff":
+        return "jpeg"
+    if image_data[:8] == b"\x89PNG\r\n\x1a\n":
+        return "png"
+    if image_data[:4] == b"RIFF" and image_data[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+class ProviderImageBudget:
+    """Resolution, quality and payload size limits for images sent to one provider"""
+    
+    def __init__(self, max_dimension: int, max_bytes: int, quality: int, image_format: str, detail: str):
+        self.max_dimension = max_dimension
+        self.max_bytes = max_bytes
+        self.quality = quality
+        self.image_format = image_format
+        self.detail = detail
+    
+    @classmethod
+    def for_provider(cls, provider: str) -> "ProviderImageBudget":
+        """Build the configured budget for 'llama', 'gpt4o' or 'scene' (GPT-4o scene context)"""
+        if provider == "llama":
+            return cls(
+                max_dimension=settings.LLAMA_IMAGE_MAX_DIMENSION,
+                max_bytes=settings.LLAMA_IMAGE_MAX_BYTES,
+                quality=settings.AI_IMAGE_QUALITY,
+                image_format=settings.AI_IMAGE_FORMAT,
+                detail=settings.LLAMA_IMAGE_DETAIL
+            )
+        if provider == "scene":
+            return cls(
+                max_dimension=settings.SCENE_CONTEXT_IMAGE_MAX_DIMENSION,
+                max_bytes=settings.GPT4O_IMAGE_MAX_BYTES,
+                quality=settings.AI_IMAGE_QUALITY,
+                image_format=settings.AI_IMAGE_FORMAT,
+                detail=settings.SCENE_CONTEXT_IMAGE_DETAIL
+            )
+        return cls(
+            max_dimension=settings.GPT4O_IMAGE_MAX_DIMENSION,
+            max_bytes=settings.GPT4O_IMAGE_MAX_BYTES,
+            quality=settings.AI_IMAGE_QUALITY,
+            image_format=settings.AI_IMAGE_FORMAT,
+            detail=settings.GPT4O_IMAGE_DETAIL
+        )
+
+class EncodedImage:
+    """Image payload prepared for a provider, with the mapping back to original coordinates"""
+    
+    def __init__(self,
+                 data: bytes,
+                 image_format: str,
+                 width: int,
+                 height: int,
+                 original_width: int,
+                 original_height: int,
+                 detail: str = "high",
+                 offset: Tuple[int, int] = (0, 0)):
+        self.data = data
+        self.image_format = image_format
+        self.width = width
+        self.height = height
+        self.original_width = original_width
+        self.original_height = original_height
+        self.detail = detail
+        self.offset = offset
+        self._data_url: Optional[str] = None
+    
+    @property
+    def mime_type(self) -> str:
+        return _MIME_TYPES.get(self.image_format, "image/jpeg")
+    
+    @property
+    def scale_x(self) -> float:
+        return self.original_width / self.width if self.width else 1.0
+    
+    @property
+    def scale_y(self) -> float:
+        return self.original_height / self.height if self.height else 1.0
+    
+    def to_data_url(self) -> str:
+        """Base64 data URL for the OpenAI-compatible image_url content part (encoded once)"""
+        if self._data_url is None:
+            self._data_url = f"data:{self.mime_type};base64,{base64.b64encode(self.data).decode('utf-8')}"
+        return self._data_url
+    
+    def to_content_part(self) -> Dict[str, Any]:
+        """OpenAI-compatible image_url content part"""
+        return {
+            "type": "image_url",
+            "image_url": {
+                "url": self.to_data_url(),
+                "detail": self.detail
+            }
+        }
+    
+    def rescale_bounding_box(self, bounding_box: List[float]) -> List[float]:
+        """Map an [x1, y1, x2, y2] box from the sent image back to original pixel coordinates"""
+        if not bounding_box or len(bounding_box) != 4:
+            return bounding_box
+        
+        try:
+            values = [float(v) for v in bounding_box]
+        except (TypeError, ValueError):
+            return bounding_box
+        
+        offset_x, offset_y = self.offset
+        x1, y1, x2, y2 = values
+        
+        if all(0.0 <= v <= 1.0 for v in values):
+            # Normalized (0..1) boxes are resolution independent, unless the image is a crop
+            if not (offset_x or offset_y) or not self.original_width:
+                return bounding_box
+            return [
+                round(x1 * self.original_width) + offset_x,
+                round(y1 * self.original_height) + offset_y,
+                round(x2 * self.original_width) + offset_x,
+                round(y2 * self.original_height) + offset_y
+            ]
+        
+        if self.scale_x == 1.0 and self.scale_y == 1.0 and not (offset_x or offset_y):
+            return bounding_box
+        
+        return [
+            round(x1 * self.scale_x) + offset_x,
+            round(y1 * self.scale_y) + offset_y,
+            round(x2 * self.scale_x) + offset_x,
+            round(y2 * self.scale_y) + offset_y
+        ]
+    
+    def get_metadata(self) -> Dict[str, Any]:
+        """Payload information for logging and results"""
+        return {
+            "format": self.image_format,
+            "width": self.width,
+            "height": self.height,
+            "original_width": self.original_width,
+            "original_height": self.original_height,
+            "offset": list(self.offset),
+            "payload_bytes": len(self.data)
+        }
+
+def prepare_image(image_data: bytes,
+                  budget: ProviderImageBudget,
+                  decoded: Optional[np.ndarray] = None) -> EncodedImage:
+    """
+    Downscale and re-encode an image to fit a provider's budget
+    
+    Args:
+        image_data: Original encoded image bytes
+        budget: Target resolution, quality and size limits
+        decoded: Already decoded BGR pixels of image_data, if available
+    
+    Returns:
+        EncodedImage ready to be base64-encoded into a request
+    """
+    source_format = detect_image_format(image_data)
+    image = decoded if decoded is not None else _decode_color(image_data)
+    if image is None:
+        # Not decodable by OpenCV - send as-is and let the provider decide
+        logger.warning("Could not decode image for preprocessing, sending original bytes")
+        return EncodedImage(image_data, source_format or "jpeg", 0, 0, 0, 0, budget.detail)
+    
+    original_height, original_width = image.shape[:2]
+    
+    # Already within budget in a lossy format - avoid a generational re-encode
+    if (source_format in ("jpeg", "webp")
+            and max(original_width, original_height) <= budget.max_dimension
+            and len(image_data) <= budget.max_bytes):
+        return EncodedImage(
+            image_data, source_format,
+            original_width, original_height,
+            original_width, original_height,
+            budget.detail
+        )
+    
+    max_dimension = budget.max_dimension
+    while True:
+        resized = _resize_to_fit(image, max_dimension)
+        quality = budget.quality
+        
+        while True:
+            encoded = _encode(resized, budget.image_format, quality)
+            if len(encoded) <= budget.max_bytes or quality <= MIN_ENCODE_QUALITY:
+                break
+            quality = max(MIN_ENCODE_QUALITY, quality - 10)
+        
+        if len(encoded) <= budget.max_bytes or max_dimension <= 256:
+            break
+        max_dimension = int(max_dimension * 0.75)
+    
+    height, width = resized.shape[:2]
+    return EncodedImage(
+        encoded, budget.image_format,
+        width, height,
+        original_width, original_height,
+        budget.detail
+    )
+
+class PreparedFrame:
+    """
+    A frame prepared once and shared by every pipeline stage
+    
+    Holds the content hash, header-only metadata, a reduced grayscale preview for
+    the CPU gates and the provider payloads, each computed lazily at most once.
+    """
+    
+    def __init__(self, frame_data: bytes, offset: Tuple[int, int] = (0, 0)):
+        self.data = frame_data
+        self.offset = offset
+        self._content_hash: Optional[str] = None
+        self._metadata: Optional[Dict[str, Any]] = None
+        self._gray_preview: Optional[np.ndarray] = None
+        self._gray_preview_loaded = False
+        self._decoded: Optional[np.ndarray] = None
+        self._decoded_loaded = False
+        self._encoded: Dict[tuple, EncodedImage] = {}
+    
+    @classmethod
+    def ensure(cls, frame: Union["PreparedFrame", bytes]) -> "PreparedFrame":
+        """Wrap raw bytes, or return an already prepared frame unchanged"""
+        return frame if isinstance(frame, cls) else cls(frame)
+    
+    @property
+    def content_hash(self) -> str:
+        """SHA-256 of the original frame bytes"""
+        if self._content_hash is None:
+            self._content_hash = hashlib.sha256(self.data).hexdigest()
+        return self._content_hash
+    
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        """Image size and format read from the header only (pixels are not decoded)"""
+        if self._metadata is None:
+            try:
+                # Image.open only parses the header until pixel data is accessed
+                with Image.open(io.BytesIO(self.data)) as image:
+                    self._metadata = {
+                        "width": image.width,
+                        "height": image.height,
+                        "format": image.format,
+                        "mode": image.mode,
+                        "size_bytes": len(self.data)
+                    }
+            except Exception as e:
+                logger.error(f"Error extracting image metadata: {str(e)}")
+                self._metadata = {}
+        return self._metadata
+    
+    @property
+    def gray_preview(self) -> Optional[np.ndarray]:
+        """Grayscale frame decoded at 1/4 scale, shared by the motion and near-duplicate gates"""
+        if not self._gray_preview_loaded:
+            buffer = np.frombuffer(self.data, dtype=np.uint8)
+            self._gray_preview = cv2.imdecode(buffer, cv2.IMREAD_REDUCED_GRAYSCALE_4)
+            self._gray_preview_loaded = True
+        return self._gray_preview
+    
+    @property
+    def decoded(self) -> Optional[np.ndarray]:
+        """Full resolution BGR pixels"""
+        if not self._decoded_loaded:
+            self._decoded = _decode_color(self.data)
+            self._decoded_loaded = True
+        return self._decoded
+    
+    def warm(self) -> "PreparedFrame":
+        """Compute the hash, header metadata and grayscale preview now (on an image worker)"""
+        self.content_hash
+        self.metadata
+        self.gray_preview
+        return self
+    
+    def encoded_for(self, budget: ProviderImageBudget) -> EncodedImage:
+        """Provider payload for a budget, encoded once and reused by later stages"""
+        key = (budget.max_dimension, budget.max_bytes, budget.quality, budget.image_format, budget.detail)
+        encoded = self._encoded.get(key)
+        if encoded is None:
+            source_format = detect_image_format(self.data)
+            width, height = self.metadata.get("width"), self.metadata.get("height")
+            
+            if (source_format in ("jpeg", "webp")
+                    and width is not None
+                    and max(width, height) <= budget.max_dimension
+                    and len(self.data) <= budget.max_bytes):
+                # The header says the original fits - send it without decoding any pixels
+                encoded = EncodedImage(self.data, source_format, width, height, width, height, budget.detail)
+            else:
+                encoded = prepare_image(self.data, budget, decoded=self.decoded)
+            encoded.offset = self.offset
+            self._encoded[key] = encoded
+        return encoded
+    
+    def crop(self, box: List[int], mask_polygons: Optional[List[np.ndarray]] = None) -> "PreparedFrame":
+        """
+        Region of this frame as a new frame
+        
+        Boxes reported against the crop's payloads map back to this frame's coordinates.
+        
+        Args:
+            box: [x1, y1, x2, y2] in this frame's pixels
+            mask_polygons: Optional polygons (int32 point arrays in this frame's pixels);
+                pixels of the region outside all of them are blanked
+        """
+        x1, y1, x2, y2 = box
+        region = self.decoded[y1:y2, x1:x2]
+        if mask_polygons:
+            # Flat black areas cost next to nothing once encoded
+            mask = np.zeros(region.shape[:2], dtype=np.uint8)
+            cv2.fillPoly(mask, [polygon - np.array([x1, y1], dtype=np.int32) for polygon in mask_polygons], 255)
+            region = cv2.bitwise_and(region, region, mask=mask)
+        
+        cropped = PreparedFrame(
+            _encode(region, "jpeg", CROP_ENCODE_QUALITY),
+            offset=(self.offset[0] + x1, self.offset[1] + y1)
+        )
+        cropped._decoded = region
+        cropped._decoded_loaded = True
+        return cropped
+
+class MosaicLayout:
+    """Placement of frames in a mosaic, to map boxes reported per tile back to the frames"""
+    
+    def __init__(self, columns: int, rows: int, tile_size: int):
+        self.columns = columns
+        self.rows = rows
+        self.tile_size = tile_size
+        # Per tile: (x, y, scale, width, height, frame offset), None for undecodable frames
+        self.placements: List[Optional[Tuple[int, int, float, int, int, Tuple[int, int]]]] = []
+    
+    def to_frame_box(self, index: int, bounding_box: List[float], encoded: EncodedImage) -> List[float]:
+        """
+        Map an [x1, y1, x2, y2] box relative to a tile of the sent mosaic to frame pixels
+        
+        Args:
+            index: Tile index (0-based)
+            bounding_box: Box in payload pixels from the tile's corner, or normalized to the tile
+            encoded: The mosaic payload the box refers to
+        """
+        placement = self.placements[index] if 0 <= index < len(self.placements) else None
+        if placement is None or not bounding_box or len(bounding_box) != 4:
+            return bounding_box
+        
+        try:
+            values = [float(v) for v in bounding_box]
+        except (TypeError, ValueError):
+            return bounding_box
+        
+        _, _, scale, width, height, (offset_x, offset_y) = placement
+        if all(0.0 <= v <= 1.0 for v in values):
+            tile_pixels = [v * self.tile_size for v in values]
+        else:
+            tile_pixels = [v * encoded.scale_x if i % 2 == 0 else v * encoded.scale_y for i, v in enumerate(values)]
+        
+        x1, y1, x2, y2 = (v / scale for v in tile_pixels)
+        return [
+            round(min(max(x1, 0), width)) + offset_x,
+            round(min(max(y1, 0), height)) + offset_y,
+            round(min(max(x2, 0), width)) + offset_x,
+            round(min(max(y2, 0), height)) + offset_y
+        ]
+
+def build_mosaic(frames: List[PreparedFrame], tile_size: int) -> Tuple[Optional[PreparedFrame], MosaicLayout]:
+    """
+    Tile frames into one grid image, numbered left to right, top to bottom
+    
+    Frames are downscaled to fit a tile_size square, keeping their aspect ratio, and
+    placed in the tile's top-left corner with their number drawn over it.
+    
+    Returns:
+        Tuple of (mosaic frame, or None if no frame could be decoded, layout)
+    """
+    columns = int(np.ceil(np.sqrt(len(frames))))
+    rows = int(np.ceil(len(frames) / columns))
+    layout = MosaicLayout(columns, rows, tile_size)
+    canvas = np.zeros(
+        (rows * tile_size + (rows - 1) * MOSAIC_TILE_GAP, columns * tile_size + (columns - 1) * MOSAIC_TILE_GAP, 3),
+        dtype=np.uint8
+    )
+    
+    for index, frame in enumerate(frames):
+        image = frame.decoded
+        if image is None:
+            layout.placements.append(None)
+            continue
+        
+        height, width = image.shape[:2]
+        tile = _resize_to_fit(image, tile_size)
+        x = (index % columns) * (tile_size + MOSAIC_TILE_GAP)
+        y = (index // columns) * (tile_size + MOSAIC_TILE_GAP)
+        canvas[y:y + tile.shape[0], x:x + tile.shape[1]] = tile
+        
+        cv2.rectangle(canvas, (x, y), (x + 36, y + 28), (0, 0, 0), -1)
+        cv2.putText(canvas, str(index + 1), (x + 6, y + 22), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
+        layout.placements.append((x, y, tile.shape[1] / width, width, height, frame.offset))
+    
+    if not any(layout.placements):
+        return None, layout
+    
+    mosaic = PreparedFrame(_encode(canvas, "jpeg", CROP_ENCODE_QUALITY))
+    mosaic._decoded = canvas
+    mosaic._decoded_loaded = True
+    return mosaic, layout
+
+def _decode_color(image_data: bytes) -> Optional[np.ndarray]:
+    return cv2.imdecode(np.frombuffer(image_data, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+def _resize_to_fit(image: np.ndarray, max_dimension: int) -> np.ndarray:
+    height, width = image.shape[:2]
+    longest = max(width, height)
+    if longest <= max_dimension:
+        return image
+    
+    scale = max_dimension / longest
+    size = (max(1, int(width * scale)), max(1, int(height * scale)))
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+def _encode(image: np.ndarray, image_format: str, quality: int) -> bytes:
+    if image_format == "webp":
+        success, buffer = cv2.imencode(".webp", image, [cv2.IMWRITE_WEBP_QUALITY, quality])
+    else:
+        success, buffer = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    
+    if not success:
+        raise ValueError(f"Failed to encode image as {image_format}")
+    
+    return buffer.tobytes()
\ No newline at end of file
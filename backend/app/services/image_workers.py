@@ -0,0 +1,156 @@
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Dict, Any, Optional, List, Tuple, Callable
+from loguru import logger
+
+from app.core.config import settings
+from app.services.pipeline_metrics import record_image_work, record_image_queue
+
+class _ImageJob:
+    __slots__ = ("operation", "func", "args", "future", "cost", "submitted_at", "run_seconds")
+    
+    def __init__(self, operation: str, func: Callable[..., Any], args: tuple, future: asyncio.Future, cost: int):
+        self.operation = operation
+        self.func = func
+        self.args = args
+        self.future = future
+        self.cost = cost
+        self.submitted_at = time.perf_counter()
+        self.run_seconds = 0.0
+
+class ImageWorkerPool:
+    """
+    Runs CPU-bound image work (decoding, resizing, encoding, hashing) off the event loop
+    
+    Threads rather than processes: OpenCV, PIL and hashlib release the GIL in their heavy
+    loops, and a frame's lazily computed payloads stay shared with the rest of the
+    pipeline instead of being pickled across. Waiting jobs start in order of submission
+    time plus cost / cost_rate, so a burst of large frames only briefly holds up small
+    ones and a large frame is never starved. At most queue_size jobs wait for a worker;
+    further callers wait for a queue slot, which pushes back on the producers.
+    """
+    
+    def __init__(self, workers: int = None, queue_size: int = None, cost_rate: float = None):
+        self.num_workers = workers or settings.IMAGE_WORKERS or min(8, os.cpu_count() or 1)
+        self.queue_size = queue_size if queue_size is not None else settings.IMAGE_WORK_QUEUE_SIZE
+        self.cost_rate = cost_rate if cost_rate is not None else settings.IMAGE_WORK_BYTES_PER_SECOND
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots = asyncio.Semaphore(self.queue_size + self.num_workers)
+        self._heap: List[Tuple[float, int, _ImageJob]] = []
+        self._sequence = itertools.count()
+        self._running = 0
+        
+        # Counters
+        self.completed = 0
+        self.failed = 0
+        self.throttled = 0
+        self.max_queued = 0
+        self.queued_seconds = 0.0
+        self.run_seconds = 0.0
+    
+    async def run(self, operation: str, func: Callable[..., Any], *args, cost: int = 0) -> Any:
+        """
+        Run func(*args) on a worker thread
+        
+        Args:
+            operation: Name of the work for metrics (preprocess, encode, crop, ...)
+            func: CPU-bound callable
+            cost: Estimated size of the work in bytes of image data
+        
+        Returns:
+            What func returned (its exceptions are raised here)
+        """
+        if not settings.IMAGE_WORKER_POOL_ENABLED:
+            return func(*args)
+        
+        if self._slots.locked():
+            self.throttled += 1
+        
+        async with self._slots:
+            job = _ImageJob(operation, func, args, asyncio.get_running_loop().create_future(), cost)
+            start_by = job.submitted_at + cost / self.cost_rate
+            heapq.heappush(self._heap, (start_by, next(self._sequence), job))
+            self.max_queued = max(self.max_queued, len(self._heap))
+            self._dispatch()
+            return await job.future
+    
+    def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while self._running < self.num_workers and self._heap:
+            _, _, job = heapq.heappop(self._heap)
+            if job.future.done():
+                # Caller went away while the job was queued
+                continue
+            
+            self._running += 1
+            queued_seconds = time.perf_counter() - job.submitted_at
+            work = loop.run_in_executor(self._get_executor(), self._call, job)
+            work.add_done_callback(partial(self._finished, job, queued_seconds))
+        
+        record_image_queue(len(self._heap), self._running)
+    
+    @staticmethod
+    def _call(job: _ImageJob) -> Any:
+        started = time.perf_counter()
+        try:
+            return job.func(*job.args)
+        finally:
+            job.run_seconds = time.perf_counter() - started
+    
+    def _finished(self, job: _ImageJob, queued_seconds: float, work: asyncio.Future):
+        self._running -= 1
+        self.queued_seconds += queued_seconds
+        self.run_seconds += job.run_seconds
+        record_image_work(job.operation, queued_seconds, job.run_seconds)
+        
+        error = work.exception()
+        if error is not None:
+            self.failed += 1
+        else:
+            self.completed += 1
+        
+        if not job.future.done():
+            if error is not None:
+                job.future.set_exception(error)
+            else:
+                job.future.set_result(work.result())
+        
+        self._dispatch()
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.num_workers, thread_name_prefix="image-worker")
+        return self._executor
+    
+    def shutdown(self):
+        """Stop the worker threads, dropping jobs that have not started"""
+        if self._executor is not None:
+            logger.info(f"Stopping image workers ({len(self._heap)} jobs queued, {self._running} running)")
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get image worker statistics"""
+        finished = self.completed + self.failed
+        
+        return {
+            "enabled": settings.IMAGE_WORKER_POOL_ENABLED,
+            "workers": self.num_workers,
+            "running": self._running,
+            "queued": len(self._heap),
+            "queue_size": self.queue_size,
+            "max_queued": self.max_queued,
+            "completed": self.completed,
+            "failed": self.failed,
+            "throttled": self.throttled,
+            "avg_queued_ms": round(self.queued_seconds / finished * 1000, 3) if finished else 0.0,
+            "avg_run_ms": round(self.run_seconds / finished * 1000, 3) if finished else 0.0
+        }
+
+# Shared by every service of the process, so all image work is bounded together
+image_workers = ImageWorkerPool()
\ No newline at end of file
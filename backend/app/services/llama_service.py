@@ -1,15 +1,20 @@
-import httpx
-import base64
 import asyncio
-from typing import Dict, Any, Optional, List
+import time
+from typing import Dict, Any, Optional, List, Tuple, Union
 from loguru import logger
 import cv2
 import numpy as np
-from PIL import Image
-import io
 
 from app.core.config import settings
 from app.models.violation import ViolationType, ViolationSeverity
+from app.services.http_client import ConnectionPoolMonitor, create_ai_http_client, parse_retry_after, with_timings
+from app.services.provider_resilience import CircuitOpenError, ProviderEndpoint, ProviderRouter
+from app.services.image_preprocessing import EncodedImage, MosaicLayout, PreparedFrame, ProviderImageBudget, build_mosaic
+from app.services.image_workers import image_workers
+from app.services.mosaic_batcher import MosaicBatcher
+from app.services.streaming import StreamingViolationsScanner, iter_sse_deltas
+from app.services.structured_output import NO_JSON_ERROR, llama_detection_parser, llama_mosaic_parser
+from app.schemas.ai_output import LlamaDetection
 
 class LlamaVisionService:
     """Llama 4 Maverick Vision AI Service for traffic violation detection"""
@@ -17,22 +22,43 @@ class LlamaVisionService:
     def __init__(self):
         self.api_key = settings.LLAMA_API_KEY
         self.api_url = settings.LLAMA_API_URL
-        self.client = httpx.AsyncClient(timeout=30.0)
+        self.pool_monitor = ConnectionPoolMonitor("llama")
+        self.client = create_ai_http_client(timeout=30.0, monitor=self.pool_monitor)
+        self.router = ProviderRouter(
+            "llama", self.api_url, self.api_key,
+            settings.LLAMA_SECONDARY_API_URL, settings.LLAMA_SECONDARY_API_KEY
+        )
+        self.image_budget = ProviderImageBudget.for_provider("llama")
+        self.mosaic_batcher = MosaicBatcher(self.analyze_mosaic) if settings.MOSAIC_BATCHING_ENABLED else None
         
-    async def analyze_image(self, image_data: bytes, context: Dict[str, Any] = None) -> Dict[str, Any]:
+    async def analyze_image(self,
+                            image_data: Union[PreparedFrame, bytes],
+                            context: Dict[str, Any] = None,
+                            violations_ready: Optional[asyncio.Future] = None,
+                            mosaic: bool = True) -> Dict[str, Any]:
         """
         Analyze image using Llama 4 Maverick for traffic violations
         
         Args:
-            image_data: Raw image bytes
+            image_data: Prepared frame (or raw image bytes)
             context: Additional context (camera location, time, etc.)
+            violations_ready: Optional future resolved with the violations list as soon as
+                it has streamed in (or with None if it is not available early)
+            mosaic: Allow sending the frame as a tile of a batched mosaic request
             
         Returns:
-            Analysis results with detected violations
+            Analysis results with detected violations, per-step "timings" and token "usage"
         """
+        started = time.perf_counter()
+        timings: Dict[str, float] = {}
         try:
-            # Encode image to base64
-            base64_image = base64.b64encode(image_data).decode('utf-8')
+            # Downscale and re-encode to the provider's payload budget (once per frame)
+            frame = PreparedFrame.ensure(image_data)
+            if mosaic and self.mosaic_batcher:
+                return await self.mosaic_batcher.submit(frame, context or {})
+            
+            encoded_image = await image_workers.run("encode", frame.encoded_for, self.image_budget, cost=len(frame.data))
+            timings["encode"] = round(time.perf_counter() - started, 4)
             
             # Prepare the prompt for traffic violation detection
             prompt = self._build_analysis_prompt(context)
@@ -44,13 +70,7 @@ class LlamaVisionService:
                         "role": "user",
                         "content": [
                             {"type": "text", "text": prompt},
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{base64_image}",
-                                    "detail": "high"
-                                }
-                            }
+                            encoded_image.to_content_part()
                         ]
                     }
                 ],
@@ -58,27 +78,130 @@ class LlamaVisionService:
                 "temperature": 0.1
             }
             
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
+            if settings.AI_STREAMING_ENABLED:
+                attempts = []
+                
+                def attempt(endpoint: ProviderEndpoint):
+                    # Only the first attempt hands its violations out early; once it has,
+                    # a hedge must not answer with violations nobody verified
+                    ready = violations_ready if not attempts else None
+                    attempts.append(endpoint)
+                    return self._analyze_streaming(endpoint, payload, frame, encoded_image, ready)
+                
+                result, request_timings = await self.router.call(
+                    attempt,
+                    is_failure=lambda result: result[0].get("status_code", 0) >= 500,
+                    hedge_while=lambda: violations_ready is None or not violations_ready.done()
+                )
+                timings.update(request_timings)
+                return with_timings(result, timings, started)
             
-            response = await self.client.post(
-                f"{self.api_url}/chat/completions",
-                json=payload,
-                headers=headers
-            )
+            response, request_timings = await self.router.post(self.client, "/chat/completions", payload)
+            timings.update(request_timings)
             
             if response.status_code == 200:
                 result = response.json()
-                return await self._parse_llama_response(result, image_data)
+                parse_started = time.perf_counter()
+                analysis = await self._parse_llama_response(result, frame, encoded_image)
+                timings["parse"] = round(time.perf_counter() - parse_started, 4)
+                return with_timings(analysis, timings, started)
             else:
                 logger.error(f"Llama API error: {response.status_code} - {response.text}")
-                return {"error": f"API error: {response.status_code}"}
+                return with_timings({
+                    "error": f"API error: {response.status_code}",
+                    "status_code": response.status_code,
+                    "retry_after": parse_retry_after(response.headers.get("Retry-After"))
+                }, timings, started)
                 
+        except CircuitOpenError as e:
+            logger.warning(f"Skipping Llama analysis: {str(e)}")
+            return with_timings({
+                "error": str(e),
+                "status_code": 503,
+                "retry_after": e.retry_after,
+                "circuit_open": True
+            }, timings, started)
+        
         except Exception as e:
             logger.error(f"Error in Llama vision analysis: {str(e)}")
-            return {"error": str(e)}
+            return with_timings({"error": str(e)}, timings, started)
+        
+        finally:
+            if violations_ready is not None and not violations_ready.done():
+                violations_ready.set_result(None)
+    
+    async def _analyze_streaming(self,
+                                 endpoint: ProviderEndpoint,
+                                 payload: Dict[str, Any],
+                                 frame: PreparedFrame,
+                                 encoded_image: EncodedImage,
+                                 violations_ready: Optional[asyncio.Future]) -> Tuple[Dict[str, Any], Dict[str, float]]:
+        """
+        Stream the completion and act on the violations array as soon as it closes
+        
+        An empty array ends the request early - the rest of the answer (scene analysis)
+        is not needed when there is nothing to verify or report.
+        
+        Returns:
+            The analysis and its ttfb/request/parse timings
+        """
+        payload = {**payload, "stream": True, "stream_options": {"include_usage": True}}
+        scanner = StreamingViolationsScanner()
+        usage: Dict[str, Any] = {}
+        timings: Dict[str, float] = {}
+        request_started = time.perf_counter()
+        
+        async with self.client.stream(
+            "POST",
+            f"{endpoint.url}/chat/completions",
+            json=payload,
+            headers=endpoint.headers()
+        ) as response:
+            if response.status_code != 200:
+                body = await response.aread()
+                logger.error(f"Llama API error: {response.status_code} - {body[:500]!r}")
+                return {
+                    "error": f"API error: {response.status_code}",
+                    "status_code": response.status_code,
+                    "retry_after": parse_retry_after(response.headers.get("Retry-After"))
+                }, timings
+            
+            async for delta, chunk_usage in iter_sse_deltas(response):
+                if chunk_usage:
+                    usage = chunk_usage
+                if delta and "ttfb" not in timings:
+                    timings["ttfb"] = round(time.perf_counter() - request_started, 4)
+                
+                violations = scanner.feed(delta)
+                if violations is None:
+                    continue
+                
+                if not violations:
+                    # Closing the stream drops the connection, which is cheaper than
+                    # waiting for the remaining tokens of a frame with nothing in it
+                    timings["request"] = round(time.perf_counter() - request_started, 4)
+                    return {
+                        "service": "llama-4-maverick",
+                        "analysis": {"violations": [], "scene_analysis": {}},
+                        "image_metadata": frame.metadata,
+                        "payload": encoded_image.get_metadata(),
+                        "terminated_early": True
+                    }, timings
+                
+                if violations_ready is not None and not violations_ready.done():
+                    early = LlamaDetection(violations=violations).model_dump(exclude_none=True)["violations"]
+                    violations_ready.set_result(self._rescale_violations(early, encoded_image))
+        
+        timings["request"] = round(time.perf_counter() - request_started, 4)
+        
+        result = {
+            "choices": [{"message": {"content": scanner.buffer}}],
+            "usage": usage
+        }
+        parse_started = time.perf_counter()
+        analysis = await self._parse_llama_response(result, frame, encoded_image)
+        timings["parse"] = round(time.perf_counter() - parse_started, 4)
+        return analysis, timings
     
     def _build_analysis_prompt(self, context: Dict[str, Any] = None) -> str:
         """Build analysis prompt for traffic violation detection"""
@@ -132,37 +255,237 @@ class LlamaVisionService:
         """
         
         if context:
-            location = context.get('location', 'Unknown')
-            camera_type = context.get('camera_type', 'general')
-            base_prompt += f"\n\nContext: Location: {location}, Camera Type: {camera_type}"
+            base_prompt += "\n\n" + "\n".join(self._context_lines(context))
         
         return base_prompt
     
-    async def _parse_llama_response(self, response: Dict[str, Any], image_data: bytes) -> Dict[str, Any]:
+    @staticmethod
+    def _context_lines(context: Dict[str, Any]) -> List[str]:
+        """Prompt lines describing where a frame comes from and how it was prepared"""
+        location = context.get('location', 'Unknown')
+        camera_type = context.get('camera_type', 'general')
+        lines = [f"Context: Location: {location}, Camera Type: {camera_type}"]
+        
+        detected_objects = context.get('detected_objects')
+        if detected_objects:
+            counts = {label: detected_objects.count(label) for label in dict.fromkeys(detected_objects)}
+            summary = ", ".join(f"{count} {label}" for label, count in counts.items())
+            lines.append(f"A local detector found: {summary}. The image may be cropped to these road users.")
+        
+        if context.get('roi_applied'):
+            lines.append("The image shows only the camera's monitored zones; blacked-out areas are outside them.")
+        
+        scene_context = context.get('scene_context')
+        if scene_context:
+            conditions = "; ".join(f"{key.replace('_', ' ')}: {value}" for key, value in scene_context.items())
+            lines.append(f"Conditions recently observed at this location: {conditions}.")
+        
+        return lines
+    
+    def _build_mosaic_prompt(self, layout: MosaicLayout, contexts: List[Dict[str, Any]], encoded_image: EncodedImage) -> str:
+        """Build the detection prompt for a mosaic of frames"""
+        tile_pixels = round(layout.tile_size / encoded_image.scale_x) if encoded_image.width else layout.tile_size
+        
+        prompt = f"""
+        You are an advanced traffic violation detection AI. This image is a grid of {len(contexts)} unrelated
+        traffic camera frames ({layout.rows} rows x {layout.columns} columns of {tile_pixels}x{tile_pixels} pixel tiles,
+        separated by black gaps). Tiles are numbered left to right, top to bottom; the number is drawn in each
+        tile's top-left corner. Analyze every tile on its own and never combine evidence from different tiles.
+        
+        Look for: red light violations, speeding, no helmet, wrong lane, no seatbelt, mobile use,
+        illegal parking and any other traffic violations.
+        
+        Respond in JSON format with one entry per tile, including tiles without violations:
+        {{
+            "tiles": [
+                {{
+                    "tile": 1,
+                    "violations": [
+                        {{
+                            "type": "violation_type",
+                            "severity": "low/medium/high/critical",
+                            "confidence": 0.95,
+                            "license_plate": "ABC123",
+                            "vehicle_type": "car",
+                            "vehicle_color": "red",
+                            "description": "detailed description",
+                            "bounding_box": [x1, y1, x2, y2],
+                            "evidence_points": ["point1", "point2"]
+                        }}
+                    ],
+                    "scene_analysis": {{
+                        "weather": "clear/rainy/foggy",
+                        "lighting": "day/night/dawn/dusk",
+                        "traffic_density": "low/medium/high",
+                        "road_conditions": "good/poor",
+                        "visibility": "excellent/good/poor"
+                    }},
+                    "overall_confidence": 0.92
+                }}
+            ]
+        }}
+        Bounding boxes are in pixels from the top-left corner of their own tile.
+        """
+        
+        for index, context in enumerate(contexts):
+            prompt += f"\n\nTile {index + 1}:\n" + "\n".join(self._context_lines(context))
+        
+        return prompt
+    
+    async def analyze_mosaic(self, frames: List[PreparedFrame], contexts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Analyze several frames with one request by tiling them into a grid image
+        
+        Tiles the answer leaves out, frames that cannot be decoded and answers that
+        cannot be parsed fall back to one request per frame.
+        
+        Returns:
+            One analysis per frame, in order, like analyze_image
+        """
+        if len(frames) == 1:
+            return [await self.analyze_image(frames[0], contexts[0], mosaic=False)]
+        
+        started = time.perf_counter()
+        timings: Dict[str, float] = {}
+        results: List[Optional[Dict[str, Any]]] = [None] * len(frames)
+        try:
+            cost = sum(len(frame.data) for frame in frames)
+            mosaic, layout = await image_workers.run("mosaic", build_mosaic, frames, settings.MOSAIC_TILE_SIZE, cost=cost)
+            if mosaic is not None:
+                encoded_image = await image_workers.run("encode", mosaic.encoded_for, self.image_budget, cost=len(mosaic.data))
+                timings["encode"] = round(time.perf_counter() - started, 4)
+                
+                payload = {
+                    "model": "llama-3.2-90b-vision-preview",
+                    "messages": [
+                        {
+                            "role": "user",
+                            "content": [
+                                {"type": "text", "text": self._build_mosaic_prompt(layout, contexts, encoded_image)},
+                                encoded_image.to_content_part()
+                            ]
+                        }
+                    ],
+                    "max_tokens": 600 * len(frames),
+                    "temperature": 0.1
+                }
+                
+                response, request_timings = await self.router.post(self.client, "/chat/completions", payload)
+                timings.update(request_timings)
+                
+                if response.status_code != 200:
+                    logger.error(f"Llama API error: {response.status_code} - {response.text}")
+                    error = {
+                        "error": f"API error: {response.status_code}",
+                        "status_code": response.status_code,
+                        "retry_after": parse_retry_after(response.headers.get("Retry-After"))
+                    }
+                    return [with_timings(dict(error), dict(timings), started) for _ in frames]
+                
+                parse_started = time.perf_counter()
+                results = self._demultiplex_mosaic(response.json(), frames, layout, encoded_image)
+                timings["parse"] = round(time.perf_counter() - parse_started, 4)
+                results = [
+                    with_timings(result, dict(timings), started) if result is not None else None
+                    for result in results
+                ]
+        
+        except CircuitOpenError as e:
+            logger.warning(f"Skipping Llama mosaic analysis: {str(e)}")
+            return [
+                with_timings({
+                    "error": str(e),
+                    "status_code": 503,
+                    "retry_after": e.retry_after,
+                    "circuit_open": True
+                }, dict(timings), started)
+                for _ in frames
+            ]
+        
+        except Exception as e:
+            logger.error(f"Error in Llama mosaic analysis: {str(e)}")
+        
+        missing = [index for index, result in enumerate(results) if result is None]
+        if missing:
+            logger.warning(f"Mosaic answer covered {len(frames) - len(missing)}/{len(frames)} frames, analyzing the rest individually")
+            fallbacks = await asyncio.gather(*(
+                self.analyze_image(frames[index], contexts[index], mosaic=False) for index in missing
+            ))
+            for index, result in zip(missing, fallbacks):
+                results[index] = result
+        
+        return results
+    
+    def _demultiplex_mosaic(self,
+                            response: Dict[str, Any],
+                            frames: List[PreparedFrame],
+                            layout: MosaicLayout,
+                            encoded_image: EncodedImage) -> List[Optional[Dict[str, Any]]]:
+        """Split a mosaic answer into per-frame analyses, None for tiles it does not cover"""
+        results: List[Optional[Dict[str, Any]]] = [None] * len(frames)
+        detection, error = llama_mosaic_parser.parse(response['choices'][0]['message']['content'])
+        if detection is None:
+            logger.error(f"Error parsing Llama mosaic response: {error}")
+            return results
+        
+        for tile in detection.tiles:
+            index = (tile.tile or 0) - 1
+            if not 0 <= index < len(frames) or results[index] is not None or layout.placements[index] is None:
+                continue
+            
+            analysis_data = tile.model_dump(exclude_none=True, exclude={"tile"})
+            for violation in analysis_data.get("violations", []):
+                if violation.get("bounding_box"):
+                    violation["bounding_box"] = layout.to_frame_box(index, violation["bounding_box"], encoded_image)
+            
+            results[index] = {
+                "service": "llama-4-maverick",
+                "analysis": analysis_data,
+                "image_metadata": frames[index].metadata,
+                "mosaic": {"tile": index + 1, "tiles": len(frames), "payload": encoded_image.get_metadata()}
+            }
+        
+        # Each frame carries its share of the request, so per-frame cost stays comparable
+        answered = [result for result in results if result is not None]
+        usage = response.get('usage') or {}
+        for result in answered:
+            result["usage"] = {
+                key: round(value / len(answered)) for key, value in usage.items() if isinstance(value, (int, float))
+            }
+            result["tokens_used"] = result["usage"].get("total_tokens", 0)
+            result["payload"] = {
+                **encoded_image.get_metadata(),
+                "payload_bytes": round(len(encoded_image.data) / len(answered))
+            }
+        
+        return results
+    
+    async def _parse_llama_response(self,
+                                    response: Dict[str, Any],
+                                    frame: PreparedFrame,
+                                    encoded_image: EncodedImage) -> Dict[str, Any]:
         """Parse Llama API response and structure the results"""
         try:
             content = response['choices'][0]['message']['content']
             
-            # Try to extract JSON from the response
-            import json
-            import re
-            
-            # Look for JSON in the response
-            json_match = re.search(r'\{.*\}', content, re.DOTALL)
-            if json_match:
-                analysis_data = json.loads(json_match.group())
-            else:
-                # Fallback parsing if JSON not found
+            detection, error = llama_detection_parser.parse(content)
+            if detection is not None:
+                analysis_data = detection.model_dump(exclude_none=True)
+            elif error == NO_JSON_ERROR:
+                # Fallback if the model answered without JSON
                 analysis_data = {"violations": [], "scene_analysis": {}}
+            else:
+                raise ValueError(error)
             
-            # Enhance with image metadata
-            image_info = await self._extract_image_metadata(image_data)
+            self._rescale_violations(analysis_data.get("violations", []), encoded_image)
             
             return {
                 "service": "llama-4-maverick",
                 "analysis": analysis_data,
-                "image_metadata": image_info,
-                "processing_time": response.get('usage', {}).get('total_tokens', 0)
+                "image_metadata": frame.metadata,
+                "payload": encoded_image.get_metadata(),
+                "usage": response.get('usage') or {},
+                "tokens_used": (response.get('usage') or {}).get('total_tokens', 0)
             }
             
         except Exception as e:
@@ -173,22 +496,15 @@ class LlamaVisionService:
                 "raw_response": response
             }
     
-    async def _extract_image_metadata(self, image_data: bytes) -> Dict[str, Any]:
-        """Extract metadata from image"""
-        try:
-            image = Image.open(io.BytesIO(image_data))
-            return {
-                "width": image.width,
-                "height": image.height,
-                "format": image.format,
-                "mode": image.mode,
-                "size_bytes": len(image_data)
-            }
-        except Exception as e:
-            logger.error(f"Error extracting image metadata: {str(e)}")
-            return {}
+    @staticmethod
+    def _rescale_violations(violations: List[Dict[str, Any]], encoded_image: EncodedImage) -> List[Dict[str, Any]]:
+        """Map bounding boxes from the downscaled payload back to the original frame"""
+        for violation in violations:
+            if violation.get("bounding_box"):
+                violation["bounding_box"] = encoded_image.rescale_bounding_box(violation["bounding_box"])
+        return violations
     
-    async def batch_analyze(self, images: List[bytes], contexts: List[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    async def batch_analyze(self, images: List[Union[PreparedFrame, bytes]], contexts: List[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """Analyze multiple images in batch"""
         if contexts is None:
             contexts = [{}] * len(images)
@@ -213,8 +529,14 @@ class LlamaVisionService:
         
         return processed_results
     
+    async def close(self):
+        """Send frames waiting for a mosaic and close the pooled HTTP client"""
+        if self.mosaic_batcher:
+            await self.mosaic_batcher.close()
+        await self.client.aclose()
+    
     async def __aenter__(self):
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        await self.client.aclose()
\ No newline at end of file
+        await self.close()
\ No newline at end of file
@@ -0,0 +1,315 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Any, Optional, List, Tuple
+import cv2
+import numpy as np
+from loguru import logger
+
+from app.core.config import settings
+from app.services.image_preprocessing import PreparedFrame
+from app.services.image_workers import image_workers
+
+# COCO class names in model output order, used by YOLO-style ONNX exports
+COCO_CLASSES = [
+    "person", "bicycle", "car", "motorcycle", "airplane", "bus", "train", "truck", "boat",
+    "traffic light", "fire hydrant", "stop sign", "parking meter", "bench", "bird", "cat",
+    "dog", "horse", "sheep", "cow", "elephant", "bear", "zebra", "giraffe", "backpack",
+    "umbrella", "handbag", "tie", "suitcase", "frisbee", "skis", "snowboard", "sports ball",
+    "kite", "baseball bat", "baseball glove", "skateboard", "surfboard", "tennis racket",
+    "bottle", "wine glass", "cup", "fork", "knife", "spoon", "bowl", "banana", "apple",
+    "sandwich", "orange", "broccoli", "carrot", "hot dog", "pizza", "donut", "cake", "chair",
+    "couch", "potted plant", "bed", "dining table", "toilet", "tv", "laptop", "mouse",
+    "remote", "keyboard", "cell phone", "microwave", "oven", "toaster", "sink",
+    "refrigerator", "book", "clock", "vase", "scissors", "teddy bear", "hair drier",
+    "toothbrush"
+]
+
+class LocalDetection:
+    """Object found by a local detector, box in original frame pixels"""
+    
+    __slots__ = ("label", "confidence", "box")
+    
+    def __init__(self, label: str, confidence: float, box: List[int]):
+        self.label = label
+        self.confidence = confidence
+        self.box = box
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "label": self.label,
+            "confidence": round(self.confidence, 4),
+            "bounding_box": self.box
+        }
+
+class DetectorBackend(ABC):
+    """Interface of a local object detector"""
+    
+    name = "base"
+    
+    @abstractmethod
+    def detect(self, image: np.ndarray) -> List[LocalDetection]:
+        """
+        Detect objects in a BGR image
+        
+        Args:
+            image: Full resolution BGR pixels
+        
+        Returns:
+            Detections with boxes in the image's pixel coordinates
+        """
+
+class OpenCVDNNDetector(DetectorBackend):
+    """
+    YOLO-style ONNX detector run on the CPU with OpenCV DNN
+    
+    Supports the common export layouts: YOLOv5 (1, N, 5 + classes) and
+    YOLOv8 (1, 4 + classes, N).
+    """
+    
+    name = "opencv_dnn"
+    
+    def __init__(self,
+                 model_path: str,
+                 input_size: int = 640,
+                 score_threshold: float = 0.4,
+                 nms_threshold: float = 0.45,
+                 class_names: Optional[List[str]] = None):
+        self.net = cv2.dnn.readNet(model_path)
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        self.input_size = input_size
+        self.score_threshold = score_threshold
+        self.nms_threshold = nms_threshold
+        self.class_names = class_names or COCO_CLASSES
+        
+        # A cv2.dnn.Net must not run forward() from several threads at once
+        self._lock = threading.Lock()
+        logger.info(f"Loaded local detector model {model_path}")
+    
+    def detect(self, image: np.ndarray) -> List[LocalDetection]:
+        height, width = image.shape[:2]
+        blob = cv2.dnn.blobFromImage(
+            image, 1 / 255.0, (self.input_size, self.input_size), swapRB=True, crop=False
+        )
+        with self._lock:
+            self.net.setInput(blob)
+            output = self.net.forward()
+        
+        predictions = np.squeeze(output, axis=0)
+        num_classes = len(self.class_names)
+        if predictions.shape[0] == 4 + num_classes:
+            # YOLOv8: (4 + classes, N), no objectness
+            predictions = predictions.T
+            class_scores = predictions[:, 4:]
+        else:
+            # YOLOv5: (N, 5 + classes), class scores weighted by objectness
+            class_scores = predictions[:, 5:] * predictions[:, 4:5]
+        
+        class_ids = np.argmax(class_scores, axis=1)
+        scores = class_scores[np.arange(len(class_ids)), class_ids]
+        keep = scores >= self.score_threshold
+        if not np.any(keep):
+            return []
+        
+        boxes = predictions[keep, :4]
+        scores = scores[keep]
+        class_ids = class_ids[keep]
+        
+        # (cx, cy, w, h) at input resolution -> (x, y, w, h) in frame pixels
+        scale_x, scale_y = width / self.input_size, height / self.input_size
+        xywh = np.stack([
+            (boxes[:, 0] - boxes[:, 2] / 2) * scale_x,
+            (boxes[:, 1] - boxes[:, 3] / 2) * scale_y,
+            boxes[:, 2] * scale_x,
+            boxes[:, 3] * scale_y
+        ], axis=1)
+        
+        indices = cv2.dnn.NMSBoxes(xywh.tolist(), scores.tolist(), self.score_threshold, self.nms_threshold)
+        
+        detections = []
+        for i in np.array(indices).flatten():
+            x, y, w, h = xywh[i]
+            detections.append(LocalDetection(
+                label=self.class_names[int(class_ids[i])],
+                confidence=float(scores[i]),
+                box=[
+                    max(0, int(x)), max(0, int(y)),
+                    min(width, int(x + w)), min(height, int(y + h))
+                ]
+            ))
+        return detections
+
+class StubDetector(DetectorBackend):
+    """Deterministic detector for tests and offline runs"""
+    
+    name = "stub"
+    
+    def __init__(self, detections: Optional[List[Tuple[str, float, List[float]]]] = None):
+        """
+        Args:
+            detections: (label, confidence, normalized [x1, y1, x2, y2]) tuples to report for
+                every frame; by default a single full-frame car so every frame escalates
+        """
+        self.detections = detections if detections is not None else [("car", 1.0, [0.0, 0.0, 1.0, 1.0])]
+    
+    def detect(self, image: np.ndarray) -> List[LocalDetection]:
+        height, width = image.shape[:2]
+        return [
+            LocalDetection(label, confidence, [
+                int(x1 * width), int(y1 * height), int(x2 * width), int(y2 * height)
+            ])
+            for label, confidence, (x1, y1, x2, y2) in self.detections
+        ]
+
+def create_detector_backend(backend: str = None) -> Optional[DetectorBackend]:
+    """Build the configured detector backend, None if local detection is disabled"""
+    backend = (backend or settings.LOCAL_DETECTOR_BACKEND).lower()
+    
+    if backend == "none":
+        return None
+    if backend == "stub":
+        return StubDetector()
+    if backend == "opencv_dnn":
+        if not settings.LOCAL_DETECTOR_MODEL_PATH:
+            logger.warning("LOCAL_DETECTOR_MODEL_PATH is not set, local detector disabled")
+            return None
+        try:
+            return OpenCVDNNDetector(
+                settings.LOCAL_DETECTOR_MODEL_PATH,
+                input_size=settings.LOCAL_DETECTOR_INPUT_SIZE,
+                score_threshold=settings.LOCAL_DETECTOR_SCORE_THRESHOLD,
+                nms_threshold=settings.LOCAL_DETECTOR_NMS_THRESHOLD
+            )
+        except cv2.error as e:
+            logger.error(f"Could not load local detector model: {str(e)}")
+            return None
+    
+    logger.warning(f"Unknown local detector backend '{backend}', local detector disabled")
+    return None
+
+class LocalDetectorStage:
+    """
+    First stage of the detection cascade
+    
+    Runs the local detector on the CPU and decides whether a frame is worth
+    sending to the remote models, and which region of it to send. Only road users
+    (relevant_classes) escalate a frame; a crop also keeps the traffic lights and
+    signs (context_classes) that red-light and sign violations are judged by.
+    """
+    
+    def __init__(self,
+                 backend: DetectorBackend,
+                 relevant_classes: List[str] = None,
+                 crop_enabled: bool = None,
+                 crop_padding: float = None,
+                 max_crop_ratio: float = None,
+                 context_classes: List[str] = None):
+        self.backend = backend
+        self.relevant_classes = set(relevant_classes if relevant_classes is not None else settings.LOCAL_DETECTOR_RELEVANT_CLASSES)
+        self.crop_enabled = crop_enabled if crop_enabled is not None else settings.LOCAL_DETECTOR_CROP_ENABLED
+        self.crop_padding = crop_padding if crop_padding is not None else settings.LOCAL_DETECTOR_CROP_PADDING
+        self.max_crop_ratio = max_crop_ratio if max_crop_ratio is not None else settings.LOCAL_DETECTOR_MAX_CROP_RATIO
+        self.context_classes = set(context_classes if context_classes is not None else settings.LOCAL_DETECTOR_CONTEXT_CLASSES)
+        
+        # Counters
+        self.frames = 0
+        self.escalated = 0
+        self.cropped = 0
+        self.errors = 0
+        self.inference_seconds = 0.0
+    
+    async def evaluate(self, frame: PreparedFrame) -> Tuple[bool, List[LocalDetection], Optional[PreparedFrame]]:
+        """
+        Run the local detector on a frame
+        
+        Returns:
+            Tuple of (escalate, relevant detections in full frame pixels, frame to send -
+            a crop or the original)
+        """
+        self.frames += 1
+        
+        started = time.perf_counter()
+        try:
+            image, detections = await image_workers.run("local_detector", self._detect, frame, cost=len(frame.data))
+        except Exception as e:
+            # Fail open so a broken model never hides violations
+            logger.error(f"Local detector failed, escalating frame: {str(e)}")
+            self.errors += 1
+            self.escalated += 1
+            return True, [], frame
+        finally:
+            self.inference_seconds += time.perf_counter() - started
+        
+        if image is None:
+            # Let the remote models deal with undecodable frames
+            self.escalated += 1
+            return True, [], frame
+        
+        relevant = [d for d in detections if d.label in self.relevant_classes]
+        if not relevant:
+            return False, [], frame
+        
+        self.escalated += 1
+        context = [d for d in detections if d.label in self.context_classes]
+        region = self._region_of_interest(relevant + context, image.shape[1], image.shape[0])
+        reported = self._to_full_frame(relevant, frame.offset)
+        if region is None:
+            return True, reported, frame
+        
+        self.cropped += 1
+        return True, reported, await image_workers.run("crop", frame.crop, region, cost=len(frame.data))
+    
+    def _detect(self, frame: PreparedFrame) -> Tuple[Optional[np.ndarray], List[LocalDetection]]:
+        image = frame.decoded
+        if image is None:
+            return None, []
+        return image, self.backend.detect(image)
+    
+    @staticmethod
+    def _to_full_frame(detections: List[LocalDetection], offset: Tuple[int, int]) -> List[LocalDetection]:
+        """Detections of a cropped frame (camera regions) moved to full frame pixels"""
+        offset_x, offset_y = offset
+        if not (offset_x or offset_y):
+            return detections
+        return [
+            LocalDetection(d.label, d.confidence, [
+                d.box[0] + offset_x, d.box[1] + offset_y, d.box[2] + offset_x, d.box[3] + offset_y
+            ])
+            for d in detections
+        ]
+    
+    def _region_of_interest(self, detections: List[LocalDetection], width: int, height: int) -> Optional[List[int]]:
+        """Padded union of the detections, or None if the full frame should be sent"""
+        if not self.crop_enabled:
+            return None
+        
+        x1 = min(d.box[0] for d in detections)
+        y1 = min(d.box[1] for d in detections)
+        x2 = max(d.box[2] for d in detections)
+        y2 = max(d.box[3] for d in detections)
+        
+        pad_x = int((x2 - x1) * self.crop_padding)
+        pad_y = int((y2 - y1) * self.crop_padding)
+        x1, y1 = max(0, x1 - pad_x), max(0, y1 - pad_y)
+        x2, y2 = min(width, x2 + pad_x), min(height, y2 + pad_y)
+        
+        # Not worth a re-encode when the objects cover most of the frame
+        if (x2 - x1) * (y2 - y1) > self.max_crop_ratio * width * height:
+            return None
+        if x2 - x1 < 32 or y2 - y1 < 32:
+            return None
+        
+        return [x1, y1, x2, y2]
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cascade stage statistics"""
+        return {
+            "backend": self.backend.name,
+            "frames": self.frames,
+            "escalated": self.escalated,
+            "cropped": self.cropped,
+            "errors": self.errors,
+            "escalation_rate": round(self.escalated / self.frames, 4) if self.frames else 0.0,
+            "avg_inference_ms": round(self.inference_seconds / self.frames * 1000, 2) if self.frames else 0.0
+        }
\ No newline at end of file
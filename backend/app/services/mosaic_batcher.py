@@ -0,0 +1,113 @@
+import asyncio
+import time
+from typing import Dict, Any, Optional, List, Set, Callable, Awaitable
+from loguru import logger
+
+from app.core.config import settings
+from app.services.image_preprocessing import PreparedFrame
+
+class _PendingTile:
+    __slots__ = ("frame", "context", "future", "submitted_at")
+    
+    def __init__(self, frame: PreparedFrame, context: Dict[str, Any], future: asyncio.Future):
+        self.frame = frame
+        self.context = context
+        self.future = future
+        self.submitted_at = time.perf_counter()
+
+class MosaicBatcher:
+    """
+    Micro-batcher that fills mosaic requests with frames from any camera
+    
+    A batch goes out as soon as it holds `tiles` frames, or when its oldest frame has
+    waited max_wait seconds - light traffic then pays at most max_wait of extra latency
+    while busy periods share one provider request between `tiles` frames.
+    """
+    
+    def __init__(self,
+                 analyze: Callable[[List[PreparedFrame], List[Dict[str, Any]]], Awaitable[List[Dict[str, Any]]]],
+                 tiles: int = None,
+                 max_wait: float = None):
+        self.analyze = analyze
+        self.tiles = max(1, tiles if tiles is not None else settings.MOSAIC_TILES)
+        self.max_wait = max_wait if max_wait is not None else settings.MOSAIC_MAX_WAIT_MS / 1000
+        self._pending: List[_PendingTile] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._batches: Set[asyncio.Task] = set()
+        
+        # Counters
+        self.frames = 0
+        self.batches = 0
+        self.full_batches = 0
+        self.wait_seconds = 0.0
+    
+    async def submit(self, frame: PreparedFrame, context: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Analyze a frame as a tile of the next mosaic
+        
+        Returns:
+            The frame's analysis, like LlamaVisionService.analyze_image
+        """
+        loop = asyncio.get_running_loop()
+        self._pending.append(_PendingTile(frame, context, loop.create_future()))
+        future = self._pending[-1].future
+        
+        if len(self._pending) >= self.tiles:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        
+        return await future
+    
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        
+        # Callers that went away while waiting are not worth a tile
+        tiles = [tile for tile in self._pending if not tile.future.done()]
+        self._pending = []
+        if not tiles:
+            return
+        
+        task = asyncio.create_task(self._run(tiles))
+        self._batches.add(task)
+        task.add_done_callback(self._batches.discard)
+    
+    async def _run(self, tiles: List[_PendingTile]):
+        started = time.perf_counter()
+        self.batches += 1
+        self.frames += len(tiles)
+        self.full_batches += len(tiles) >= self.tiles
+        self.wait_seconds += sum(started - tile.submitted_at for tile in tiles)
+        
+        try:
+            results = await self.analyze([tile.frame for tile in tiles], [tile.context for tile in tiles])
+        except Exception as e:
+            logger.error(f"Mosaic batch of {len(tiles)} frames failed: {str(e)}")
+            results = [{"error": str(e)} for _ in tiles]
+        
+        for tile, result in zip(tiles, results):
+            if tile.future.done():
+                continue
+            result.setdefault("timings", {})["batch_wait"] = round(started - tile.submitted_at, 4)
+            tile.future.set_result(result)
+    
+    async def close(self):
+        """Send the frames still waiting and let running batches finish"""
+        self._flush()
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions=True)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get mosaic batching statistics"""
+        return {
+            "tiles": self.tiles,
+            "max_wait_ms": round(self.max_wait * 1000),
+            "pending": len(self._pending),
+            "batches": self.batches,
+            "frames": self.frames,
+            "avg_fill": round(self.frames / self.batches, 2) if self.batches else 0.0,
+            "full_batch_rate": round(self.full_batches / self.batches, 4) if self.batches else 0.0,
+            "avg_wait_ms": round(self.wait_seconds / self.frames * 1000, 2) if self.frames else 0.0
+        }
\ No newline at end of file
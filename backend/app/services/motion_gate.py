@@ -0,0 +1,161 @@
+import time
+from typing import Dict, Any, Optional, List, Tuple
+import cv2
+import numpy as np
+from loguru import logger
+
+from app.core.config import settings
+
+class _CameraMotionState:
+    """Background model and ROI mask of a single camera"""
+    
+    __slots__ = ("background", "roi_mask", "roi_pixels", "last_passed_at", "frames", "gated")
+    
+    def __init__(self, frame: np.ndarray):
+        self.background = frame.astype(np.float32)
+        self.roi_mask: Optional[np.ndarray] = None
+        self.roi_pixels = frame.shape[0] * frame.shape[1]
+        self.last_passed_at = time.time()
+        self.frames = 0
+        self.gated = 0
+
+class MotionGate:
+    """CPU pre-filter that drops frames without motion inside the camera's region of interest"""
+    
+    def __init__(self,
+                 pixel_threshold: int = None,
+                 min_motion_ratio: float = None,
+                 learning_rate: float = None,
+                 analysis_width: int = None,
+                 max_skip_seconds: int = None):
+        self.pixel_threshold = pixel_threshold if pixel_threshold is not None else settings.MOTION_GATE_PIXEL_THRESHOLD
+        self.min_motion_ratio = min_motion_ratio if min_motion_ratio is not None else settings.MOTION_GATE_MIN_MOTION_RATIO
+        self.learning_rate = learning_rate if learning_rate is not None else settings.MOTION_GATE_LEARNING_RATE
+        self.analysis_width = analysis_width if analysis_width is not None else settings.MOTION_GATE_ANALYSIS_WIDTH
+        self.max_skip_seconds = max_skip_seconds if max_skip_seconds is not None else settings.MOTION_GATE_MAX_SKIP_SECONDS
+        
+        self._states: Dict[str, _CameraMotionState] = {}
+        
+        # camera_id -> polygon of normalized (x, y) points
+        self._regions: Dict[str, List[List[List[float]]]] = {}
+    
+    def evaluate(self, camera_id: str, gray_frame: Optional[np.ndarray]) -> Tuple[bool, float]:
+        """
+        Update the camera's background model and check the frame for motion
+        
+        Args:
+            camera_id: Unique camera identifier
+            gray_frame: Grayscale pixels of the frame (a reduced-size preview is enough)
+        
+        Returns:
+            Tuple of (should_analyze, motion_ratio inside the ROI)
+        """
+        frame = self._prepare_frame(gray_frame)
+        if frame is None:
+            # Let the AI stage deal with undecodable frames
+            return True, 1.0
+        
+        state = self._states.get(camera_id)
+        if state is None or state.background.shape != frame.shape:
+            # First frame (or resolution change) - nothing to compare against yet
+            state = _CameraMotionState(frame)
+            self._apply_region(camera_id, state)
+            self._states[camera_id] = state
+            state.frames += 1
+            return True, 1.0
+        
+        state.frames += 1
+        
+        diff = cv2.absdiff(frame, cv2.convertScaleAbs(state.background))
+        _, motion = cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY)
+        if state.roi_mask is not None:
+            motion = cv2.bitwise_and(motion, state.roi_mask)
+        
+        motion_ratio = cv2.countNonZero(motion) / max(1, state.roi_pixels)
+        cv2.accumulateWeighted(frame, state.background, self.learning_rate)
+        
+        now = time.time()
+        should_analyze = motion_ratio >= self.min_motion_ratio
+        if not should_analyze and now - state.last_passed_at >= self.max_skip_seconds:
+            # Periodic refresh so stationary violations (e.g. parking) are still analyzed
+            should_analyze = True
+        
+        if should_analyze:
+            state.last_passed_at = now
+        else:
+            state.gated += 1
+        
+        return should_analyze, motion_ratio
+    
+    def set_region_of_interest(self, camera_id: str, polygon: Optional[List[List[float]]]):
+        """Set (or clear) the ROI polygon of a camera, points are normalized (x, y) in 0..1"""
+        self.set_regions_of_interest(camera_id, [polygon] if polygon else None)
+    
+    def set_regions_of_interest(self, camera_id: str, polygons: Optional[List[List[List[float]]]]):
+        """Set (or clear) the ROI polygons of a camera - motion anywhere inside any of them counts"""
+        if polygons:
+            self._regions[camera_id] = polygons
+        else:
+            self._regions.pop(camera_id, None)
+        
+        state = self._states.get(camera_id)
+        if state is not None:
+            self._apply_region(camera_id, state)
+    
+    def reset(self, camera_id: str):
+        """Drop the background model of a camera"""
+        self._states.pop(camera_id, None)
+        logger.info(f"Motion background model reset for camera {camera_id}")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get motion gating statistics"""
+        total_frames = sum(s.frames for s in self._states.values())
+        total_gated = sum(s.gated for s in self._states.values())
+        
+        return {
+            "min_motion_ratio": self.min_motion_ratio,
+            "frames": total_frames,
+            "gated": total_gated,
+            "gate_rate": round(total_gated / total_frames, 4) if total_frames else 0.0,
+            "cameras": {
+                camera_id: {
+                    "frames": s.frames,
+                    "gated": s.gated,
+                    "gate_rate": round(s.gated / s.frames, 4) if s.frames else 0.0,
+                    "roi_enabled": s.roi_mask is not None
+                }
+                for camera_id, s in self._states.items()
+            }
+        }
+    
+    def _prepare_frame(self, frame: Optional[np.ndarray]) -> Optional[np.ndarray]:
+        """Downscale and blur the grayscale frame to the model resolution"""
+        if frame is None:
+            return None
+        
+        height, width = frame.shape
+        if width > self.analysis_width:
+            scaled_height = max(1, int(height * self.analysis_width / width))
+            frame = cv2.resize(frame, (self.analysis_width, scaled_height), interpolation=cv2.INTER_AREA)
+        
+        return cv2.GaussianBlur(frame, (5, 5), 0)
+    
+    def _apply_region(self, camera_id: str, state: _CameraMotionState):
+        """Rasterize the camera's ROI polygons to a mask at the model resolution"""
+        polygons = self._regions.get(camera_id)
+        height, width = state.background.shape
+        
+        if not polygons:
+            state.roi_mask = None
+            state.roi_pixels = height * width
+            return
+        
+        points = [
+            np.array([[int(x * (width - 1)), int(y * (height - 1))] for x, y in polygon], dtype=np.int32)
+            for polygon in polygons
+        ]
+        mask = np.zeros((height, width), dtype=np.uint8)
+        cv2.fillPoly(mask, points, 255)
+        
+        state.roi_mask = mask
+        state.roi_pixels = cv2.countNonZero(mask)
\ No newline at end of file
@@ -0,0 +1,164 @@
+from typing import Dict, Any
+from prometheus_client import Counter, Gauge, Histogram
+
+from app.core.config import settings
+
+# Pipeline stages span sub-millisecond gates to multi-second provider calls
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 45.0)
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 1500, 2000, 3000, 5000, 8000)
+PAYLOAD_BUCKETS = (16_384, 65_536, 131_072, 262_144, 524_288, 1_048_576, 2_097_152, 4_194_304)
+
+STAGE_SECONDS = Histogram(
+    "traffic_pipeline_stage_seconds",
+    "Duration of detection pipeline stages and provider request steps",
+    ["stage", "operation", "provider", "camera_id", "camera_type"],
+    buckets=STAGE_BUCKETS
+)
+
+AI_TOKENS = Histogram(
+    "traffic_ai_tokens",
+    "Tokens used per AI provider call",
+    ["provider", "operation", "token_type", "camera_id", "camera_type"],
+    buckets=TOKEN_BUCKETS
+)
+
+AI_PAYLOAD_BYTES = Histogram(
+    "traffic_ai_payload_bytes",
+    "Size of the image sent per AI provider call",
+    ["provider", "operation", "camera_id", "camera_type"],
+    buckets=PAYLOAD_BUCKETS
+)
+
+CIRCUIT_BREAKER_STATE = Gauge(
+    "traffic_circuit_breaker_state",
+    "Provider circuit breaker state (0 closed, 1 half-open, 2 open)",
+    ["endpoint"]
+)
+
+CIRCUIT_BREAKER_REJECTIONS = Counter(
+    "traffic_circuit_breaker_rejections",
+    "Provider calls rejected by an open circuit breaker",
+    ["endpoint"]
+)
+
+HEDGED_REQUESTS = Counter(
+    "traffic_hedged_requests",
+    "Provider calls duplicated to the secondary endpoint, by which copy answered first",
+    ["provider", "winner"]
+)
+
+IMAGE_WORK_SECONDS = Histogram(
+    "traffic_image_work_seconds",
+    "CPU image work run on the image worker pool, by phase (queued or running)",
+    ["operation", "phase"],
+    buckets=STAGE_BUCKETS
+)
+
+IMAGE_WORK_QUEUE = Gauge(
+    "traffic_image_work_queue",
+    "Image jobs waiting for a worker (queued) or being processed (running)",
+    ["state"]
+)
+
+ESCALATION_DECISIONS = Counter(
+    "traffic_escalation_decisions",
+    "Escalation policy decisions on Llama detections (accept, escalate to GPT-4o, drop)",
+    ["violation_type", "decision"]
+)
+
+DEADLINE_MISSES = Counter(
+    "traffic_deadline_misses",
+    "Pipeline stages skipped or cut short because the frame's deadline was spent",
+    ["stage"]
+)
+
+BREAKER_STATE_VALUES = {"closed": 0, "half_open": 1, "open": 2}
+
+# (analysis key, provider, operation) of the provider results kept per frame
+PROVIDER_RESULTS = (
+    ("llama", "llama", "detection"),
+    ("gpt4o", "gpt4o", "verification"),
+    ("report", "gpt4o", "report")
+)
+
+def _camera_labels(context: Dict[str, Any]) -> Dict[str, str]:
+    camera_id = str(context.get("camera_id") or "unknown")
+    return {
+        "camera_id": camera_id if settings.METRICS_PER_CAMERA_LABELS else "all",
+        "camera_type": str(context.get("camera_type") or "general")
+    }
+
+def record_frame_metrics(context: Dict[str, Any],
+                         stage_timings: Dict[str, float],
+                         analysis: Dict[str, Any],
+                         fresh: bool):
+    """
+    Export the timings, token usage and payload sizes of one processed frame
+    
+    Args:
+        context: Frame context with camera_id and camera_type
+        stage_timings: Pipeline stage durations in seconds
+        analysis: The llama/gpt4o/report results used for the frame
+        fresh: Whether the providers were called for this frame - results reused from the
+            cache or the near-duplicate gate were already counted when first computed
+    """
+    if not settings.METRICS_ENABLED:
+        return
+    
+    camera = _camera_labels(context)
+    for stage, seconds in stage_timings.items():
+        STAGE_SECONDS.labels(stage=stage, operation="frame", provider="pipeline", **camera).observe(seconds)
+    
+    if not fresh:
+        return
+    
+    for key, provider, operation in PROVIDER_RESULTS:
+        result = analysis.get(key)
+        if not isinstance(result, dict):
+            continue
+        
+        for step, seconds in (result.get("timings") or {}).items():
+            STAGE_SECONDS.labels(stage=step, operation=operation, provider=provider, **camera).observe(seconds)
+        
+        usage = result.get("usage") or {}
+        for token_type in ("prompt_tokens", "completion_tokens"):
+            if usage.get(token_type) is not None:
+                AI_TOKENS.labels(
+                    provider=provider, operation=operation, token_type=token_type, **camera
+                ).observe(usage[token_type])
+        
+        payload_bytes = (result.get("payload") or {}).get("payload_bytes")
+        if payload_bytes:
+            AI_PAYLOAD_BYTES.labels(provider=provider, operation=operation, **camera).observe(payload_bytes)
+
+def record_breaker_state(endpoint: str, state: str):
+    """Export a circuit breaker state change"""
+    if settings.METRICS_ENABLED:
+        CIRCUIT_BREAKER_STATE.labels(endpoint=endpoint).set(BREAKER_STATE_VALUES[state])
+
+def record_breaker_rejection(endpoint: str):
+    if settings.METRICS_ENABLED:
+        CIRCUIT_BREAKER_REJECTIONS.labels(endpoint=endpoint).inc()
+
+def record_hedge(provider: str, winner: str):
+    if settings.METRICS_ENABLED:
+        HEDGED_REQUESTS.labels(provider=provider, winner=winner).inc()
+
+def record_image_work(operation: str, queued_seconds: float, run_seconds: float):
+    """Export the queue wait and run time of one image pool job"""
+    if settings.METRICS_ENABLED:
+        IMAGE_WORK_SECONDS.labels(operation=operation, phase="queued").observe(queued_seconds)
+        IMAGE_WORK_SECONDS.labels(operation=operation, phase="running").observe(run_seconds)
+
+def record_image_queue(queued: int, running: int):
+    if settings.METRICS_ENABLED:
+        IMAGE_WORK_QUEUE.labels(state="queued").set(queued)
+        IMAGE_WORK_QUEUE.labels(state="running").set(running)
+
+def record_escalation(violation_type: str, decision: str):
+    if settings.METRICS_ENABLED:
+        ESCALATION_DECISIONS.labels(violation_type=violation_type, decision=decision).inc()
+
+def record_deadline_miss(stage: str):
+    if settings.METRICS_ENABLED:
+        DEADLINE_MISSES.labels(stage=stage).inc()
\ No newline at end of file
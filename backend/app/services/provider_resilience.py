@@ -0,0 +1,362 @@
+import asyncio
+import time
+from collections import deque
+from typing import Dict, Any, Optional, Callable, Awaitable, Tuple
+import httpx
+from loguru import logger
+
+from app.core.config import settings
+from app.services.http_client import post_timed
+from app.services.pipeline_metrics import record_breaker_state, record_breaker_rejection, record_hedge
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Successful call latencies kept per endpoint for the hedge delay
+LATENCY_WINDOW = 200
+MIN_LATENCY_SAMPLES = 20
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose circuit breakers are all open"""
+    
+    def __init__(self, provider: str, retry_after: float):
+        super().__init__(f"{provider} circuit open, retry in {retry_after:.0f}s")
+        self.provider = provider
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    """
+    Error-rate and slow-call circuit breaker
+    
+    Closed: calls pass and their outcome is kept in a sliding window. Once the window
+    holds min_calls outcomes and the failure or slow-call rate crosses its threshold the
+    breaker opens and calls are rejected without touching the network. After open_seconds
+    it lets half_open_probes trial calls through; if they all succeed it closes again,
+    any failure re-opens it.
+    
+    Every state change starts a new generation. Calls are recorded with the generation
+    that allowed them, so a call that outlives a state change (a slow call finishing
+    after the breaker opened) cannot re-open the breaker or take a probe's place.
+    """
+    
+    def __init__(self,
+                 name: str,
+                 window_size: int = None,
+                 min_calls: int = None,
+                 failure_rate: float = None,
+                 slow_call_seconds: float = None,
+                 slow_call_rate: float = None,
+                 open_seconds: float = None,
+                 half_open_probes: int = None):
+        self.name = name
+        self.window_size = window_size if window_size is not None else settings.CIRCUIT_BREAKER_WINDOW_SIZE
+        self.min_calls = min_calls if min_calls is not None else settings.CIRCUIT_BREAKER_MIN_CALLS
+        self.failure_rate = failure_rate if failure_rate is not None else settings.CIRCUIT_BREAKER_FAILURE_RATE
+        self.slow_call_seconds = slow_call_seconds if slow_call_seconds is not None else settings.CIRCUIT_BREAKER_SLOW_CALL_SECONDS
+        self.slow_call_rate = slow_call_rate if slow_call_rate is not None else settings.CIRCUIT_BREAKER_SLOW_CALL_RATE
+        self.open_seconds = open_seconds if open_seconds is not None else settings.CIRCUIT_BREAKER_OPEN_SECONDS
+        self.half_open_probes = half_open_probes if half_open_probes is not None else settings.CIRCUIT_BREAKER_HALF_OPEN_PROBES
+        
+        self.state = CLOSED
+        self._generation = 0
+        self._outcomes: deque = deque(maxlen=self.window_size)  # (failed, slow)
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        
+        # Counters
+        self.rejected = 0
+        self.times_opened = 0
+        record_breaker_state(self.name, self.state)
+    
+    def allow(self) -> Optional[int]:
+        """
+        Whether a call may go out now - a half-open breaker reserves a probe slot
+        
+        Returns:
+            The generation to record the call's outcome with, None if the call is rejected
+        """
+        if self.state == OPEN:
+            if time.monotonic() - self._opened_at < self.open_seconds:
+                self.rejected += 1
+                record_breaker_rejection(self.name)
+                return None
+            self._transition(HALF_OPEN)
+        
+        if self.state == HALF_OPEN:
+            if self._probes_in_flight >= self.half_open_probes:
+                self.rejected += 1
+                record_breaker_rejection(self.name)
+                return None
+            self._probes_in_flight += 1
+        
+        return self._generation
+    
+    def record(self, generation: int, failed: bool, seconds: float):
+        """Record the outcome of an allowed call, ignored if the breaker changed state since"""
+        if generation != self._generation:
+            return
+        slow = seconds >= self.slow_call_seconds
+        
+        if self.state == HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+            if failed or slow:
+                self._open()
+                return
+            self._probe_successes += 1
+            if self._probe_successes >= self.half_open_probes:
+                self._transition(CLOSED)
+            return
+        
+        self._outcomes.append((failed, slow))
+        if len(self._outcomes) < self.min_calls:
+            return
+        
+        calls = len(self._outcomes)
+        failures = sum(1 for f, _ in self._outcomes if f)
+        slow_calls = sum(1 for _, s in self._outcomes if s)
+        if failures / calls >= self.failure_rate or slow_calls / calls >= self.slow_call_rate:
+            self._open()
+    
+    def release(self, generation: int):
+        """Give back the slot of an allowed call that was abandoned (a cancelled hedge)"""
+        if generation == self._generation and self.state == HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+    
+    def retry_after(self) -> float:
+        """Seconds until the breaker lets probes through again"""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.open_seconds - (time.monotonic() - self._opened_at))
+    
+    def _open(self):
+        self._opened_at = time.monotonic()
+        self.times_opened += 1
+        logger.warning(f"Circuit breaker {self.name} opened for {self.open_seconds:.0f}s")
+        self._transition(OPEN)
+    
+    def _transition(self, state: str):
+        if state != OPEN:
+            logger.info(f"Circuit breaker {self.name} {state}")
+        self.state = state
+        self._generation += 1
+        self._outcomes.clear()
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        record_breaker_state(self.name, state)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get breaker statistics"""
+        calls = len(self._outcomes)
+        return {
+            "state": self.state,
+            "window_calls": calls,
+            "failure_rate": round(sum(1 for f, _ in self._outcomes if f) / calls, 4) if calls else 0.0,
+            "slow_call_rate": round(sum(1 for _, s in self._outcomes if s) / calls, 4) if calls else 0.0,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+            "retry_after": round(self.retry_after(), 1)
+        }
+
+class ProviderEndpoint:
+    """One base URL + API key of a provider, with its own breaker and latency history"""
+    
+    def __init__(self, name: str, url: str, api_key: Optional[str]):
+        self.name = name
+        self.url = url
+        self.api_key = api_key
+        self.breaker = CircuitBreaker(name)
+        self._latencies: deque = deque(maxlen=LATENCY_WINDOW)
+    
+    def headers(self) -> Dict[str, str]:
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+    
+    def observe_latency(self, seconds: float):
+        self._latencies.append(seconds)
+    
+    def latency_p95(self) -> Optional[float]:
+        if len(self._latencies) < MIN_LATENCY_SAMPLES:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[int(len(ordered) * 0.95) - 1]
+
+class ProviderRouter:
+    """
+    Sends provider calls through per-endpoint circuit breakers, with optional hedging
+    
+    The primary endpoint is used while its breaker allows it, otherwise the secondary.
+    With hedging on, a call still running after the primary's p95 latency gets a
+    duplicate on the secondary endpoint and whichever answers successfully first wins.
+    """
+    
+    def __init__(self,
+                 provider: str,
+                 url: str,
+                 api_key: Optional[str],
+                 secondary_url: Optional[str] = None,
+                 secondary_api_key: Optional[str] = None,
+                 hedging: bool = None):
+        self.provider = provider
+        self.endpoints = [ProviderEndpoint(provider, url, api_key)]
+        if secondary_url or secondary_api_key:
+            self.endpoints.append(ProviderEndpoint(
+                f"{provider}_secondary", secondary_url or url, secondary_api_key or api_key
+            ))
+        self.breakers_enabled = settings.CIRCUIT_BREAKER_ENABLED
+        self.hedging = (hedging if hedging is not None else settings.HEDGED_REQUESTS_ENABLED) and len(self.endpoints) > 1
+        
+        # Counters
+        self.hedged = 0
+        self.hedge_wins = 0
+    
+    @property
+    def primary(self) -> ProviderEndpoint:
+        return self.endpoints[0]
+    
+    async def post(self, client: httpx.AsyncClient, path: str, payload: Dict[str, Any]) -> Tuple[httpx.Response, Dict[str, float]]:
+        """
+        Buffered POST through the breakers (see post_timed)
+        
+        Raises:
+            CircuitOpenError: every endpoint's breaker is open
+        """
+        return await self.call(
+            lambda endpoint: post_timed(client, f"{endpoint.url}{path}", json=payload, headers=endpoint.headers()),
+            is_failure=lambda result: result[0].status_code >= 500
+        )
+    
+    async def call(self,
+                   attempt: Callable[[ProviderEndpoint], Awaitable[Any]],
+                   is_failure: Callable[[Any], bool],
+                   hedge_while: Optional[Callable[[], bool]] = None) -> Any:
+        """
+        Run attempt(endpoint) on the first endpoint whose breaker allows it, hedging if enabled
+        
+        Args:
+            attempt: Performs the request against the given endpoint
+            is_failure: Whether a returned result counts as a provider failure (5xx);
+                raised exceptions (timeouts, connection errors) always count
+            hedge_while: Whether a hedge may still answer instead of the first attempt.
+                Once it returns False (a partial result of the first attempt is in use)
+                no hedge is started and a running one cannot win
+        
+        Raises:
+            CircuitOpenError: every endpoint's breaker is open
+        """
+        if not self.breakers_enabled:
+            return await attempt(self.primary)
+        
+        # Breakers are asked in order and only when their endpoint would be called,
+        # so an open secondary does not count rejections while the primary serves
+        for index, endpoint in enumerate(self.endpoints):
+            generation = endpoint.breaker.allow()
+            if generation is not None:
+                break
+        else:
+            retry_after = min(endpoint.breaker.retry_after() for endpoint in self.endpoints)
+            raise CircuitOpenError(self.provider, retry_after)
+        
+        first, spares = (endpoint, generation), self.endpoints[index + 1:]
+        if not self.hedging or not spares:
+            return await self._run(first, attempt, is_failure)
+        
+        return await self._hedge(first, spares[0], attempt, is_failure, hedge_while or (lambda: True))
+    
+    async def _run(self,
+                   permit: Tuple[ProviderEndpoint, int],
+                   attempt: Callable[[ProviderEndpoint], Awaitable[Any]],
+                   is_failure: Callable[[Any], bool]) -> Any:
+        endpoint, generation = permit
+        started = time.perf_counter()
+        try:
+            result = await attempt(endpoint)
+        except asyncio.CancelledError:
+            endpoint.breaker.release(generation)
+            raise
+        except Exception:
+            endpoint.breaker.record(generation, True, time.perf_counter() - started)
+            raise
+        
+        elapsed = time.perf_counter() - started
+        failed = is_failure(result)
+        endpoint.breaker.record(generation, failed, elapsed)
+        if not failed:
+            endpoint.observe_latency(elapsed)
+        return result
+    
+    async def _hedge(self,
+                     first: Tuple[ProviderEndpoint, int],
+                     second_endpoint: ProviderEndpoint,
+                     attempt: Callable[[ProviderEndpoint], Awaitable[Any]],
+                     is_failure: Callable[[Any], bool],
+                     hedge_while: Callable[[], bool]) -> Any:
+        delay = max(settings.HEDGE_MIN_DELAY_SECONDS, first[0].latency_p95() or settings.HEDGE_INITIAL_DELAY_SECONDS)
+        first_task = asyncio.create_task(self._run(first, attempt, is_failure))
+        tasks = {first_task: first}
+        
+        try:
+            done, _ = await asyncio.wait({first_task}, timeout=delay)
+            if (done and self._succeeded(first_task, is_failure)) or not hedge_while():
+                return await first_task
+            
+            # Slow or failed - try the secondary endpoint, if its breaker allows it
+            generation = second_endpoint.breaker.allow()
+            if generation is None:
+                return await first_task
+            second = (second_endpoint, generation)
+            self.hedged += 1
+            tasks[asyncio.create_task(self._run(second, attempt, is_failure))] = second
+            logger.debug(f"Hedging {self.provider} request to {second_endpoint.name} after {delay:.2f}s")
+            
+            pending = set(task for task in tasks if not task.done())
+            winner = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                hedging = hedge_while()
+                winner = next((
+                    task for task in done
+                    if self._succeeded(task, is_failure) and (hedging or task is first_task)
+                ), None)
+                if winner:
+                    break
+                if not hedging:
+                    # Only the first attempt may answer now
+                    pending &= {first_task}
+            
+            if winner is None and not hedge_while():
+                winner = first_task
+            elif winner is None:
+                # Everything failed: prefer a provider answer over an exception
+                finished = [task for task in tasks if not task.exception()]
+                winner = finished[-1] if finished else first_task
+            else:
+                won_by = "secondary" if tasks[winner] is second else "primary"
+                self.hedge_wins += won_by == "secondary"
+                record_hedge(self.provider, won_by)
+            return winner.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    @staticmethod
+    def _succeeded(task: asyncio.Task, is_failure: Callable[[Any], bool]) -> bool:
+        return not task.cancelled() and task.exception() is None and not is_failure(task.result())
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get breaker and hedging statistics"""
+        return {
+            "hedging": self.hedging,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "endpoints": {
+                endpoint.name: {
+                    **endpoint.breaker.get_stats(),
+                    "latency_p95": round(endpoint.latency_p95(), 3) if endpoint.latency_p95() is not None else None
+                }
+                for endpoint in self.endpoints
+            }
+        }
\ No newline at end of file
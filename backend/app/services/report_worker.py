@@ -0,0 +1,164 @@
+import asyncio
+import time
+from typing import Dict, Any, Optional, List, Callable, Awaitable
+from loguru import logger
+
+from app.core.config import settings
+from app.services.gpt4o_service import GPT4oVisionService
+from app.services.detection_results import ViolationRecord
+
+class ReportJob:
+    """Report generation request for one analyzed frame"""
+    
+    __slots__ = ("detection_id", "context", "analysis", "violations", "submitted_at")
+    
+    def __init__(self,
+                 detection_id: str,
+                 context: Dict[str, Any],
+                 analysis: Dict[str, Any],
+                 violations: List[ViolationRecord]):
+        self.detection_id = detection_id
+        self.context = context
+        self.analysis = analysis
+        self.violations = violations
+        self.submitted_at = time.perf_counter()
+
+class ReportWorkerPool:
+    """
+    Generates violation reports in the background
+    
+    Report generation is a long GPT-4o completion, so frames are answered right
+    after detection and verification and the report is produced here by a fixed
+    number of workers reading a bounded queue. Finished reports are handed to
+    on_report, which persists and announces them.
+    """
+    
+    def __init__(self,
+                 gpt4o_service: GPT4oVisionService,
+                 on_report: Optional[Callable[[ReportJob, Dict[str, Any]], Awaitable[None]]] = None,
+                 workers: int = None,
+                 queue_size: int = None):
+        self.gpt4o_service = gpt4o_service
+        self.on_report = on_report
+        self.num_workers = workers if workers is not None else settings.REPORT_WORKERS
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size if queue_size is not None else settings.REPORT_QUEUE_SIZE)
+        self._workers: List[asyncio.Task] = []
+        
+        # Counters
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self.total_seconds = 0.0
+    
+    def submit(self, job: ReportJob) -> bool:
+        """
+        Queue a report without waiting
+        
+        Returns:
+            False if the queue is full and the report was dropped
+        """
+        if not self._workers:
+            self.start()
+        
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            logger.warning(f"Report queue full, no report for detection {job.detection_id}")
+            return False
+        
+        self.submitted += 1
+        return True
+    
+    def start(self):
+        """Start the workers (needs a running event loop)"""
+        if self._workers:
+            return
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"report-worker-{i}")
+            for i in range(self.num_workers)
+        ]
+    
+    async def stop(self, timeout: float = None):
+        """Finish queued reports (up to timeout seconds), then stop the workers"""
+        if not self._workers:
+            return
+        
+        timeout = timeout if timeout is not None else settings.REPORT_SHUTDOWN_TIMEOUT_SECONDS
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Stopping report workers with {self.queue.qsize()} reports still queued")
+        
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+    
+    async def _worker(self):
+        while True:
+            job = await self.queue.get()
+            try:
+                await self._generate(job)
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Background report for detection {job.detection_id} failed: {str(e)}")
+            finally:
+                self.queue.task_done()
+    
+    async def _generate(self, job: ReportJob):
+        result = await self.gpt4o_service.generate_violation_report(job.context, job.analysis)
+        if result.get("status") != "success":
+            self.failed += 1
+            logger.warning(
+                f"No report for detection {job.detection_id}: "
+                f"{result.get('message') or result.get('error')}"
+            )
+            return
+        
+        if self.on_report:
+            await self.on_report(job, result["report"])
+        
+        self.completed += 1
+        self.total_seconds += time.perf_counter() - job.submitted_at
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get report worker statistics"""
+        return {
+            "workers": len(self._workers),
+            "queued": self.queue.qsize(),
+            "queue_size": self.queue.maxsize,
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_turnaround_seconds": round(self.total_seconds / self.completed, 3) if self.completed else 0.0
+        }
+
+async def persist_and_announce(job: ReportJob, report: Dict[str, Any]):
+    """Store the frame's violations with their report and announce them on the violations channel"""
+    # Imported here so the detection pipeline itself runs without the database (benchmarks)
+    from app.services.violation_store import build_violation_row, save_violations
+    from app.websocket.endpoints import broadcast_new_violation
+    
+    rows = [build_violation_row(v, job.context, job.analysis, report) for v in job.violations]
+    rows = [row for row in rows if row is not None]
+    
+    persisted = False
+    if not rows:
+        logger.warning(f"Camera {job.context.get('camera_id')} is not a camera record, report for {job.detection_id} not persisted")
+    else:
+        try:
+            await save_violations(rows)
+            persisted = True
+        except Exception as e:
+            logger.error(f"Failed to persist violations of detection {job.detection_id}: {str(e)}")
+    
+    for violation in job.violations:
+        await broadcast_new_violation({
+            **violation.to_dict(),
+            "detection_id": job.detection_id,
+            "detailed_report": report,
+            "persisted": persisted
+        })
\ No newline at end of file
@@ -0,0 +1,130 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
+import aiofiles
+from loguru import logger
+
+from app.core.config import settings
+
+class DetectionResultCache:
+    """Content-addressed cache of AI analysis results with an LRU memory tier and optional disk tier"""
+    
+    def __init__(self,
+                 max_entries: int = None,
+                 ttl_seconds: int = None,
+                 disk_dir: Optional[str] = None):
+        self.max_entries = max_entries if max_entries is not None else settings.DETECTION_CACHE_MAX_ENTRIES
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.DETECTION_CACHE_TTL_SECONDS
+        
+        # key -> (stored_at, value), most recently used last
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        
+        disk_dir = disk_dir if disk_dir is not None else settings.DETECTION_CACHE_DISK_DIR
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        if self.disk_dir:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+        
+        # Counters
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    @staticmethod
+    def make_key(content_hash: str, camera_type: str, prompt_version: str) -> str:
+        """Build a cache key from the frame's content hash and the analysis parameters"""
+        return f"{content_hash}:{camera_type}:{prompt_version}"
+    
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Get a cached result, checking memory first and then disk"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            stored_at, value = entry
+            if self._is_expired(stored_at):
+                del self._entries[key]
+                self.expirations += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+        
+        if self.disk_dir:
+            value = await self._get_from_disk(key)
+            if value is not None:
+                self.disk_hits += 1
+                return value
+        
+        self.misses += 1
+        return None
+    
+    async def set(self, key: str, value: Dict[str, Any]):
+        """Store a result in the memory tier (and disk tier if enabled)"""
+        stored_at = time.time()
+        self._store_in_memory(key, stored_at, value)
+        
+        if self.disk_dir:
+            try:
+                async with aiofiles.open(self._disk_path(key), 'w') as f:
+                    await f.write(json.dumps({"stored_at": stored_at, "value": value}, default=str))
+            except Exception as e:
+                logger.warning(f"Failed to write detection cache entry to disk: {e}")
+    
+    def clear(self):
+        """Clear the memory tier"""
+        self._entries.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "disk_enabled": self.disk_dir is not None,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_ratio": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0
+        }
+    
+    def _store_in_memory(self, key: str, stored_at: float, value: Dict[str, Any]):
+        self._entries[key] = (stored_at, value)
+        self._entries.move_to_end(key)
+        
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+    
+    async def _get_from_disk(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self._disk_path(key)
+        if not path.exists():
+            return None
+        
+        try:
+            async with aiofiles.open(path, 'r') as f:
+                entry = json.loads(await f.read())
+        except Exception as e:
+            logger.warning(f"Failed to read detection cache entry from disk: {e}")
+            return None
+        
+        if self._is_expired(entry["stored_at"]):
+            path.unlink(missing_ok=True)
+            self.expirations += 1
+            return None
+        
+        # Promote to the memory tier
+        self._store_in_memory(key, entry["stored_at"], entry["value"])
+        return entry["value"]
+    
+    def _disk_path(self, key: str) -> Path:
+        # Keys contain ':' separators, hash them again for a portable filename
+        return self.disk_dir / f"{hashlib.sha256(key.encode()).hexdigest()}.json"
+    
+    def _is_expired(self, stored_at: float) -> bool:
+        return self.ttl_seconds > 0 and (time.time() - stored_at) > self.ttl_seconds
\ No newline at end of file
@@ -0,0 +1,177 @@
+import asyncio
+import time
+from typing import Dict, Any, Optional
+import cv2
+import numpy as np
+from loguru import logger
+
+from app.core.config import settings
+from app.services.image_preprocessing import PreparedFrame
+
+# Gray-level histogram bins of a scene signature
+HISTOGRAM_BINS = 32
+
+class SceneSignature:
+    """Mean brightness and normalized gray-level histogram of a frame"""
+    
+    __slots__ = ("brightness", "histogram")
+    
+    def __init__(self, brightness: float, histogram: np.ndarray):
+        self.brightness = brightness
+        self.histogram = histogram
+    
+    @classmethod
+    def of(cls, gray_frame: Optional[np.ndarray]) -> Optional["SceneSignature"]:
+        """Signature of a grayscale frame, None if the frame could not be decoded"""
+        if gray_frame is None or gray_frame.size == 0:
+            return None
+        histogram = cv2.calcHist([gray_frame], [0], None, [HISTOGRAM_BINS], [0, 256])
+        cv2.normalize(histogram, histogram, 1.0, 0.0, cv2.NORM_L1)
+        return cls(float(gray_frame.mean()), histogram)
+    
+    def brightness_shift(self, other: "SceneSignature") -> float:
+        return abs(self.brightness - other.brightness)
+    
+    def histogram_distance(self, other: "SceneSignature") -> float:
+        """Bhattacharyya distance, 0 for identical and 1 for disjoint histograms"""
+        return float(cv2.compareHist(self.histogram, other.histogram, cv2.HISTCMP_BHATTACHARYYA))
+
+class _SceneEntry:
+    __slots__ = ("context", "signature", "analyzed_at", "attempted_at", "changed_frames")
+    
+    def __init__(self):
+        self.context: Optional[Dict[str, Any]] = None
+        self.signature: Optional[SceneSignature] = None
+        self.analyzed_at = 0.0
+        self.attempted_at = 0.0
+        self.changed_frames = 0
+
+class SceneContextCache:
+    """
+    Scene conditions of each camera's location, analyzed by GPT-4o once and reused in prompts
+    
+    Weather, lighting and road conditions change over hours, not between frames. A
+    camera's context is analyzed again in the background once it is older than ttl or -
+    with the change trigger - when a frame's brightness or gray-level histogram has moved
+    away from the frame it was analyzed on for change_frames consecutive frames (dusk,
+    rain, street lights coming on - not a passing truck). An expired context is still
+    used until the new one arrives, the context of a changed scene is not. Frames never
+    wait for the analysis, and a camera is analyzed at most once per
+    min_refresh_interval. Cameras at one location have different views, so the
+    signatures are compared per camera.
+    """
+    
+    def __init__(self,
+                 gpt4o_service,
+                 ttl: float = None,
+                 min_refresh_interval: float = None,
+                 change_trigger: bool = None,
+                 brightness_delta: float = None,
+                 histogram_distance: float = None,
+                 change_frames: int = None):
+        self.gpt4o_service = gpt4o_service
+        self.ttl = ttl if ttl is not None else settings.SCENE_CONTEXT_TTL_SECONDS
+        self.min_refresh_interval = min_refresh_interval if min_refresh_interval is not None else settings.SCENE_CONTEXT_MIN_REFRESH_SECONDS
+        self.change_trigger = change_trigger if change_trigger is not None else settings.SCENE_CONTEXT_CHANGE_TRIGGER
+        self.brightness_delta = brightness_delta if brightness_delta is not None else settings.SCENE_CONTEXT_BRIGHTNESS_DELTA
+        self.histogram_distance = histogram_distance if histogram_distance is not None else settings.SCENE_CONTEXT_HISTOGRAM_DISTANCE
+        self.change_frames = max(1, change_frames if change_frames is not None else settings.SCENE_CONTEXT_CHANGE_FRAMES)
+        self._entries: Dict[str, _SceneEntry] = {}
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.change_refreshes = 0
+        self.failed = 0
+    
+    def lookup(self, camera_id: str, location: str, frame: PreparedFrame) -> Optional[Dict[str, Any]]:
+        """
+        Scene context for a frame's prompts, starting a background refresh when due
+        
+        Args:
+            camera_id: Camera the frame came from
+            location: Camera location, passed to the scene analysis
+            frame: The full frame (its grayscale preview gives the signature)
+        
+        Returns:
+            The camera's scene context, or None while there is no valid one
+        """
+        camera_id = str(camera_id)
+        now = time.monotonic()
+        signature = SceneSignature.of(frame.gray_preview)
+        entry = self._entries.get(camera_id)
+        
+        known = entry is not None and entry.context is not None
+        expired = not known or now - entry.analyzed_at > self.ttl
+        changed = False
+        if known and self.change_trigger:
+            entry.changed_frames = entry.changed_frames + 1 if self._changed(entry.signature, signature) else 0
+            changed = entry.changed_frames >= self.change_frames
+        
+        if ((expired or changed) and camera_id not in self._refreshing
+                and (entry is None or now - entry.attempted_at >= self.min_refresh_interval)):
+            if changed and not expired:
+                self.change_refreshes += 1
+                logger.info(f"Scene of camera {camera_id} changed, refreshing its context")
+            self._refresh(camera_id, location, frame, signature, now)
+        
+        if not known or changed:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry.context
+    
+    def _changed(self, analyzed: Optional[SceneSignature], current: Optional[SceneSignature]) -> bool:
+        if analyzed is None or current is None:
+            return False
+        return (current.brightness_shift(analyzed) > self.brightness_delta
+                or current.histogram_distance(analyzed) > self.histogram_distance)
+    
+    def _refresh(self, camera_id: str, location: str, frame: PreparedFrame, signature: Optional[SceneSignature], now: float):
+        self._entries.setdefault(camera_id, _SceneEntry()).attempted_at = now
+        self.refreshes += 1
+        self._refreshing[camera_id] = asyncio.create_task(self._analyze(camera_id, location, frame, signature))
+    
+    async def _analyze(self, camera_id: str, location: str, frame: PreparedFrame, signature: Optional[SceneSignature]):
+        try:
+            result = await self.gpt4o_service.analyze_scene_context(frame, {"camera_id": camera_id, "location": location})
+            if result.get("status") != "success":
+                self.failed += 1
+                logger.warning(f"Scene context of camera {camera_id} not refreshed: {result.get('message')}")
+                return
+            
+            entry = self._entries.setdefault(camera_id, _SceneEntry())
+            entry.context = result["scene_context"]
+            entry.signature = signature
+            entry.analyzed_at = time.monotonic()
+            entry.changed_frames = 0
+        finally:
+            self._refreshing.pop(camera_id, None)
+    
+    def reset(self, camera_id: str):
+        """Forget a camera's scene context"""
+        self._entries.pop(str(camera_id), None)
+    
+    async def close(self):
+        """Cancel running scene analyses"""
+        tasks = list(self._refreshing.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get scene context cache statistics"""
+        lookups = self.hits + self.misses
+        
+        return {
+            "cameras": sum(1 for entry in self._entries.values() if entry.context is not None),
+            "refreshing": len(self._refreshing),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "refreshes": self.refreshes,
+            "change_refreshes": self.change_refreshes,
+            "failed": self.failed
+        }
\ No newline at end of file
@@ -0,0 +1,84 @@
+import asyncio
+from typing import Dict, Any, Awaitable, Callable, Tuple
+from loguru import logger
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+    
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one execution
+    
+    The first caller starts the work as a task and later callers with the same key
+    await that task instead of starting their own. Callers wait through asyncio.shield,
+    so one caller going away - the one that started the work included - does not
+    cancel it for the others; the work is only cancelled once every caller has left.
+    """
+    
+    def __init__(self, name: str):
+        self.name = name
+        self._flights: Dict[str, _Flight] = {}
+        
+        # Counters
+        self.started = 0
+        self.coalesced = 0
+        self.abandoned = 0
+    
+    def __contains__(self, key: str) -> bool:
+        return key in self._flights
+    
+    async def do(self, key: str, work: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Run work() once per key at a time
+        
+        Args:
+            key: Identity of the work - callers with equal keys share one execution
+            work: Coroutine factory, only called by the first caller
+        
+        Returns:
+            Tuple of (result, coalesced) - coalesced is True for callers that joined
+            an execution started by someone else
+        """
+        flight = self._flights.get(key)
+        coalesced = flight is not None
+        if flight is None:
+            flight = _Flight(asyncio.create_task(work()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            self.started += 1
+        else:
+            self.coalesced += 1
+        
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task), coalesced
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                # Last interested caller is gone, stop paying for the work
+                logger.debug(f"{self.name}: all callers left, cancelling {key}")
+                self._forget(key, flight)
+                flight.task.cancel()
+                self.abandoned += 1
+            raise
+        finally:
+            flight.waiters -= 1
+    
+    def _forget(self, key: str, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get coalescing statistics"""
+        total = self.started + self.coalesced
+        
+        return {
+            "in_flight": len(self._flights),
+            "started": self.started,
+            "coalesced": self.coalesced,
+            "abandoned": self.abandoned,
+            "coalesce_rate": round(self.coalesced / total, 4) if total else 0.0
+        }
\ No newline at end of file
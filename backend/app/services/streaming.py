@@ -0,0 +1,119 @@
+import json
+import re
+from typing import Dict, Any, Optional, List, AsyncIterator, Tuple
+import httpx
+from loguru import logger
+
+async def iter_sse_deltas(response: httpx.Response) -> AsyncIterator[Tuple[str, Optional[Dict[str, Any]]]]:
+    """
+    Iterate an OpenAI-compatible chat completion event stream
+    
+    Yields:
+        (content delta, usage) pairs - usage is only present on the chunk that carries it
+    """
+    async for line in response.aiter_lines():
+        if not line.startswith("data:"):
+            continue
+        
+        data = line[5:].strip()
+        if data == "[DONE]":
+            break
+        
+        try:
+            chunk = json.loads(data)
+        except json.JSONDecodeError:
+            logger.warning(f"Skipping malformed stream chunk: {data[:100]}")
+            continue
+        
+        choices = chunk.get("choices") or []
+        delta = (choices[0].get("delta") or {}).get("content") if choices else None
+        
+        # OpenAI sends usage on the last chunk, Groq nests it under x_groq
+        usage = chunk.get("usage") or (chunk.get("x_groq") or {}).get("usage")
+        
+        yield delta or "", usage
+
+class StreamingViolationsScanner:
+    """
+    Incremental scanner for the "violations" array of a streamed JSON completion
+    
+    Text is fed as it arrives; as soon as the array is closed it is parsed and
+    returned once, without waiting for the rest of the document.
+    """
+    
+    _KEY_PATTERN = re.compile(r'"violations"\s*:\s*\[')
+    # The key at the end of the buffer, its array not opened yet
+    _PARTIAL_KEY_PATTERN = re.compile(r'"violations"\s*(?::\s*)?$')
+    
+    def __init__(self):
+        self.buffer = ""
+        self.violations: Optional[List[Any]] = None
+        self.failed = False
+        self._array_start: Optional[int] = None
+        self._key_search_pos = 0
+        self._scan_pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+    
+    def feed(self, text: str) -> Optional[List[Any]]:
+        """
+        Append streamed text
+        
+        Returns:
+            The parsed violations list the first time it becomes complete, otherwise None
+        """
+        self.buffer += text
+        
+        if self.violations is not None or self.failed:
+            return None
+        
+        if self._array_start is None:
+            match = self._KEY_PATTERN.search(self.buffer, self._key_search_pos)
+            if not match:
+                # Search again from where the key may have started - pretty-printed
+                # JSON can put any amount of whitespace between the key and the array
+                partial = self._PARTIAL_KEY_PATTERN.search(self.buffer, self._key_search_pos)
+                self._key_search_pos = partial.start() if partial else max(
+                    self._key_search_pos, len(self.buffer) - len('"violations"')
+                )
+                return None
+            self._array_start = match.end() - 1
+            self._scan_pos = self._array_start
+        
+        buffer = self.buffer
+        for i in range(self._scan_pos, len(buffer)):
+            ch = buffer[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "[{":
+                self._depth += 1
+            elif ch in "]}":
+                self._depth -= 1
+                if self._depth == 0:
+                    return self._complete(buffer[self._array_start:i + 1])
+        
+        self._scan_pos = len(buffer)
+        return None
+    
+    def _complete(self, array_text: str) -> Optional[List[Any]]:
+        try:
+            violations = json.loads(array_text)
+        except json.JSONDecodeError as e:
+            logger.warning(f"Could not parse streamed violations array: {e}")
+            self.failed = True
+            return None
+        
+        if not isinstance(violations, list):
+            self.failed = True
+            return None
+        
+        self.violations = violations
+        return violations
\ No newline at end of file
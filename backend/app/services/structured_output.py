@@ -0,0 +1,130 @@
+import json
+import re
+import time
+from typing import Dict, Any, Optional, Tuple, Type
+from loguru import logger
+from pydantic import BaseModel, ValidationError
+
+from app.schemas.ai_output import LlamaDetection, LlamaMosaicDetection, GPT4oVerification, ViolationReport, SceneContext
+
+# Decoding work allowed per answer, in multiples of its length - keeps worst-case parsing
+# linear even for truncated answers where every nested '{' is a failed decode attempt
+MAX_SCAN_FACTOR = 4
+
+NO_JSON_ERROR = "No JSON object found in response"
+
+_decoder = json.JSONDecoder()
+
+# Where a JSON object can begin - skips prose braces like "{violation_type}" without a decode attempt
+_OBJECT_START = re.compile(r'\{\s*["}]')
+
+def find_json_object(text: str, expected_keys: Tuple[str, ...] = ()) -> Optional[Dict[str, Any]]:
+    """
+    Find the JSON object in a model answer
+    
+    Scans for object starts and decodes in place with raw_decode, so surrounding prose,
+    code fences and several brace blocks are handled without regex backtracking.
+    
+    Args:
+        text: Model answer
+        expected_keys: The object must contain at least one of these keys (any object if empty)
+    
+    Returns:
+        The first top-level object that matches, or None
+    """
+    budget = MAX_SCAN_FACTOR * len(text)
+    match = _OBJECT_START.search(text)
+    
+    while match and budget > 0:
+        pos = match.start()
+        try:
+            obj, end = _decoder.raw_decode(text, pos)
+        except json.JSONDecodeError as e:
+            budget -= e.pos - pos + 1
+            match = _OBJECT_START.search(text, pos + 1)
+            continue
+        
+        budget -= end - pos
+        if isinstance(obj, dict) and (not expected_keys or any(key in obj for key in expected_keys)):
+            return obj
+        
+        # Skip past the decoded object instead of re-scanning its nested braces
+        match = _OBJECT_START.search(text, end)
+    
+    return None
+
+class StructuredOutputParser:
+    """Extracts and validates the JSON answer of one prompt, with parse statistics"""
+    
+    def __init__(self, name: str, schema: Type[BaseModel], expected_keys: Tuple[str, ...] = ()):
+        self.name = name
+        self.schema = schema
+        self.expected_keys = expected_keys
+        
+        # Counters
+        self.parsed = 0
+        self.no_json = 0
+        self.invalid = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+    
+    def parse(self, content: str) -> Tuple[Optional[BaseModel], Optional[str]]:
+        """
+        Parse a model answer into the schema
+        
+        Returns:
+            Tuple of (typed object, None) or (None, error message - NO_JSON_ERROR if
+            the answer contained no JSON object at all)
+        """
+        started = time.perf_counter()
+        try:
+            data = find_json_object(content or "", self.expected_keys)
+            if data is None:
+                self.no_json += 1
+                return None, NO_JSON_ERROR
+            
+            try:
+                result = self.schema(**data)
+            except ValidationError as e:
+                self.invalid += 1
+                logger.warning(f"{self.name} response failed schema validation: {e.error_count()} errors")
+                return None, f"Response failed schema validation: {e.errors()[0].get('msg')}"
+            
+            self.parsed += 1
+            return result, None
+        finally:
+            elapsed = time.perf_counter() - started
+            self.total_seconds += elapsed
+            self.max_seconds = max(self.max_seconds, elapsed)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get parse statistics"""
+        total = self.parsed + self.no_json + self.invalid
+        
+        return {
+            "parsed": self.parsed,
+            "no_json": self.no_json,
+            "invalid": self.invalid,
+            "failure_rate": round((self.no_json + self.invalid) / total, 4) if total else 0.0,
+            "avg_ms": round(self.total_seconds / total * 1000, 4) if total else 0.0,
+            "max_ms": round(self.max_seconds * 1000, 4)
+        }
+
+llama_detection_parser = StructuredOutputParser("llama_detection", LlamaDetection, ("violations",))
+llama_mosaic_parser = StructuredOutputParser("llama_mosaic", LlamaMosaicDetection, ("tiles",))
+gpt4o_verification_parser = StructuredOutputParser("gpt4o_verification", GPT4oVerification, ("verification",))
+violation_report_parser = StructuredOutputParser(
+    "violation_report", ViolationReport,
+    ("report_id", "executive_summary", "violation_details")
+)
+scene_context_parser = StructuredOutputParser("scene_context", SceneContext, ("weather", "lighting", "visibility"))
+
+def get_parser_stats() -> Dict[str, Any]:
+    """Statistics of all shared parsers"""
+    return {
+        parser.name: parser.get_stats()
+        for parser in (
+            llama_detection_parser, llama_mosaic_parser, gpt4o_verification_parser,
+            violation_report_parser, scene_context_parser
+        )
+    }
\ No newline at end of file
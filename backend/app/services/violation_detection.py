@@ -1,30 +1,75 @@
 import asyncio
+import time
 import cv2
 import numpy as np
-from typing import Dict, Any, Optional, List, Tuple
+from typing import Dict, Any, Optional, List, Tuple, AsyncIterator
 from loguru import logger
 import uuid
 from datetime import datetime
 from PIL import Image
 import io
+from fastapi import Request
 
 from app.services.llama_service import LlamaVisionService
 from app.services.gpt4o_service import GPT4oVisionService
+from app.services.result_cache import DetectionResultCache
+from app.services.frame_dedup import NearDuplicateFrameGate, compute_dhash
+from app.services.motion_gate import MotionGate
+from app.services.camera_regions import CameraRegionRegistry
+from app.services.image_preprocessing import PreparedFrame
+from app.services.image_workers import image_workers
+from app.services.concurrency import AdaptiveConcurrencyLimiter
+from app.services.structured_output import get_parser_stats
+from app.services.local_detector import LocalDetectorStage, create_detector_backend
+from app.services.pipeline_metrics import record_frame_metrics
+from app.services.single_flight import SingleFlight
+from app.services.deadline import Deadline
+from app.services.detection_results import ViolationRecord, AnalysisResult, FrameResult
+from app.services.escalation_policy import EscalationPolicy, DROP, ESCALATE
+from app.services.violation_tracker import ViolationTracker
+from app.services.report_worker import ReportJob, ReportWorkerPool, persist_and_announce
+from app.services.violation_sink import ViolationSink
+from app.services.scene_context import SceneContextCache
 from app.models.violation import ViolationType, ViolationSeverity, ViolationStatus
 from app.core.config import settings
 
+# Bump whenever the Llama/GPT-4o prompts, image preprocessing or response parsing change
+# so cached results are not reused
+PROMPT_VERSION = "5"
+
 class ViolationDetectionService:
     """Main service for coordinating AI-powered violation detection"""
     
     def __init__(self):
         self.llama_service = LlamaVisionService()
         self.gpt4o_service = GPT4oVisionService()
+        self.result_cache = DetectionResultCache() if settings.DETECTION_CACHE_ENABLED else None
+        self.duplicate_gate = NearDuplicateFrameGate() if settings.FRAME_DEDUP_ENABLED else None
+        self.motion_gate = MotionGate() if settings.MOTION_GATE_ENABLED else None
+        self.camera_regions = CameraRegionRegistry() if settings.ROI_ENABLED else None
+        self.batch_limiter = AdaptiveConcurrencyLimiter()
+        self.escalation_policy = EscalationPolicy()
+        self.violation_tracker = ViolationTracker() if settings.VIOLATION_TRACKING_ENABLED else None
+        self.scene_contexts = SceneContextCache(self.gpt4o_service) if settings.SCENE_CONTEXT_ENABLED else None
+        self.analysis_flights = SingleFlight("ai_analysis") if settings.ANALYSIS_COALESCING_ENABLED else None
+        self.violation_sink = ViolationSink() if settings.VIOLATION_SINK_ENABLED else None
+        self.report_workers = (
+            ReportWorkerPool(
+                self.gpt4o_service,
+                on_report=self.violation_sink.attach_report if self.violation_sink else persist_and_announce
+            )
+            if settings.BACKGROUND_REPORT_GENERATION else None
+        )
         
+        detector_backend = create_detector_backend()
+        self.local_detector = LocalDetectorStage(detector_backend) if detector_backend else None
+    
     async def process_frame(self, 
                           frame_data: bytes, 
                           camera_id: str,
                           location: str,
-                          camera_type: str = "general") -> Dict[str, Any]:
+                          camera_type: str = "general",
+                          deadline: Optional[float] = None) -> FrameResult:
         """
         Process a single frame for violation detection
         
@@ -33,13 +78,19 @@ class ViolationDetectionService:
             camera_id: Unique camera identifier
             location: Camera location
             camera_type: Type of camera (traffic_light, speed, etc.)
-            
+            deadline: Time budget of the frame in seconds (AI_PROCESSING_TIMEOUT by default,
+                      0 for none) - stages not finished by then are skipped and the
+                      partial result is returned with "degraded" set
+        
         Returns:
-            Detection results with all AI analysis
+            Detection results with all AI analysis - to_dict() for the response
         """
         try:
             detection_id = str(uuid.uuid4())
             start_time = datetime.utcnow()
+            started = time.perf_counter()
+            stage_timings: Dict[str, float] = {}
+            frame_deadline = Deadline(deadline)
             
             logger.info(f"Starting violation detection for frame {detection_id}")
             
@@ -52,83 +103,421 @@ class ViolationDetectionService:
                 "detection_id": detection_id
             }
             
-            # Step 1: Initial analysis with Llama 4 Maverick
-            logger.info("Running Llama 4 Maverick analysis...")
-            llama_results = await self.llama_service.analyze_image(frame_data, context)
+            # Hash, metadata and provider payloads are computed once and shared by all stages
+            frame = PreparedFrame(frame_data)
+            await image_workers.run("preprocess", frame.warm, cost=len(frame_data))
             
-            # Step 2: If violations detected, get detailed analysis with GPT-4o
-            gpt4o_results = {}
-            combined_analysis = {}
+            # Reuse earlier AI results for byte-identical frames - under the same detection zones
+            roi_signature = self.camera_regions.signature(camera_id) if self.camera_regions else ""
+            cache_key = DetectionResultCache.make_key(frame.content_hash, camera_type, PROMPT_VERSION + roi_signature)
+            cached = None
+            if self.result_cache:
+                cached = await self.result_cache.get(cache_key)
             
-            if not llama_results.get("error") and llama_results.get("analysis", {}).get("violations"):
-                logger.info("Violations detected, running GPT-4o verification...")
-                gpt4o_results = await self.gpt4o_service.analyze_violation(frame_data, llama_results)
-                
-                # Generate comprehensive report if high confidence violations found
-                if self._should_generate_report(llama_results, gpt4o_results):
-                    logger.info("Generating detailed violation report...")
-                    report = await self.gpt4o_service.generate_violation_report(
-                        context, 
-                        {"llama": llama_results, "gpt4o": gpt4o_results}
+            # Skip the AI stages when nothing moves inside the camera's ROI
+            motion_gated = False
+            motion_ratio = None
+            if not cached and self.motion_gate:
+                has_motion, motion_ratio = self.motion_gate.evaluate(camera_id, frame.gray_preview)
+                motion_gated = not has_motion
+            
+            # Hashing, cache lookup and motion gate
+            stage_timings["preprocess"] = round(time.perf_counter() - started, 4)
+            
+            # Only the camera's detection zones are sent on, reported coordinates
+            # still refer to the full frame
+            ai_frame = frame
+            if not cached and not motion_gated and self.camera_regions:
+                ai_frame = await self._timed(
+                    stage_timings, "roi",
+                    self.camera_regions.apply(camera_id, frame)
+                )
+                context["roi_applied"] = ai_frame is not frame
+            roi_frame = ai_frame
+            
+            # Reuse the camera's last analysis for perceptually identical frames - never
+            # for a frame with motion, whose few changed hash bits may be a vehicle entering
+            frame_hash = None
+            duplicate = None
+            moving = motion_ratio is not None and motion_ratio >= self.motion_gate.min_motion_ratio
+            if not cached and not motion_gated and self.duplicate_gate:
+                frame_hash = compute_dhash(roi_frame.gray_preview, self.duplicate_gate.hash_size)
+                if not moving:
+                    duplicate = self.duplicate_gate.lookup(camera_id, frame_hash)
+            
+            # First cascade stage: only frames where the local detector finds road users
+            # go on to the remote models, cropped to those objects where worthwhile
+            local_detector_result = None
+            no_relevant_objects = False
+            if not cached and not motion_gated and not duplicate and self.local_detector:
+                escalate, local_detections, ai_frame = await frame_deadline.run(
+                    "local_detector",
+                    self._timed(stage_timings, "local_detector", self.local_detector.evaluate(roi_frame)),
+                    default=(True, [], roi_frame)
+                )
+                no_relevant_objects = not escalate
+                local_detector_result = {
+                    "escalated": escalate,
+                    "cropped": ai_frame is not roi_frame,
+                    "detections": [d.to_dict() for d in local_detections]
+                }
+                if local_detections:
+                    context["detected_objects"] = [d.label for d in local_detections]
+            
+            # Weather, lighting and road conditions of the camera's location, analyzed
+            # once in a while instead of per frame and reused in the prompts
+            if (not cached and not motion_gated and not duplicate and not no_relevant_objects
+                    and self.scene_contexts):
+                scene_context = self.scene_contexts.lookup(camera_id, location, frame)
+                if scene_context:
+                    context["scene_context"] = scene_context
+            
+            coalesced = False
+            if cached:
+                logger.info(f"Detection cache hit for frame {detection_id}")
+                analysis = cached
+            elif motion_gated:
+                logger.debug(f"No motion in frame {detection_id} from camera {camera_id}, skipping AI analysis")
+                analysis = {
+                    "llama": {"analysis": {"violations": [], "scene_analysis": {}}, "skipped": "no_motion"},
+                    "gpt4o": {},
+                    "report": None
+                }
+            elif duplicate:
+                logger.info(f"Near-duplicate frame {detection_id} from camera {camera_id}, reusing last analysis")
+                analysis = duplicate
+            elif no_relevant_objects:
+                logger.debug(f"No road users in frame {detection_id} from camera {camera_id}, skipping AI analysis")
+                analysis = {
+                    "llama": {"analysis": {"violations": [], "scene_analysis": {}}, "skipped": "no_relevant_objects"},
+                    "gpt4o": {},
+                    "report": None
+                }
+            elif frame_deadline.expired:
+                frame_deadline.miss("llama")
+                analysis = self._deadline_analysis()
+            elif self.analysis_flights:
+                # Concurrent requests for the same frame (retries, several operators opening
+                # one upload) share a single analysis instead of each paying for the AI calls
+                wait_started = time.perf_counter()
+                joining = cache_key in self.analysis_flights
+                flight = self.analysis_flights.do(
+                    cache_key,
+                    lambda: self._analyze_and_cache(ai_frame, context, stage_timings, cache_key, frame_deadline)
+                )
+                if joining:
+                    # The analysis runs under the deadline of the frame that started it,
+                    # this frame waits no longer than its own
+                    analysis, coalesced = await frame_deadline.run(
+                        "coalesced_analysis", flight, default=(self._deadline_analysis(), True)
                     )
-                    combined_analysis["detailed_report"] = report
+                else:
+                    analysis, coalesced = await flight
+                if coalesced:
+                    logger.info(f"Frame {detection_id} joined an in-flight analysis of the same image")
+                    stage_timings["coalesced_wait"] = round(time.perf_counter() - wait_started, 4)
+            else:
+                analysis = await self._analyze_and_cache(ai_frame, context, stage_timings, cache_key, frame_deadline)
+            
+            degraded_stages = list(dict.fromkeys(frame_deadline.missed + analysis.get("degraded", [])))
+            analysis_ok = not analysis["llama"].get("error") and not analysis["gpt4o"].get("error")
+            fresh = not cached and not motion_gated and not duplicate and not no_relevant_objects
+            if fresh and analysis_ok and not degraded_stages and self.duplicate_gate:
+                self.duplicate_gate.remember(camera_id, frame_hash, analysis)
+            
+            llama_results = analysis["llama"]
+            gpt4o_results = analysis["gpt4o"]
             
             # Step 3: Combine and validate results
-            final_results = await self._combine_analysis_results(
-                llama_results, 
-                gpt4o_results, 
-                context
+            final_results = await self._timed(
+                stage_timings, "combine",
+                self._combine_analysis_results(
+                    llama_results, 
+                    gpt4o_results, 
+                    context
+                )
             )
+            if analysis.get("report"):
+                final_results.detailed_report = analysis["report"]
+            
+            # Repeated detections of a violation become one event - only new events are
+            # reported and stored, later frames add their evidence to the event. Frames whose
+            # violations are not stored (failed, cached, coalesced) open no events, or the
+            # vehicle's later detections would merge into an event that is never stored.
+            submitted = fresh and not coalesced and analysis_ok
+            new_violations = final_results.violations if submitted else []
+            updated_events = []
+            if self.violation_tracker and new_violations:
+                verified = bool(gpt4o_results.get("analysis")) and not gpt4o_results.get("error")
+                new_violations, updated_events = self.violation_tracker.observe(camera_id, final_results.violations, verified)
+            
+            # New violations are stored in batches and announced once committed
+            persist_status = None
+            if submitted and self.violation_sink and new_violations:
+                stored = self.violation_sink.submit(
+                    detection_id,
+                    context,
+                    {"llama": llama_results, "gpt4o": gpt4o_results},
+                    new_violations
+                )
+                persist_status = "queued" if stored else "rejected"
+            if self.violation_sink and updated_events:
+                # Later evidence, plates and verifications of events stored before
+                self.violation_sink.update(updated_events)
+            
+            # Reports are generated off the request path and announced when ready
+            report_status = None
+            if (submitted and self.report_workers
+                    and new_violations
+                    and self._should_generate_report(llama_results, gpt4o_results)
+                    and not self._all_violations_disputed(gpt4o_results)):
+                queued = self.report_workers.submit(ReportJob(
+                    detection_id,
+                    context,
+                    {"llama": llama_results, "gpt4o": gpt4o_results},
+                    new_violations
+                ))
+                report_status = "queued" if queued else "rejected"
             
             # Step 4: Calculate processing metrics
             processing_time = (datetime.utcnow() - start_time).total_seconds()
+            stage_timings["total"] = round(time.perf_counter() - started, 4)
+            record_frame_metrics(context, stage_timings, analysis, fresh and not coalesced)
             
-            return {
-                "detection_id": detection_id,
-                "status": "completed",
-                "processing_time": processing_time,
-                "violations_detected": len(final_results.get("violations", [])),
-                "results": final_results,
-                "raw_analysis": {
+            return FrameResult(
+                detection_id,
+                "completed",
+                context,
+                processing_time=processing_time,
+                violations_detected=len(final_results.violations),
+                new_violations=len(new_violations),
+                report_status=report_status,
+                persist_status=persist_status,
+                degraded=bool(degraded_stages),
+                deadline={**frame_deadline.to_dict(), "missed_stages": degraded_stages},
+                failed_stages=[stage for stage in ("llama", "gpt4o") if analysis[stage].get("error")],
+                cache_hit=cached is not None,
+                coalesced=coalesced,
+                near_duplicate=duplicate is not None,
+                motion_gated=motion_gated,
+                motion_ratio=motion_ratio,
+                roi_applied=context.get("roi_applied", False),
+                local_detector=local_detector_result,
+                stage_timings=stage_timings,
+                results=final_results,
+                raw_analysis={
                     "llama": llama_results,
                     "gpt4o": gpt4o_results
-                },
-                "context": context
-            }
-            
+                }
+            )
+        
         except Exception as e:
             logger.error(f"Error in violation detection: {str(e)}")
-            return {
-                "detection_id": detection_id if 'detection_id' in locals() else str(uuid.uuid4()),
-                "status": "error",
-                "error": str(e),
-                "context": context if 'context' in locals() else {}
-            }
+            return FrameResult.failed(
+                detection_id if 'detection_id' in locals() else str(uuid.uuid4()),
+                str(e),
+                context if 'context' in locals() else {}
+            )
+    
+    async def _analyze_and_cache(self,
+                                 frame: PreparedFrame,
+                                 context: Dict[str, Any],
+                                 stage_timings: Dict[str, float],
+                                 cache_key: str,
+                                 deadline: Deadline) -> Dict[str, Any]:
+        """Run the AI stages and cache a complete, successful result for byte-identical frames"""
+        analysis = await self._run_ai_analysis(frame, context, stage_timings, deadline)
+        
+        if deadline.missed:
+            # Shared with coalesced frames, which have deadlines of their own
+            analysis["degraded"] = list(deadline.missed)
+        elif self.result_cache and not analysis["llama"].get("error") and not analysis["gpt4o"].get("error"):
+            await self.result_cache.set(cache_key, analysis)
+        return analysis
+    
+    @staticmethod
+    def _deadline_analysis() -> Dict[str, Any]:
+        """Analysis of a frame whose deadline was spent before the AI stages"""
+        return {
+            "llama": {"analysis": {"violations": [], "scene_analysis": {}}, "skipped": "deadline"},
+            "gpt4o": {},
+            "report": None
+        }
+    
+    async def _run_ai_analysis(self,
+                               frame: PreparedFrame,
+                               context: Dict[str, Any],
+                               stage_timings: Dict[str, float],
+                               deadline: Deadline) -> Dict[str, Any]:
+        """
+        Run the AI stages as a small dependency graph
+            
+            llama --+--> gpt4o verification (only if the escalation policy asks for it)
+                    +--> report (depends only on llama, so it can start speculatively)
+        
+        With a streamed Llama response both start as soon as the violations array has
+        arrived. A speculative report is cancelled when verification disputes every violation.
+        With background report generation the report stage is left to the report workers.
+        Stages still running at the deadline are cancelled and the analysis keeps what
+        finished: streamed violations without the scene analysis, unverified violations
+        or no report.
+        """
+        analysis = {"llama": {}, "gpt4o": {}, "report": None}
+        
+        # Step 1: Initial analysis with Llama 4 Maverick
+        logger.info("Running Llama 4 Maverick analysis...")
+        started = time.perf_counter()
+        violations_ready = asyncio.get_running_loop().create_future()
+        llama_task = asyncio.create_task(self._timed(
+            stage_timings, "llama",
+            self.llama_service.analyze_image(frame, context, violations_ready=violations_ready)
+        ))
+        pending_tasks = [llama_task]
+        
+        try:
+            # A streamed response hands over the violations array before the rest of the answer
+            await asyncio.wait(
+                {llama_task, violations_ready},
+                timeout=deadline.remaining(),
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            if not llama_task.done() and not violations_ready.done():
+                deadline.miss("llama")
+                llama_task.cancel()
+                return self._deadline_analysis()
+            early_violations = violations_ready.result() if violations_ready.done() else None
+            
+            if early_violations:
+                stage_timings["llama_violations"] = round(time.perf_counter() - started, 4)
+                llama_results = {"service": "llama-4-maverick", "analysis": {"violations": early_violations}}
+            else:
+                llama_results = analysis["llama"] = await llama_task
+                if llama_results.get("error") or not llama_results.get("analysis", {}).get("violations"):
+                    return analysis
+            
+            # Clear-cut detections skip GPT-4o: too weak ones are dropped, confident ones accepted
+            decisions = self.escalation_policy.triage(llama_results["analysis"]["violations"], self._map_violation_type)
+            if all(decision == DROP for decision in decisions):
+                logger.info("All violations below the drop threshold, skipping GPT-4o")
+                llama_results = analysis["llama"] = await deadline.run("llama", llama_task, default=llama_results)
+                analysis["gpt4o"] = {"skipped": "escalation_policy"}
+                return analysis
+            
+            # Violations of an event verified on an earlier frame are not verified again
+            escalate = ESCALATE in decisions
+            skipped = "escalation_policy"
+            if escalate and self.violation_tracker:
+                escalated = [
+                    self._process_violation(violation, "llama", context)
+                    for violation, decision in zip(llama_results["analysis"]["violations"], decisions)
+                    if decision == ESCALATE
+                ]
+                if self.violation_tracker.all_decided(context["camera_id"], escalated):
+                    logger.info("Violations continue already verified events, skipping GPT-4o verification")
+                    self.violation_tracker.verifications_skipped += 1
+                    escalate = False
+                    skipped = "tracked_event"
+            
+            # Step 2: Verification with GPT-4o, with the report running alongside it
+            verification_task = None
+            if escalate:
+                logger.info("Violations detected, running GPT-4o verification...")
+                verification_task = asyncio.create_task(self._timed(
+                    stage_timings, "verification",
+                    self.gpt4o_service.analyze_violation(frame, llama_results, context.get("scene_context"))
+                ))
+                pending_tasks.append(verification_task)
+            else:
+                logger.info("Escalation policy decided all violations, skipping GPT-4o verification")
+            
+            report_task = None
+            if (settings.SPECULATIVE_REPORT_GENERATION and not self.report_workers
+                    and self._should_generate_report(llama_results, {})):
+                logger.info("Generating detailed violation report (speculative)...")
+                report_task = asyncio.create_task(self._timed(
+                    stage_timings, "report",
+                    self.gpt4o_service.generate_violation_report(context, {"llama": llama_results})
+                ))
+                pending_tasks.append(report_task)
+            
+            # Llama may still be streaming the scene analysis at this point
+            llama_results = analysis["llama"] = await deadline.run("llama", llama_task, default=llama_results)
+            if llama_results.get("error"):
+                for task in pending_tasks:
+                    task.cancel()
+                return analysis
+            
+            if verification_task:
+                gpt4o_results = await deadline.run("verification", verification_task, default={"skipped": "deadline"})
+            else:
+                gpt4o_results = {"skipped": skipped}
+        except BaseException:
+            for task in pending_tasks:
+                task.cancel()
+            raise
+        analysis["gpt4o"] = gpt4o_results
+        
+        if self._all_violations_disputed(gpt4o_results):
+            if report_task:
+                report_task.cancel()
+                logger.info("All violations disputed by GPT-4o, cancelled speculative report")
+            return analysis
+        
+        if report_task:
+            analysis["report"] = await deadline.run("report", report_task)
+        elif not self.report_workers and self._should_generate_report(llama_results, gpt4o_results):
+            # Generate comprehensive report if high confidence violations found
+            logger.info("Generating detailed violation report...")
+            analysis["report"] = await deadline.run("report", self._timed(
+                stage_timings, "report",
+                self.gpt4o_service.generate_violation_report(
+                    context,
+                    {"llama": llama_results, "gpt4o": gpt4o_results}
+                )
+            ))
+        
+        return analysis
+    
+    @staticmethod
+    async def _timed(stage_timings: Dict[str, float], stage: str, coro):
+        """Await a pipeline stage and record its duration in seconds"""
+        started = time.perf_counter()
+        try:
+            return await coro
+        finally:
+            stage_timings[stage] = round(time.perf_counter() - started, 4)
+    
+    def _all_violations_disputed(self, gpt4o_results: Dict[str, Any]) -> bool:
+        """Check whether GPT-4o disputed every detected violation"""
+        verification = gpt4o_results.get("analysis", {}).get("verification")
+        if gpt4o_results.get("error") or not isinstance(verification, dict):
+            return False
+        
+        return (
+            bool(verification.get("disputed_violations"))
+            and not verification.get("confirmed_violations")
+            and not verification.get("additional_violations")
+        )
     
     async def _combine_analysis_results(self, 
                                       llama_results: Dict[str, Any],
                                       gpt4o_results: Dict[str, Any],
-                                      context: Dict[str, Any]) -> Dict[str, Any]:
+                                      context: Dict[str, Any]) -> AnalysisResult:
         """Combine and validate results from both AI services"""
         
-        combined = {
-            "violations": [],
-            "scene_analysis": {},
-            "confidence_metrics": {},
-            "recommendations": {}
-        }
+        combined = AnalysisResult()
         
         # Process Llama results
         if not llama_results.get("error"):
             llama_analysis = llama_results.get("analysis", {})
             llama_violations = llama_analysis.get("violations", [])
             
-            combined["scene_analysis"] = llama_analysis.get("scene_analysis", {})
+            combined.scene_analysis = llama_analysis.get("scene_analysis", {})
             
             # Process each violation
             for violation in llama_violations:
                 processed_violation = self._process_violation(violation, "llama", context)
-                combined["violations"].append(processed_violation)
+                combined.violations.append(processed_violation)
         
         # Enhance with GPT-4o results if available
         if not gpt4o_results.get("error") and gpt4o_results.get("analysis"):
@@ -136,80 +525,85 @@ class ViolationDetectionService:
             
             # Update confidence and verification
             if "verification" in gpt4o_analysis:
-                self._apply_gpt4o_verification(combined["violations"], gpt4o_analysis["verification"])
+                self._apply_gpt4o_verification(combined.violations, gpt4o_analysis["verification"])
             
             # Add quality assessment
             if "evidence_quality" in gpt4o_analysis:
-                combined["confidence_metrics"]["evidence_quality"] = gpt4o_analysis["evidence_quality"]
+                combined.confidence_metrics["evidence_quality"] = gpt4o_analysis["evidence_quality"]
             
             # Add recommendations
             if "recommendations" in gpt4o_analysis:
-                combined["recommendations"] = gpt4o_analysis["recommendations"]
+                combined.recommendations = gpt4o_analysis["recommendations"]
         
         # Calculate overall confidence
-        combined["confidence_metrics"]["overall_confidence"] = self._calculate_overall_confidence(combined)
+        combined.confidence_metrics["overall_confidence"] = self._calculate_overall_confidence(combined)
         
-        # Filter violations by confidence threshold
-        combined["violations"] = [
-            v for v in combined["violations"]
-            if v.get("confidence", 0) >= settings.VIOLATION_DETECTION_THRESHOLD
-        ]
+        # Filter violations by confidence threshold (per violation type) and record how
+        # the escalation policy treats the ones kept
+        kept = []
+        for violation in combined.violations:
+            decision = self.escalation_policy.decide(violation.type, violation.confidence)
+            if decision == DROP:
+                continue
+            violation.escalation = decision
+            kept.append(violation)
+        combined.violations = kept
         
         return combined
     
-    def _process_violation(self, violation: Dict[str, Any], source: str, context: Dict[str, Any]) -> Dict[str, Any]:
+    def _process_violation(self, violation: Dict[str, Any], source: str, context: Dict[str, Any]) -> ViolationRecord:
         """Process and standardize violation data"""
         
-        return {
-            "id": str(uuid.uuid4()),
-            "type": self._map_violation_type(violation.get("type", "other")),
-            "severity": self._map_severity(violation.get("severity", "medium")),
-            "confidence": float(violation.get("confidence", 0.0)),
-            "license_plate": violation.get("license_plate"),
-            "vehicle_type": violation.get("vehicle_type"),
-            "vehicle_color": violation.get("vehicle_color"),
-            "description": violation.get("description", ""),
-            "bounding_box": violation.get("bounding_box", []),
-            "evidence_points": violation.get("evidence_points", []),
-            "detection_source": source,
-            "location": context.get("location"),
-            "camera_id": context.get("camera_id"),
-            "timestamp": context.get("timestamp"),
-            "status": ViolationStatus.DETECTED.value,
-            "verified": False,
-            "requires_review": violation.get("confidence", 0) < 0.9
-        }
+        return ViolationRecord(
+            id=str(uuid.uuid4()),
+            type=self._map_violation_type(violation.get("type", "other")),
+            severity=self._map_severity(violation.get("severity", "medium")),
+            confidence=float(violation.get("confidence", 0.0)),
+            license_plate=violation.get("license_plate"),
+            vehicle_type=violation.get("vehicle_type"),
+            vehicle_color=violation.get("vehicle_color"),
+            description=violation.get("description", ""),
+            bounding_box=violation.get("bounding_box", []),
+            evidence_points=violation.get("evidence_points", []),
+            detection_source=source,
+            location=context.get("location"),
+            camera_id=context.get("camera_id"),
+            timestamp=context.get("timestamp"),
+            status=ViolationStatus.DETECTED.value,
+            verified=False,
+            requires_review=violation.get("confidence", 0) < 0.9
+        )
     
-    def _apply_gpt4o_verification(self, violations: List[Dict[str, Any]], verification: Dict[str, Any]):
+    def _apply_gpt4o_verification(self, violations: List[ViolationRecord], verification: Dict[str, Any]):
         """Apply GPT-4o verification results to violations"""
         
         confirmed = verification.get("confirmed_violations", [])
         disputed = verification.get("disputed_violations", [])
         
         for violation in violations:
-            violation_type = violation["type"]
+            violation_type = violation.type
             
             if any(c.get("type") == violation_type for c in confirmed):
-                violation["verified"] = True
-                violation["verification_confidence"] = 0.95
+                violation.verified = True
+                violation.verification_confidence = 0.95
             elif any(d.get("type") == violation_type for d in disputed):
-                violation["verified"] = False
-                violation["verification_notes"] = "Disputed by GPT-4o analysis"
-                violation["requires_review"] = True
+                violation.verified = False
+                violation.verification_notes = "Disputed by GPT-4o analysis"
+                violation.requires_review = True
     
-    def _calculate_overall_confidence(self, analysis: Dict[str, Any]) -> float:
+    def _calculate_overall_confidence(self, analysis: AnalysisResult) -> float:
         """Calculate overall confidence score"""
         
-        violations = analysis.get("violations", [])
+        violations = analysis.violations
         if not violations:
             return 0.0
         
         # Base confidence from individual violations
-        violation_confidences = [v.get("confidence", 0.0) for v in violations]
+        violation_confidences = [v.confidence for v in violations]
         base_confidence = sum(violation_confidences) / len(violation_confidences)
         
         # Adjust based on evidence quality
-        evidence_quality = analysis.get("confidence_metrics", {}).get("evidence_quality", {})
+        evidence_quality = analysis.confidence_metrics.get("evidence_quality", {})
         quality_score = evidence_quality.get("overall_quality_score", 0.8)
         
         # Combine scores
@@ -258,53 +652,196 @@ class ViolationDetectionService:
     
     async def process_batch(self, 
                            frames: List[Tuple[bytes, Dict[str, Any]]],
-                           batch_size: int = None) -> List[Dict[str, Any]]:
-        """Process multiple frames in batch"""
+                           max_concurrency: int = None,
+                           include_raw: bool = False) -> List[FrameResult]:
+        """
+        Process multiple frames in batch, results are returned in input order
         
-        if batch_size is None:
-            batch_size = settings.BATCH_PROCESSING_SIZE
+        Args:
+            frames: List of (frame bytes, context) pairs
+            max_concurrency: Upper bound of frames processed at once (BATCH_MAX_CONCURRENCY by default);
+                the AIMD limiter starts at BATCH_PROCESSING_SIZE and adjusts below this bound
+            include_raw: Keep the raw provider results of each frame (released otherwise)
+        """
+        
+        results = [None] * len(frames)
+        async for result in self.process_batch_stream(frames, max_concurrency, include_raw):
+            results[result.frame_index] = result
+        
+        return results
+    
+    async def process_batch_stream(self,
+                                   frames: List[Tuple[bytes, Dict[str, Any]]],
+                                   max_workers: int = None,
+                                   include_raw: bool = False) -> AsyncIterator[FrameResult]:
+        """
+        Process multiple frames through a continuous work queue
         
-        results = []
+        Requests in flight are bounded by the shared AIMD limiter, so batch throughput
+        follows what the providers can serve. Results are yielded as soon as each frame
+        finishes (not in input order) and carry their frame_index.
         
-        # Process in batches to avoid overwhelming the APIs
-        for i in range(0, len(frames), batch_size):
-            batch = frames[i:i + batch_size]
+        Args:
+            frames: List of (frame bytes, context) pairs - a context may set the frame's "deadline"
+            max_workers: Upper bound of concurrent frames for this batch
+            include_raw: Keep the raw provider results of each frame (released otherwise)
+        """
+        if not frames:
+            return
+        
+        if max_workers is None:
+            max_workers = self.batch_limiter.max_limit
+        
+        work_queue: asyncio.Queue = asyncio.Queue()
+        result_queue: asyncio.Queue = asyncio.Queue()
+        for index, (frame_data, context) in enumerate(frames):
+            work_queue.put_nowait((index, frame_data, context, 0))
+        
+        workers = [
+            asyncio.create_task(self._batch_worker(work_queue, result_queue, include_raw))
+            for _ in range(min(max_workers, len(frames)))
+        ]
+        
+        try:
+            for _ in range(len(frames)):
+                yield await result_queue.get()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+    
+    async def _batch_worker(self, work_queue: asyncio.Queue, result_queue: asyncio.Queue, include_raw: bool):
+        """Take frames off the work queue until the batch is cancelled"""
+        while True:
+            index, frame_data, context, attempt = await work_queue.get()
             
-            # Process batch concurrently
-            tasks = [
-                self.process_frame(
+            await self.batch_limiter.acquire()
+            latency, overloaded, retry_after = None, False, None
+            try:
+                result = await self.process_frame(
                     frame_data,
                     context.get("camera_id", ""),
                     context.get("location", ""),
-                    context.get("camera_type", "general")
+                    context.get("camera_type", "general"),
+                    context.get("deadline")
                 )
-                for frame_data, context in batch
-            ]
-            
-            batch_results = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            # Handle exceptions
-            for j, result in enumerate(batch_results):
-                if isinstance(result, Exception):
-                    logger.error(f"Error processing frame {i+j}: {str(result)}")
-                    results.append({
-                        "status": "error",
-                        "error": str(result),
-                        "frame_index": i + j
-                    })
-                else:
-                    results.append(result)
+                latency, overloaded, retry_after = self._provider_backpressure(result)
+                if not include_raw:
+                    # The provider responses are the bulk of a result held until the batch ends
+                    result.raw_analysis = None
+            except Exception as e:
+                logger.error(f"Error processing frame {index}: {str(e)}")
+                result = FrameResult.failed(None, str(e), context)
+            finally:
+                await self.batch_limiter.release(latency, overloaded, retry_after)
             
-            # Small delay between batches to respect rate limits
-            if i + batch_size < len(frames):
-                await asyncio.sleep(1)
+            # Throttled frames go back on the queue and run once the limiter allows it
+            if overloaded and attempt < settings.BATCH_MAX_RETRIES:
+                logger.warning(f"Provider overloaded, requeueing frame {index} (attempt {attempt + 1})")
+                work_queue.put_nowait((index, frame_data, context, attempt + 1))
+                continue
+            
+            result.frame_index = index
+            result_queue.put_nowait(result)
+    
+    def _provider_backpressure(self, result: FrameResult) -> Tuple[Optional[float], bool, Optional[float]]:
+        """Extract provider latency, overload (429/5xx) and Retry-After from a frame result"""
+        latency = result.stage_timings.get("llama")
+        overloaded = False
+        retry_after = None
         
-        return results
+        for stage_results in (result.raw_analysis or {}).values():
+            status_code = (stage_results or {}).get("status_code")
+            if status_code == 429 or (status_code and status_code >= 500):
+                overloaded = True
+                stage_retry_after = stage_results.get("retry_after")
+                if stage_retry_after:
+                    retry_after = max(retry_after or 0.0, stage_retry_after)
+        
+        return latency, overloaded, retry_after
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get detection pipeline statistics"""
+        return {
+            "connection_pools": {
+                "llama": self.llama_service.pool_monitor.get_stats(),
+                "gpt4o": self.gpt4o_service.pool_monitor.get_stats()
+            },
+            "providers": {
+                "llama": self.llama_service.router.get_stats(),
+                "gpt4o": self.gpt4o_service.router.get_stats()
+            },
+            "result_cache": self.result_cache.get_stats() if self.result_cache else None,
+            "near_duplicate_gate": self.duplicate_gate.get_stats() if self.duplicate_gate else None,
+            "motion_gate": self.motion_gate.get_stats() if self.motion_gate else None,
+            "camera_regions": self.camera_regions.get_stats() if self.camera_regions else None,
+            "local_detector": self.local_detector.get_stats() if self.local_detector else None,
+            "batch_concurrency": self.batch_limiter.get_stats(),
+            "escalation_policy": self.escalation_policy.get_stats(),
+            "violation_tracking": self.violation_tracker.get_stats() if self.violation_tracker else None,
+            "scene_context": self.scene_contexts.get_stats() if self.scene_contexts else None,
+            "mosaic_batching": self.llama_service.mosaic_batcher.get_stats() if self.llama_service.mosaic_batcher else None,
+            "analysis_coalescing": self.analysis_flights.get_stats() if self.analysis_flights else None,
+            "report_workers": self.report_workers.get_stats() if self.report_workers else None,
+            "violation_sink": self.violation_sink.get_stats() if self.violation_sink else None,
+            "image_workers": image_workers.get_stats(),
+            "structured_output": get_parser_stats()
+        }
+    
+    def set_camera_zones(self, camera_id: str, zones: Optional[List[Dict[str, Any]]]):
+        """
+        Apply a camera's detection zones to the pipeline
+        
+        Args:
+            camera_id: Camera identifier used in process_frame
+            zones: The camera's detection_zones, None or [] to analyze the full frame
+        """
+        camera_id = str(camera_id)
+        polygons = self.camera_regions.set_zones(camera_id, zones) if self.camera_regions else []
+        if self.motion_gate:
+            self.motion_gate.set_regions_of_interest(camera_id, polygons or None)
+        if self.duplicate_gate:
+            # Analyses remembered for the old zones no longer apply
+            self.duplicate_gate.reset(camera_id)
+    
+    async def load_camera_zones(self) -> int:
+        """
+        Apply the detection zones of all cameras in the database
+        
+        Returns:
+            Number of cameras with zones
+        """
+        # Imported here so the detection pipeline itself runs without the database (benchmarks)
+        from sqlalchemy import select
+        from app.core.database import AsyncSessionLocal
+        from app.models.camera import Camera
+        
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(select(Camera.id, Camera.detection_zones))
+            rows = result.all()
+        
+        for camera_id, zones in rows:
+            if zones:
+                self.set_camera_zones(str(camera_id), zones)
+        return sum(1 for _, zones in rows if zones)
+    
+    async def close(self):
+        """Finish queued reports, store buffered violations and close AI service connections"""
+        if self.report_workers:
+            await self.report_workers.stop()
+        if self.violation_sink:
+            await self.violation_sink.close()
+        if self.scene_contexts:
+            await self.scene_contexts.close()
+        await self.llama_service.close()
+        await self.gpt4o_service.close()
     
     async def __aenter__(self):
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        # Close AI service connections
-        await self.llama_service.__aexit__(exc_type, exc_val, exc_tb)
-        await self.gpt4o_service.__aexit__(exc_type, exc_val, exc_tb)
\ No newline at end of file
+        await self.close()
+
+def get_violation_detector(request: Request) -> ViolationDetectionService:
+    """Dependency to get the application-scoped detection service"""
+    return request.app.state.violation_detector
\ No newline at end of file
@@ -0,0 +1,351 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List, Tuple
+from loguru import logger
+
+from app.core.config import settings
+from app.services.detection_results import ViolationRecord
+from app.services.report_worker import ReportJob
+
+# Longest wait before writing again after the database was unreachable
+MAX_RETRY_DELAY_SECONDS = 30.0
+
+class _PendingViolation:
+    __slots__ = ("violation", "detection_id", "context", "analysis", "report", "submitted_at")
+    
+    def __init__(self, violation: ViolationRecord, detection_id: str, context: Dict[str, Any], analysis: Dict[str, Any]):
+        self.violation = violation
+        self.detection_id = detection_id
+        self.context = context
+        self.analysis = analysis
+        self.report: Optional[Dict[str, Any]] = None
+        self.submitted_at = time.perf_counter()
+
+class ViolationSink:
+    """
+    Stores detected violations in the violations table in batches
+    
+    New violations are buffered and written with one bulk insert and one transaction
+    per batch, as soon as batch_size rows are waiting or the oldest has waited
+    flush_interval seconds. One batch is written at a time, so rows arriving during a
+    write make the next batch larger instead of opening more connections. Every batch
+    is announced on the violations channel once committed.
+    
+    Reports generated later, and later frames' changes of a tracked event (a plate read,
+    a verification), are merged into rows that are still buffered and written as
+    updates of rows already stored.
+    
+    When the database cannot be reached (restart, dropped connection) the batch goes
+    back into the buffer and is written again after a growing delay. Only rows the
+    database refuses are lost.
+    """
+    
+    def __init__(self, batch_size: int = None, flush_interval: float = None, max_pending: int = None):
+        self.batch_size = max(1, batch_size if batch_size is not None else settings.VIOLATION_SINK_BATCH_SIZE)
+        self.flush_interval = flush_interval if flush_interval is not None else settings.VIOLATION_SINK_FLUSH_INTERVAL_MS / 1000
+        self.max_pending = max_pending if max_pending is not None else settings.VIOLATION_SINK_MAX_PENDING
+        self._pending: Dict[str, _PendingViolation] = {}
+        self._in_flight: Dict[str, _PendingViolation] = {}
+        # Recently stored violations, for later updates of their rows
+        self._stored: "OrderedDict[str, _PendingViolation]" = OrderedDict()
+        self._changed: Dict[str, _PendingViolation] = {}
+        self._writing: Optional[asyncio.Task] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._retry_delay = 0.0
+        self._closing = False
+        
+        # Counters
+        self.batches = 0
+        self.written = 0
+        self.failed = 0
+        self.skipped = 0
+        self.dropped = 0
+        self.reports_merged = 0
+        self.reports_updated = 0
+        self.events_updated = 0
+        self.retried = 0
+        self.wait_seconds = 0.0
+    
+    def submit(self, detection_id: str, context: Dict[str, Any], analysis: Dict[str, Any], violations: List[ViolationRecord]) -> bool:
+        """
+        Buffer a frame's new violations without waiting
+        
+        Args:
+            detection_id: Frame the violations were detected in
+            context: Frame context (camera_id, location, timestamp)
+            analysis: The frame's llama/gpt4o results
+            violations: Violations to store
+        
+        Returns:
+            False if the buffer is full and the violations were dropped
+        """
+        if len(self._pending) + len(violations) > self.max_pending:
+            self.dropped += len(violations)
+            logger.warning(f"Violation sink full, {len(violations)} violations of detection {detection_id} not stored")
+            return False
+        
+        for violation in violations:
+            self._pending[violation.id] = _PendingViolation(violation, detection_id, context, analysis)
+        self._schedule()
+        return True
+    
+    def update(self, violations: List[ViolationRecord]):
+        """
+        Store later changes of submitted violations without waiting
+        
+        Buffered violations are inserted with their latest values anyway; rows already
+        stored (or being written) are updated with the next batch.
+        
+        Args:
+            violations: Changed violations, by the id they were submitted with
+        """
+        for violation in violations:
+            if violation.id in self._pending:
+                continue
+            item = self._in_flight.get(violation.id) or self._stored.get(violation.id)
+            if item is None:
+                # Dropped, or stored too long ago to be remembered
+                continue
+            item.violation = violation
+            self._changed[violation.id] = item
+        self._schedule()
+    
+    def _schedule(self):
+        if self._retry_delay:
+            # The database was unreachable, wait before the next attempt
+            if (self._pending or self._changed) and self._timer is None:
+                self._timer = asyncio.get_running_loop().call_later(self._retry_delay, self._flush)
+        elif len(self._pending) >= self.batch_size:
+            self._flush()
+        elif (self._pending or self._changed) and self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.flush_interval, self._flush)
+    
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._writing is not None or not (self._pending or self._changed):
+            # The running write schedules the next batch when it is done
+            return
+        
+        ids = list(self._pending)[:self.batch_size]
+        batch = [self._pending.pop(violation_id) for violation_id in ids]
+        changed = list(self._changed.values())
+        self._changed = {}
+        self._in_flight = {item.violation.id: item for item in batch}
+        self._writing = asyncio.create_task(self._write(batch, changed))
+    
+    def _remember(self, items: List[_PendingViolation]):
+        for item in items:
+            self._stored[item.violation.id] = item
+        while len(self._stored) > self.max_pending:
+            self._stored.popitem(last=False)
+    
+    async def _write(self, batch: List[_PendingViolation], changed: List[_PendingViolation]):
+        try:
+            # Imported here so the detection pipeline itself runs without the database (benchmarks)
+            from app.services.violation_store import build_violation_row
+            from app.websocket.endpoints import broadcast_violation_batch
+            
+            started = time.perf_counter()
+            
+            rows = []
+            items = {}
+            for item in batch:
+                try:
+                    row = build_violation_row(item.violation, item.context, item.analysis, item.report)
+                except Exception as e:
+                    self.failed += 1
+                    logger.error(f"Violation {item.violation.id} cannot be stored: {str(e)}")
+                    continue
+                if row is None:
+                    self.skipped += 1
+                    continue
+                rows.append(row)
+                items[id(row)] = item
+            
+            if len(rows) < len(batch):
+                logger.warning(f"{len(batch) - len(rows)} violations of the batch not stored")
+            
+            stored_rows, unsent_rows = await self._insert(rows) if rows else ([], [])
+            stored = [items[id(row)] for row in stored_rows]
+            self.written += len(stored)
+            self._remember(stored)
+            unsent = [items[id(row)] for row in unsent_rows]
+            # Requeued violations count their wait once they leave the buffer for good
+            self.wait_seconds += sum(started - item.submitted_at for item in batch if item not in unsent)
+            if unsent:
+                self._requeue(unsent, changed)
+                changed = []
+            else:
+                self._retry_delay = 0.0
+            
+            if stored:
+                try:
+                    await broadcast_violation_batch([
+                        {
+                            **item.violation.to_dict(),
+                            "detection_id": item.detection_id,
+                            "detailed_report": item.report
+                        }
+                        for item in stored
+                    ])
+                except Exception as e:
+                    logger.error(f"Failed to announce stored violations: {str(e)}")
+            
+            if changed:
+                await self._update(changed)
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error(f"Failed to store a batch of {len(batch)} violations: {str(e)}")
+        finally:
+            self._in_flight = {}
+            self._writing = None
+            self._schedule()
+    
+    async def _insert(self, rows: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Insert rows in one transaction, splitting the batch when a row is rejected
+        
+        A row the database refuses rolls back its whole transaction, so a failed batch
+        is retried in halves down to single rows - one bad row does not lose the others.
+        Rows are not sent on once the database is unreachable.
+        
+        Returns:
+            Tuple of (rows written, rows not sent because the database was unreachable)
+        """
+        # Imported here so the detection pipeline itself runs without the database (benchmarks)
+        from sqlalchemy.exc import SQLAlchemyError, InterfaceError, OperationalError
+        from app.services.violation_store import save_violations
+        
+        try:
+            await save_violations(rows)
+            self.batches += 1
+            return rows, []
+        except Exception as e:
+            rejected = isinstance(e, SQLAlchemyError) and not isinstance(e, (InterfaceError, OperationalError))
+            if not rejected:
+                logger.error(f"Database unavailable, {len(rows)} violations not stored yet: {str(e)}")
+                return [], rows
+            if len(rows) == 1:
+                self.failed += 1
+                logger.error(f"Violation rejected by the database: {str(e)}")
+                return [], []
+            
+            logger.warning(f"Batch of {len(rows)} violations rejected, retrying in halves: {str(e)}")
+            middle = len(rows) // 2
+            stored, unsent = await self._insert(rows[:middle])
+            if unsent:
+                return stored, unsent + rows[middle:]
+            more_stored, unsent = await self._insert(rows[middle:])
+            return stored + more_stored, unsent
+    
+    def _requeue(self, items: List[_PendingViolation], changed: List[_PendingViolation]):
+        """Put violations the database could not take back in front of the buffer"""
+        if self._closing:
+            self.failed += len(items)
+            logger.error(f"Database unavailable at shutdown, {len(items)} violations not stored")
+            return
+        
+        queue = [(item.violation.id, item) for item in items] + list(self._pending.items())
+        if len(queue) > self.max_pending:
+            self.dropped += len(queue) - self.max_pending
+            logger.warning(f"Violation sink full, {len(queue) - self.max_pending} violations not stored")
+            queue = queue[:self.max_pending]
+        self._pending = dict(queue)
+        # Changes of stored rows are written once the database is back
+        for item in changed:
+            self._changed.setdefault(item.violation.id, item)
+        
+        self.retried += len(items)
+        self._retry_delay = min(MAX_RETRY_DELAY_SECONDS, max(self.flush_interval, self._retry_delay * 2))
+        logger.warning(f"Retrying {len(items)} violations in {self._retry_delay:.1f}s")
+    
+    async def _update(self, items: List[_PendingViolation]):
+        """Write the changed violation columns of stored rows in one transaction and announce them"""
+        # Imported here so the detection pipeline itself runs without the database (benchmarks)
+        from app.services.violation_store import EVENT_COLUMNS, build_violation_row, update_violations
+        from app.websocket.endpoints import broadcast_violation_updates
+        
+        rows = [build_violation_row(item.violation, item.context, item.analysis, item.report) for item in items]
+        rows = [row for row in rows if row is not None]
+        try:
+            self.events_updated += await update_violations(rows, EVENT_COLUMNS)
+        except Exception as e:
+            logger.error(f"Failed to update {len(rows)} stored violations: {str(e)}")
+            return
+        
+        try:
+            await broadcast_violation_updates([item.violation.to_dict() for item in items])
+        except Exception as e:
+            logger.error(f"Failed to announce updated violations: {str(e)}")
+    
+    async def attach_report(self, job: ReportJob, report: Dict[str, Any]):
+        """Add a generated report to the job's violations and announce it"""
+        # Imported here so the detection pipeline itself runs without the database (benchmarks)
+        from app.services.violation_store import REPORT_COLUMNS, build_violation_row, update_violations
+        from app.websocket.endpoints import broadcast_violation_report
+        
+        stored = []
+        for violation in job.violations:
+            item = self._pending.get(violation.id)
+            if item is not None:
+                # Not written yet, the report goes into the insert
+                item.report = report
+                self.reports_merged += 1
+            else:
+                stored.append(violation)
+                # Later updates of the row rebuild its analysis with the report
+                item = self._in_flight.get(violation.id) or self._stored.get(violation.id)
+                if item is not None:
+                    item.report = report
+        
+        if stored and self._writing is not None and any(v.id in self._in_flight for v in stored):
+            # Rows of the batch being written can only be updated once it is committed
+            await asyncio.shield(self._writing)
+        
+        rows = [build_violation_row(v, job.context, job.analysis, report) for v in stored]
+        rows = [row for row in rows if row is not None]
+        if rows:
+            try:
+                self.reports_updated += await update_violations(rows, REPORT_COLUMNS)
+            except Exception as e:
+                logger.error(f"Failed to store the report of detection {job.detection_id}: {str(e)}")
+        
+        await broadcast_violation_report({
+            "detection_id": job.detection_id,
+            "violation_ids": [v.id for v in job.violations],
+            "detailed_report": report
+        })
+    
+    async def close(self):
+        """Write everything still buffered"""
+        # One more attempt, violations are not put back once closing
+        self._closing = True
+        while self._pending or self._changed or self._writing is not None:
+            if self._writing is None:
+                self._flush()
+            await asyncio.shield(self._writing)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get violation sink statistics"""
+        queued = self.written + self.failed + self.skipped
+        
+        return {
+            "pending": len(self._pending),
+            "writing": len(self._in_flight),
+            "batch_size": self.batch_size,
+            "batches": self.batches,
+            "written": self.written,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "dropped": self.dropped,
+            "avg_batch_size": round(self.written / self.batches, 2) if self.batches else 0.0,
+            "avg_wait_ms": round(self.wait_seconds / queued * 1000, 2) if queued else 0.0,
+            "reports_merged": self.reports_merged,
+            "reports_updated": self.reports_updated,
+            "events_updated": self.events_updated,
+            "retried": self.retried,
+            "retry_delay": self._retry_delay
+        }
\ No newline at end of file
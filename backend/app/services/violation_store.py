@@ -0,0 +1,134 @@
+import math
+import uuid
+from datetime import datetime
+from typing import Dict, Any, Optional, List, Tuple
+from loguru import logger
+from sqlalchemy import insert, update
+
+from app.core.database import AsyncSessionLocal
+from app.models.violation import Violation, ViolationType, ViolationSeverity, ViolationStatus
+from app.services.detection_results import ViolationRecord
+
+# Columns that depend on the GPT-4o report, written again once it is ready
+REPORT_COLUMNS = ("fine_amount", "penalty_points", "ai_analysis")
+
+# Columns later frames of a tracked event can change
+EVENT_COLUMNS = ("confidence_score", "license_plate", "vehicle_type", "vehicle_color", "ai_analysis")
+
+def _as_uuid(value: Any) -> Optional[uuid.UUID]:
+    try:
+        return value if isinstance(value, uuid.UUID) else uuid.UUID(str(value))
+    except (TypeError, ValueError):
+        return None
+
+def _as_float(value: Any) -> Optional[float]:
+    """Number from a model answer ("150", "$150", "1,500.00"), None if it is not one"""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, str):
+        value = value.strip().lstrip("$€£₹").replace(",", "").strip()
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+def _as_int(value: Any) -> Optional[int]:
+    """Whole number from a model answer, None for ranges ("3-5") and anything else"""
+    number = _as_float(value)
+    return int(number) if number is not None and number.is_integer() else None
+
+def build_violation_row(violation: ViolationRecord,
+                        context: Dict[str, Any],
+                        analysis: Dict[str, Any],
+                        report: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Map a processed pipeline violation to violations table columns
+    
+    Args:
+        violation: Processed violation of the frame
+        context: Frame context (camera_id, location, timestamp, detection_id)
+        analysis: The frame's llama/gpt4o results
+        report: Generated GPT-4o report, if any
+    
+    Returns:
+        Column values, or None if the frame's camera_id is not a camera record id
+    """
+    camera_id = _as_uuid(context.get("camera_id"))
+    if camera_id is None:
+        return None
+    
+    recommendations = (report or {}).get("recommendations") or {}
+    timestamp = context.get("timestamp")
+    
+    return {
+        "id": _as_uuid(violation.id) or uuid.uuid4(),
+        "camera_id": camera_id,
+        "violation_type": ViolationType(violation.type),
+        "severity": ViolationSeverity(violation.severity),
+        "status": ViolationStatus(violation.status or ViolationStatus.DETECTED.value),
+        "license_plate": violation.license_plate,
+        "vehicle_type": violation.vehicle_type,
+        "vehicle_color": violation.vehicle_color,
+        "location": violation.location or context.get("location") or "Unknown",
+        "detection_time": datetime.fromisoformat(timestamp) if timestamp else datetime.utcnow(),
+        "confidence_score": min(1.0, max(0.0, float(violation.confidence))),
+        "fine_amount": _as_float(recommendations.get("fine_amount")),
+        "penalty_points": _as_int(recommendations.get("penalty_points")),
+        "ai_analysis": {
+            "detection_id": context.get("detection_id"),
+            "violation": violation.to_dict(),
+            "detailed_report": report
+        },
+        "llama_analysis": analysis.get("llama") or None,
+        "gpt4o_analysis": analysis.get("gpt4o") or None
+    }
+
+async def save_violations(rows: List[Dict[str, Any]]) -> int:
+    """
+    Insert violation rows in one transaction
+    
+    Returns:
+        Number of rows written
+    """
+    if not rows:
+        return 0
+    
+    async with AsyncSessionLocal() as session:
+        try:
+            await session.execute(insert(Violation), rows)
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+    
+    logger.debug(f"Persisted {len(rows)} violations")
+    return len(rows)
+
+async def update_violations(rows: List[Dict[str, Any]], columns: Tuple[str, ...]) -> int:
+    """
+    Write some columns of stored violation rows in one transaction
+    
+    Args:
+        rows: Rows from build_violation_row, matched by id
+        columns: Columns to write (REPORT_COLUMNS, EVENT_COLUMNS)
+    
+    Returns:
+        Number of rows given
+    """
+    if not rows:
+        return 0
+    
+    async with AsyncSessionLocal() as session:
+        try:
+            await session.execute(
+                update(Violation),
+                [{"id": row["id"], **{column: row[column] for column in columns}} for row in rows]
+            )
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+    
+    logger.debug(f"Updated {', '.join(columns)} of {len(rows)} violations")
+    return len(rows)
\ No newline at end of file
@@ -0,0 +1,240 @@
+import math
+import re
+import time
+from typing import Dict, Any, Optional, List, Tuple
+from loguru import logger
+
+from app.core.config import settings
+from app.services.detection_results import ViolationRecord
+from app.services.escalation_policy import ACCEPT
+
+# Evidence kept per event - later frames add points until this cap
+MAX_EVIDENCE_POINTS = 20
+
+# Verification fields an event's later frames take over from its record
+VERIFICATION_FIELDS = ("verified", "verification_confidence", "verification_notes", "requires_review")
+
+def _normalize_plate(plate: Optional[str]) -> Optional[str]:
+    if not plate:
+        return None
+    normalized = re.sub(r"[^A-Z0-9]", "", str(plate).upper())
+    return normalized or None
+
+def _normalize_text(value: Optional[str]) -> Optional[str]:
+    return str(value).strip().lower() if value else None
+
+def _box_center_and_size(box: Any) -> Optional[tuple]:
+    if not isinstance(box, (list, tuple)) or len(box) != 4:
+        return None
+    try:
+        x1, y1, x2, y2 = (float(v) for v in box)
+    except (TypeError, ValueError):
+        return None
+    return (x1 + x2) / 2, (y1 + y2) / 2, math.hypot(x2 - x1, y2 - y1)
+
+class TrackedEvent:
+    """One violation seen across consecutive frames of a camera"""
+    
+    __slots__ = ("record", "violation_type", "plate", "vehicle_type", "vehicle_color", "box", "last_seen", "frames", "decided")
+    
+    def __init__(self, record: ViolationRecord, now: float, decided: bool):
+        self.record = record
+        self.violation_type = record.type
+        self.plate = _normalize_plate(record.license_plate)
+        self.vehicle_type = _normalize_text(record.vehicle_type)
+        self.vehicle_color = _normalize_text(record.vehicle_color)
+        self.box = record.bounding_box
+        # Later frames add to it, it must not be the provider response's list
+        record.evidence_points = list(record.evidence_points)
+        self.last_seen = now
+        self.frames = 1
+        self.decided = decided
+    
+    @property
+    def event_id(self) -> str:
+        return self.record.id
+    
+    def matches(self, violation: ViolationRecord, max_distance: float) -> bool:
+        """Same violation type and the same vehicle - by plate, or by signature and position"""
+        if violation.type != self.violation_type:
+            return False
+        
+        plate = _normalize_plate(violation.license_plate)
+        if plate and self.plate:
+            return plate == self.plate
+        
+        # Without two plates to compare, the visible vehicle details must not disagree
+        vehicle_type = _normalize_text(violation.vehicle_type)
+        vehicle_color = _normalize_text(violation.vehicle_color)
+        if vehicle_type and self.vehicle_type and vehicle_type != self.vehicle_type:
+            return False
+        if vehicle_color and self.vehicle_color and vehicle_color != self.vehicle_color:
+            return False
+        
+        current = _box_center_and_size(violation.bounding_box)
+        previous = _box_center_and_size(self.box)
+        if current and previous:
+            distance = math.hypot(current[0] - previous[0], current[1] - previous[1])
+            return distance <= max_distance * max(current[2], previous[2])
+        
+        # No position to compare: only a complete signature is specific enough
+        return bool(vehicle_type and vehicle_color and self.vehicle_type and self.vehicle_color)
+    
+    def merge(self, violation: ViolationRecord, now: float, decided: bool) -> bool:
+        """
+        Add a later frame's evidence to the event record
+        
+        Returns:
+            Whether the record changed beyond the event's frame count and times
+        """
+        record = self.record
+        self.frames += 1
+        self.last_seen = now
+        self.box = violation.bounding_box or self.box
+        changed = False
+        
+        if violation.confidence > record.confidence:
+            record.confidence = violation.confidence
+            changed = True
+        for field in ("license_plate", "vehicle_type", "vehicle_color"):
+            if not getattr(record, field) and getattr(violation, field):
+                setattr(record, field, getattr(violation, field))
+                changed = True
+        self.plate = self.plate or _normalize_plate(record.license_plate)
+        self.vehicle_type = self.vehicle_type or _normalize_text(record.vehicle_type)
+        self.vehicle_color = self.vehicle_color or _normalize_text(record.vehicle_color)
+        
+        evidence = record.evidence_points
+        for point in violation.evidence_points:
+            if point not in evidence and len(evidence) < MAX_EVIDENCE_POINTS:
+                evidence.append(point)
+                changed = True
+        
+        if decided and not self.decided:
+            # First verification of the event happened on this frame
+            for field in VERIFICATION_FIELDS:
+                setattr(record, field, getattr(violation, field))
+            self.decided = True
+            changed = True
+        
+        record.event = self.summary(violation.timestamp)
+        return changed
+    
+    def summary(self, last_seen_at: Optional[str] = None) -> Dict[str, Any]:
+        previous = self.record.event or {}
+        return {
+            "event_id": self.event_id,
+            "frames": self.frames,
+            "first_seen": previous.get("first_seen") or self.record.timestamp,
+            "last_seen": last_seen_at or previous.get("last_seen") or self.record.timestamp
+        }
+
+class ViolationTracker:
+    """
+    Merges a camera's repeated detections of one violation into a single event
+    
+    A vehicle running a red light is in many consecutive frames. A detection joins an
+    open event of its camera when the violation type matches and it shows the same
+    vehicle - equal plates, or matching vehicle type and color within max_distance box
+    diagonals of the event's last position - no more than window seconds after the
+    event was last seen. The first detection is the event's record (its id, report and
+    database row); later ones only add evidence to it and take over its verification.
+    """
+    
+    def __init__(self, window: float = None, max_distance: float = None):
+        self.window = window if window is not None else settings.VIOLATION_TRACKING_WINDOW_SECONDS
+        self.max_distance = max_distance if max_distance is not None else settings.VIOLATION_TRACKING_MAX_DISTANCE
+        self._events: Dict[str, List[TrackedEvent]] = {}
+        
+        # Counters
+        self.events = 0
+        self.merged = 0
+        self.verifications_skipped = 0
+    
+    def find(self, camera_id: str, violation: ViolationRecord) -> Optional[TrackedEvent]:
+        """Open event a violation belongs to, if any"""
+        now = time.monotonic()
+        for event in self._events.get(str(camera_id), []):
+            if now - event.last_seen <= self.window and event.matches(violation, self.max_distance):
+                return event
+        return None
+    
+    def all_decided(self, camera_id: str, violations: List[ViolationRecord]) -> bool:
+        """Whether every violation continues an event that was already verified or accepted"""
+        for violation in violations:
+            event = self.find(camera_id, violation)
+            if event is None or not event.decided:
+                return False
+        return bool(violations)
+    
+    def observe(self, camera_id: str, violations: List[ViolationRecord], verified: bool) -> Tuple[List[ViolationRecord], List[ViolationRecord]]:
+        """
+        Assign a frame's processed violations to events
+        
+        Violations continuing an event take over its id (is_repeat is set) and,
+        if the event was verified before, its verification.
+        
+        Args:
+            camera_id: Camera the frame came from
+            violations: The frame's processed violations, updated in place
+            verified: Whether GPT-4o verified this frame
+        
+        Returns:
+            Tuple of (violations that started new events, records of earlier events this
+            frame changed - their stored rows are out of date)
+        """
+        camera_id = str(camera_id)
+        now = time.monotonic()
+        events = [event for event in self._events.get(camera_id, []) if now - event.last_seen <= self.window]
+        claimed = set()
+        new_violations = []
+        updated_events = []
+        
+        for violation in violations:
+            decided = verified or violation.escalation == ACCEPT
+            # One frame cannot show the same vehicle twice - each event takes one violation
+            event = next(
+                (e for e in events if id(e) not in claimed and e.matches(violation, self.max_distance)),
+                None
+            )
+            
+            if event is None:
+                event = TrackedEvent(violation, now, decided)
+                events.append(event)
+                violation.event = event.summary()
+                new_violations.append(violation)
+                self.events += 1
+            else:
+                if event.merge(violation, now, decided):
+                    updated_events.append(event.record)
+                violation.id = event.event_id
+                violation.event = event.record.event
+                violation.is_repeat = True
+                if event.decided and not verified:
+                    for field in VERIFICATION_FIELDS:
+                        setattr(violation, field, getattr(event.record, field))
+                self.merged += 1
+                logger.debug(f"Violation on camera {camera_id} continues event {event.event_id} ({event.frames} frames)")
+            claimed.add(id(event))
+        
+        if events:
+            self._events[camera_id] = events
+        else:
+            self._events.pop(camera_id, None)
+        return new_violations, updated_events
+    
+    def reset(self, camera_id: str):
+        """Close all open events of a camera"""
+        self._events.pop(str(camera_id), None)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get tracking statistics"""
+        detections = self.events + self.merged
+        
+        return {
+            "open_events": sum(len(events) for events in self._events.values()),
+            "events": self.events,
+            "merged": self.merged,
+            "merge_rate": round(self.merged / detections, 4) if detections else 0.0,
+            "verifications_skipped": self.verifications_skipped
+        }
\ No newline at end of file
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, HTTPException, status
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List
 from datetime import datetime
 from loguru import logger
 import json
@@ -220,6 +220,36 @@ async def broadcast_new_violation(violation_data: Dict[str, Any]):
     }
     await websocket_manager.broadcast_to_type("violations", message)
 
+async def broadcast_violation_batch(violations: List[Dict[str, Any]]):
+    """Broadcast a batch of stored violations"""
+    message = {
+        "type": "new_violations",
+        "data": {
+            "count": len(violations),
+            "violations": violations
+        }
+    }
+    await websocket_manager.broadcast_to_type("violations", message)
+
+async def broadcast_violation_updates(violations: List[Dict[str, Any]]):
+    """Broadcast stored violations changed by later frames of their event"""
+    message = {
+        "type": "violation_updates",
+        "data": {
+            "count": len(violations),
+            "violations": violations
+        }
+    }
+    await websocket_manager.broadcast_to_type("violations", message)
+
+async def broadcast_violation_report(report_data: Dict[str, Any]):
+    """Broadcast a report generated for already announced violations"""
+    message = {
+        "type": "violation_report",
+        "data": report_data
+    }
+    await websocket_manager.broadcast_to_type("violations", message)
+
 async def broadcast_camera_status_update(camera_data: Dict[str, Any]):
     """Broadcast camera status update"""
     message = {
@@ -0,0 +1,300 @@
+"""
+Local OpenAI-compatible stand-in for the Llama (Groq) and GPT-4o APIs
+
+Serves POST /chat/completions (plain and streamed) with configurable latency,
+error rates, periodic 429 bursts and canned answers, so the detection pipeline
+can be load-tested without paying the real providers.
+
+Usage (from the backend directory):
+    python -m benchmarks.mock_llm_server --port 8001 --violation-rate 0.2 --error-rate 0.01
+
+Then point the services at it:
+    LLAMA_API_URL=http://127.0.0.1:8001  OPENAI_API_URL=http://127.0.0.1:8001
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Any, Optional, List
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+DEFAULT_SCENE = {
+    "weather": "clear",
+    "lighting": "day",
+    "traffic_density": "medium",
+    "road_conditions": "good",
+    "visibility": "excellent"
+}
+
+DEFAULT_VIOLATION = {
+    "type": "red_light",
+    "severity": "high",
+    "confidence": 0.93,
+    "license_plate": "KA01AB1234",
+    "vehicle_type": "car",
+    "vehicle_color": "white",
+    "description": "Vehicle crossed the stop line while the signal was red",
+    "bounding_box": [412, 220, 780, 515],
+    "evidence_points": ["signal head shows red", "front wheels past stop line"]
+}
+
+DEFAULT_PAYLOADS = {
+    "detection": [json.dumps({"violations": [DEFAULT_VIOLATION], "scene_analysis": DEFAULT_SCENE, "overall_confidence": 0.91})],
+    "empty_detection": [json.dumps({"violations": [], "scene_analysis": DEFAULT_SCENE, "overall_confidence": 0.97})],
+    "verification": [json.dumps({
+        "verification": {
+            "confirmed_violations": [{"type": "red_light", "reasoning": "Signal clearly red"}],
+            "disputed_violations": [],
+            "additional_violations": []
+        },
+        "evidence_quality": {"overall_quality": "good", "overall_quality_score": 0.9},
+        "recommendations": {"issue_citation": True, "confidence_level": "high"}
+    })],
+    "report": [json.dumps({
+        "report_id": "RPT-MOCK",
+        "executive_summary": "Red light violation by a white car.",
+        "violation_details": {"type": "red_light", "severity": "high"},
+        "recommendations": {"enforcement_action": "Issue citation", "fine_amount": 150.0, "penalty_points": 3}
+    })],
+    "scene": [json.dumps({
+        "weather": "clear",
+        "lighting": "daylight",
+        "visibility": "excellent",
+        "road_conditions": "dry",
+        "road_infrastructure": "signal heads working, stop line clearly marked",
+        "hazards": "none"
+    })]
+}
+
+class MockLLMConfig:
+    """Behaviour of the mock server"""
+    
+    def __init__(self,
+                 llama_latency_ms: float = 800.0,
+                 gpt4o_latency_ms: float = 1500.0,
+                 latency_sigma: float = 0.35,
+                 ttfb_ratio: float = 0.3,
+                 error_rate: float = 0.0,
+                 rate_limit_rate: float = 0.0,
+                 burst_interval: float = 0.0,
+                 burst_duration: float = 0.0,
+                 violation_rate: float = 0.2,
+                 stream_chunk_chars: int = 24,
+                 payloads: Optional[Dict[str, List[str]]] = None,
+                 seed: Optional[int] = None):
+        """
+        Args:
+            llama_latency_ms / gpt4o_latency_ms: Median response time per model family
+            latency_sigma: Log-normal spread of the response time (0 = constant)
+            ttfb_ratio: Share of the response time spent before the first streamed chunk
+            error_rate: Probability of a 500 response
+            rate_limit_rate: Probability of a 429 response outside bursts
+            burst_interval / burst_duration: Every burst_interval seconds, answer 429
+                for burst_duration seconds (0 disables bursts)
+            violation_rate: Probability that a detection answer contains a violation
+            stream_chunk_chars: Characters per streamed delta
+            payloads: Canned answers by kind (detection, empty_detection, verification, report, scene)
+            seed: Random seed for reproducible runs
+        """
+        self.llama_latency_ms = llama_latency_ms
+        self.gpt4o_latency_ms = gpt4o_latency_ms
+        self.latency_sigma = latency_sigma
+        self.ttfb_ratio = ttfb_ratio
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.burst_interval = burst_interval
+        self.burst_duration = burst_duration
+        self.violation_rate = violation_rate
+        self.stream_chunk_chars = stream_chunk_chars
+        self.payloads = {**DEFAULT_PAYLOADS, **(payloads or {})}
+        self.random = random.Random(seed)
+
+def classify_request(payload: Dict[str, Any]) -> str:
+    """Tell the pipeline's prompts apart by their wording"""
+    text = ""
+    for message in payload.get("messages", []):
+        content = message.get("content")
+        if isinstance(content, str):
+            text += content
+        elif isinstance(content, list):
+            text += " ".join(part.get("text", "") for part in content if part.get("type") == "text")
+    
+    if "comprehensive traffic violation report" in text:
+        return "report"
+    if "verify and enhance" in text:
+        return "verification"
+    if "Analyze this traffic scene" in text:
+        return "scene"
+    if '"tiles"' in text:
+        return "mosaic"
+    return "detection"
+
+def mosaic_tile_count(payload: Dict[str, Any]) -> int:
+    """Number of frames tiled into a mosaic detection prompt"""
+    for message in payload.get("messages", []):
+        for part in message.get("content") or []:
+            if isinstance(part, dict) and part.get("type") == "text":
+                match = re.search(r"grid of (\d+)", part.get("text", ""))
+                if match:
+                    return int(match.group(1))
+    return 1
+
+def create_app(config: MockLLMConfig) -> FastAPI:
+    """Build the mock server app"""
+    app = FastAPI(title="Mock vision LLM")
+    started_at = time.monotonic()
+    stats = {"requests": 0, "errors": 0, "rate_limited": 0, "streamed": 0}
+    
+    def burst_remaining() -> float:
+        if config.burst_interval <= 0 or config.burst_duration <= 0:
+            return 0.0
+        phase = (time.monotonic() - started_at) % config.burst_interval
+        return max(0.0, config.burst_duration - phase)
+    
+    def latency_seconds(model: str) -> float:
+        median = config.gpt4o_latency_ms if model.startswith("gpt") else config.llama_latency_ms
+        if config.latency_sigma <= 0:
+            return median / 1000
+        return median * math.exp(config.random.gauss(0.0, config.latency_sigma)) / 1000
+    
+    def completion_content(kind: str, tiles: int = 1) -> str:
+        if kind == "mosaic":
+            # Every tile gets its own violation roll, like separate detection requests
+            return json.dumps({"tiles": [
+                {"tile": tile, **json.loads(completion_content("detection"))}
+                for tile in range(1, tiles + 1)
+            ]})
+        if kind == "detection" and config.random.random() >= config.violation_rate:
+            kind = "empty_detection"
+        return config.random.choice(config.payloads[kind])
+    
+    def usage(payload: Dict[str, Any], content: str) -> Dict[str, int]:
+        prompt_tokens = len(json.dumps(payload.get("messages", []))) // 4
+        completion_tokens = len(content) // 4
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+    
+    @app.post("/chat/completions")
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        payload = await request.json()
+        model = payload.get("model", "mock")
+        stats["requests"] += 1
+        
+        remaining = burst_remaining()
+        if remaining > 0 or config.random.random() < config.rate_limit_rate:
+            stats["rate_limited"] += 1
+            retry_after = max(1, math.ceil(remaining))
+            return JSONResponse(
+                {"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}},
+                status_code=429,
+                headers={"Retry-After": str(retry_after)}
+            )
+        
+        latency = latency_seconds(model)
+        if config.random.random() < config.error_rate:
+            stats["errors"] += 1
+            await asyncio.sleep(latency * config.ttfb_ratio)
+            return JSONResponse({"error": {"message": "Mock upstream failure", "type": "server_error"}}, status_code=500)
+        
+        content = completion_content(classify_request(payload), mosaic_tile_count(payload))
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        
+        if not payload.get("stream"):
+            await asyncio.sleep(latency)
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": usage(payload, content)
+            }
+        
+        stats["streamed"] += 1
+        chunks = [
+            content[i:i + config.stream_chunk_chars]
+            for i in range(0, len(content), config.stream_chunk_chars)
+        ]
+        chunk_delay = latency * (1 - config.ttfb_ratio) / max(1, len(chunks))
+        
+        async def event_stream():
+            await asyncio.sleep(latency * config.ttfb_ratio)
+            for chunk in chunks:
+                event = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": chunk}, "finish_reason": None}]
+                }
+                yield f"data: {json.dumps(event)}\n\n"
+                await asyncio.sleep(chunk_delay)
+            
+            final = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                "usage": usage(payload, content)
+            }
+            yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+        
+        return StreamingResponse(event_stream(), media_type="text/event-stream")
+    
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+    
+    return app
+
+def add_config_arguments(parser: argparse.ArgumentParser):
+    """CLI flags for MockLLMConfig, shared with the throughput benchmark"""
+    parser.add_argument("--llama-latency-ms", type=float, default=800.0)
+    parser.add_argument("--gpt4o-latency-ms", type=float, default=1500.0)
+    parser.add_argument("--latency-sigma", type=float, default=0.35)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--burst-interval", type=float, default=0.0, help="Seconds between 429 bursts")
+    parser.add_argument("--burst-duration", type=float, default=0.0, help="Length of each 429 burst in seconds")
+    parser.add_argument("--violation-rate", type=float, default=0.2)
+    parser.add_argument("--payloads", type=Path, help="JSON file of {kind: [answer, ...]} overriding the canned answers")
+    parser.add_argument("--seed", type=int)
+
+def config_from_args(args: argparse.Namespace) -> MockLLMConfig:
+    return MockLLMConfig(
+        llama_latency_ms=args.llama_latency_ms,
+        gpt4o_latency_ms=args.gpt4o_latency_ms,
+        latency_sigma=args.latency_sigma,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        burst_interval=args.burst_interval,
+        burst_duration=args.burst_duration,
+        violation_rate=args.violation_rate,
+        payloads=json.loads(args.payloads.read_text()) if args.payloads else None,
+        seed=args.seed
+    )
+
+def main():
+    import uvicorn
+    
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    
+    uvicorn.run(create_app(config_from_args(args)), host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
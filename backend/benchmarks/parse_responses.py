@@ -0,0 +1,113 @@
+"""
+Micro-benchmark for parsing AI responses
+
+Compares the shared structured-output parser with the previous greedy regex
+extraction over a corpus of recorded responses, and reports per-response cost
+and failure rate for each.
+
+Usage (from the backend directory):
+    python -m benchmarks.parse_responses [--corpus PATH] [--iterations N] [--scale K]
+
+The corpus is JSON lines of {"kind": "llama" | "gpt4o" | "report", "note": ..., "content": ...}.
+"""
+import argparse
+import json
+import re
+import statistics
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Callable
+
+from app.services.structured_output import (
+    llama_detection_parser,
+    gpt4o_verification_parser,
+    violation_report_parser
+)
+
+DEFAULT_CORPUS = Path(__file__).parent / "corpus" / "ai_responses.jsonl"
+
+PARSERS = {
+    "llama": llama_detection_parser,
+    "gpt4o": gpt4o_verification_parser,
+    "report": violation_report_parser
+}
+
+def legacy_parse(content: str) -> bool:
+    """The regex extraction the services used before the shared parser"""
+    json_match = re.search(r'\{.*\}', content, re.DOTALL)
+    if not json_match:
+        return False
+    try:
+        json.loads(json_match.group())
+        return True
+    except json.JSONDecodeError:
+        return False
+
+def load_corpus(path: Path, scale: int) -> List[Dict[str, Any]]:
+    """Load the corpus, optionally padding each response with K copies of prose to test long answers"""
+    entries = [json.loads(line) for line in path.read_text().splitlines() if line.strip()]
+    if scale > 1:
+        padding = "The image shows {a busy intersection} with several vehicles. " * scale
+        entries += [
+            {**entry, "note": f"{entry['note']} (x{scale} prose)", "content": padding + entry["content"] + padding}
+            for entry in list(entries)
+        ]
+    return entries
+
+def time_parser(parse: Callable[[str], bool], content: str, iterations: int) -> List[float]:
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        parse(content)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", type=Path, default=DEFAULT_CORPUS)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--scale", type=int, default=50, help="Prose padding for the long-answer variants")
+    args = parser.parse_args()
+    
+    entries = load_corpus(args.corpus, args.scale)
+    
+    print(f"{'kind':<8}{'response':<40}{'bytes':>8}{'legacy us':>12}{'legacy ok':>11}{'shared us':>12}{'shared ok':>11}")
+    totals = {"legacy": [], "shared": []}
+    failures = {"legacy": 0, "shared": 0}
+    
+    for entry in entries:
+        structured = PARSERS[entry["kind"]]
+        content = entry["content"]
+        
+        legacy_ok = legacy_parse(content)
+        shared_ok = structured.parse(content)[0] is not None
+        failures["legacy"] += not legacy_ok
+        failures["shared"] += not shared_ok
+        
+        legacy_timings = time_parser(legacy_parse, content, args.iterations)
+        shared_timings = time_parser(lambda c: structured.parse(c)[0] is not None, content, args.iterations)
+        totals["legacy"] += legacy_timings
+        totals["shared"] += shared_timings
+        
+        print(
+            f"{entry['kind']:<8}{entry['note'][:38]:<40}{len(content):>8}"
+            f"{statistics.median(legacy_timings) * 1e6:>12.1f}{str(legacy_ok):>11}"
+            f"{statistics.median(shared_timings) * 1e6:>12.1f}{str(shared_ok):>11}"
+        )
+    
+    print()
+    for name in ("legacy", "shared"):
+        timings = totals[name]
+        print(
+            f"{name:<8} p50 {percentile(timings, 50) * 1e6:8.1f}us  "
+            f"p99 {percentile(timings, 99) * 1e6:8.1f}us  "
+            f"max {max(timings) * 1e6:8.1f}us  "
+            f"failures {failures[name]}/{len(entries)}"
+        )
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
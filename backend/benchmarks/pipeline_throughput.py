@@ -0,0 +1,208 @@
+"""
+End-to-end throughput benchmark for the violation detection pipeline
+
+Starts the mock vision-LLM server in-process, points both AI services at it and
+pushes synthetic frames through ViolationDetectionService.process_batch_stream
+at each concurrency level. Reports frames/sec, p50/p95/p99 frame latency,
+memory per in-flight frame and event loop lag (how late the loop serves other
+work such as API requests and WebSocket heartbeats while frames are processed).
+
+Usage (from the backend directory):
+    python -m benchmarks.pipeline_throughput --frames 200 --concurrency 1,8,32
+    python -m benchmarks.pipeline_throughput --mosaic --concurrency 16  # Llama requests shared by 4 frames
+    python -m benchmarks.pipeline_throughput --server-url http://127.0.0.1:8001 --json results.json
+
+Frames are distinct noise images so the cache and near-duplicate gates do not
+short-circuit them; pass --keep-gates to benchmark with the gates configured
+as in settings.
+"""
+import argparse
+import asyncio
+import json
+import socket
+import statistics
+import time
+import tracemalloc
+from typing import Dict, Any, List, Optional
+
+import cv2
+import numpy as np
+
+from app.core.config import settings
+from app.services.concurrency import AdaptiveConcurrencyLimiter
+from app.services.violation_detection import ViolationDetectionService
+from benchmarks.mock_llm_server import add_config_arguments, config_from_args, create_app
+
+def make_frames(count: int, width: int, height: int, seed: int = 0) -> List[bytes]:
+    """Distinct JPEG frames of the given size"""
+    rng = np.random.default_rng(seed)
+    base = rng.integers(0, 255, (height // 8, width // 8, 3), dtype=np.uint8)
+    base = cv2.resize(base, (width, height), interpolation=cv2.INTER_LINEAR)
+    
+    frames = []
+    for i in range(count):
+        frame = base.copy()
+        # A moving block keeps frames distinct and gives the motion gate something to see
+        x = (i * 37) % (width - 200)
+        frame[height // 2:height // 2 + 120, x:x + 200] = (i * 13) % 255
+        success, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 90])
+        frames.append(buffer.tobytes())
+    return frames
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+async def start_mock_server(args: argparse.Namespace):
+    """Run the mock server on a free local port, returns (server, task, url)"""
+    import uvicorn
+    
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(
+        create_app(config_from_args(args)),
+        host="127.0.0.1",
+        port=port,
+        log_level="warning"
+    ))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    return server, task, f"http://127.0.0.1:{port}"
+
+async def measure_loop_lag(samples: List[float], interval: float = 0.01):
+    """Record how much later than asked the event loop wakes up a sleeping task"""
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(time.perf_counter() - started - interval)
+
+async def run_level(frames: List[bytes], concurrency: int, trace_memory: bool) -> Dict[str, Any]:
+    """Push all frames through a fresh pipeline at a fixed concurrency"""
+    detector = ViolationDetectionService()
+    detector.batch_limiter = AdaptiveConcurrencyLimiter(concurrency, concurrency, concurrency)
+    if detector.report_workers:
+        # Reports are still generated in the background, but not stored or announced
+        detector.report_workers.on_report = None
+    batch = [
+        (frame, {"camera_id": f"bench-{i % 8}", "location": "Benchmark St", "camera_type": "traffic_light"})
+        for i, frame in enumerate(frames)
+    ]
+    
+    if trace_memory:
+        tracemalloc.start()
+    
+    latencies = []
+    errors = 0
+    violations = 0
+    loop_lag: List[float] = []
+    lag_task = asyncio.create_task(measure_loop_lag(loop_lag))
+    started = time.perf_counter()
+    try:
+        async for result in detector.process_batch_stream(batch):
+            if not result.ok:
+                errors += 1
+                continue
+            latencies.append(result.processing_time)
+            violations += result.violations_detected
+            if "llama" in result.failed_stages:
+                errors += 1
+        elapsed = time.perf_counter() - started
+    finally:
+        lag_task.cancel()
+        peak_bytes = None
+        if trace_memory:
+            _, peak_bytes = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        await detector.close()
+    
+    return {
+        "concurrency": concurrency,
+        "frames": len(frames),
+        "seconds": round(elapsed, 3),
+        "frames_per_second": round(len(frames) / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 1) if latencies else 0.0,
+        "loop_lag_p99_ms": round(percentile(loop_lag, 99) * 1000, 1),
+        "loop_lag_max_ms": round(max(loop_lag, default=0.0) * 1000, 1),
+        "errors": errors,
+        "violations": violations,
+        "peak_kb_per_inflight_frame": round(peak_bytes / 1024 / min(concurrency, len(frames)), 1) if peak_bytes else None,
+        "pipeline": {
+            "connection_pools": detector.get_stats()["connection_pools"],
+            "batch_concurrency": detector.batch_limiter.get_stats(),
+            "mosaic_batching": detector.get_stats()["mosaic_batching"],
+            "image_workers": detector.get_stats()["image_workers"]
+        }
+    }
+
+async def run(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    server = task = None
+    url: Optional[str] = args.server_url
+    if url is None:
+        server, task, url = await start_mock_server(args)
+    
+    settings.LLAMA_API_URL = url
+    settings.OPENAI_API_URL = url
+    settings.LLAMA_API_KEY = settings.LLAMA_API_KEY or "mock"
+    settings.OPENAI_API_KEY = settings.OPENAI_API_KEY or "mock"
+    settings.AI_STREAMING_ENABLED = not args.no_stream
+    settings.MOSAIC_BATCHING_ENABLED = args.mosaic
+    # No database here - detected violations are not stored
+    settings.VIOLATION_SINK_ENABLED = False
+    if not args.keep_gates:
+        settings.DETECTION_CACHE_ENABLED = False
+        settings.FRAME_DEDUP_ENABLED = False
+        settings.MOTION_GATE_ENABLED = False
+    
+    frames = make_frames(args.frames, args.width, args.height)
+    results = []
+    try:
+        for concurrency in args.concurrency:
+            result = await run_level(frames, concurrency, not args.no_memory)
+            results.append(result)
+            print(
+                f"c={concurrency:<4} {result['frames_per_second']:>8.2f} frames/s  "
+                f"p50 {result['p50_ms']:>8.1f}ms  p95 {result['p95_ms']:>8.1f}ms  p99 {result['p99_ms']:>8.1f}ms  "
+                f"loop lag p99 {result['loop_lag_p99_ms']:>6.1f}ms  "
+                f"errors {result['errors']:>4}  "
+                f"mem/frame {result['peak_kb_per_inflight_frame'] or '-':>8} KB"
+            )
+    finally:
+        if server is not None:
+            server.should_exit = True
+            await task
+    
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--concurrency", type=lambda v: [int(c) for c in v.split(",")], default=[1, 4, 16, 32])
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--server-url", help="Use an already running mock (or real) server instead of starting one")
+    parser.add_argument("--no-stream", action="store_true", help="Disable streamed Llama responses")
+    parser.add_argument("--mosaic", action="store_true", help="Tile frames into batched Llama mosaic requests")
+    parser.add_argument("--keep-gates", action="store_true", help="Keep cache, near-duplicate and motion gates enabled")
+    parser.add_argument("--no-memory", action="store_true", help="Skip tracemalloc (it slows the pipeline down)")
+    parser.add_argument("--json", dest="json_path", help="Write the results to a JSON file for regression tracking")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    
+    results = asyncio.run(run(args))
+    
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,146 @@
+"""
+Memory and serialization cost of frame results
+
+Builds frame results from the mock server's canned answers and compares the
+previous representation - nested dicts that always carry raw_analysis - with
+FrameResult records, holding the raw provider results or (the batch default)
+releasing them. Reports bytes per held result (tracemalloc) and the time to
+serialize one result to JSON.
+
+Usage (from the backend directory):
+    python -m benchmarks.result_records [--results N] [--violations K] [--iterations N]
+"""
+import argparse
+import asyncio
+import copy
+import gc
+import json
+import statistics
+import time
+import tracemalloc
+import uuid
+from datetime import datetime
+from typing import Dict, Any, List, Tuple, Callable
+
+from app.services.detection_results import FrameResult
+from app.services.structured_output import llama_detection_parser, gpt4o_verification_parser
+from app.services.violation_detection import ViolationDetectionService
+from benchmarks.mock_llm_server import DEFAULT_PAYLOADS
+
+USAGE = {"prompt_tokens": 1450, "completion_tokens": 310, "total_tokens": 1760}
+
+def provider_results(violations: int) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Llama and GPT-4o results as the services return them for one frame"""
+    detection = json.loads(DEFAULT_PAYLOADS["detection"][0])
+    detection["violations"] = detection["violations"] * violations
+    llama_analysis = llama_detection_parser.parse(json.dumps(detection))[0].model_dump(exclude_none=True)
+    gpt4o_analysis = gpt4o_verification_parser.parse(DEFAULT_PAYLOADS["verification"][0])[0].model_dump(exclude_none=True)
+    payload = {
+        "format": "JPEG", "width": 1280, "height": 720, "original_width": 1920,
+        "original_height": 1080, "offset": [0, 0], "payload_bytes": 184320
+    }
+    
+    llama = {
+        "service": "llama-4-maverick",
+        "analysis": llama_analysis,
+        "image_metadata": {"width": 1920, "height": 1080, "format": "JPEG", "mode": "RGB", "size_bytes": 412672},
+        "payload": payload,
+        "usage": dict(USAGE),
+        "tokens_used": USAGE["total_tokens"]
+    }
+    gpt4o = {
+        "service": "gpt-4o",
+        "analysis": gpt4o_analysis,
+        "usage": dict(USAGE),
+        "tokens_used": USAGE["total_tokens"],
+        "payload": payload
+    }
+    return llama, gpt4o
+
+async def build_results(detector: ViolationDetectionService, count: int, violations: int) -> List[FrameResult]:
+    """Frame results as process_frame returns them, each with its own provider responses"""
+    llama, gpt4o = provider_results(violations)
+    results = []
+    for i in range(count):
+        frame_llama, frame_gpt4o = copy.deepcopy(llama), copy.deepcopy(gpt4o)
+        context = {
+            "camera_id": f"bench-{i % 8}",
+            "location": "Benchmark St",
+            "camera_type": "traffic_light",
+            "timestamp": datetime.utcnow().isoformat(),
+            "detection_id": str(uuid.uuid4())
+        }
+        combined = await detector._combine_analysis_results(frame_llama, frame_gpt4o, context)
+        results.append(FrameResult(
+            context["detection_id"],
+            "completed",
+            context,
+            processing_time=1.234,
+            violations_detected=len(combined.violations),
+            new_violations=len(combined.violations),
+            deadline={"budget_seconds": 30, "missed_stages": []},
+            stage_timings={"preprocess": 0.004, "llama": 0.81, "verification": 1.52, "combine": 0.0002, "total": 2.34},
+            results=combined,
+            raw_analysis={"llama": frame_llama, "gpt4o": frame_gpt4o}
+        ))
+    return results
+
+async def held_bytes(detector: ViolationDetectionService, count: int, violations: int, variant: str) -> float:
+    """Bytes per result kept alive until the batch ends"""
+    gc.collect()
+    tracemalloc.start()
+    results = await build_results(detector, count, violations)
+    if variant == "dict":
+        held = [result.to_dict(include_raw=True) for result in results]
+    else:
+        if variant == "record":
+            for result in results:
+                result.raw_analysis = None
+        held = results
+    del results
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del held
+    return current / count
+
+def time_serialization(serialize: Callable[[], str], iterations: int) -> Tuple[float, int]:
+    """Median seconds and output size of one serialization"""
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        output = serialize()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), len(output)
+
+async def run(args: argparse.Namespace):
+    detector = ViolationDetectionService()
+    try:
+        sample = (await build_results(detector, 1, args.violations))[0]
+        legacy = sample.to_dict(include_raw=True)
+        
+        variants = {
+            "dict": lambda: json.dumps(legacy),
+            "record+raw": lambda: json.dumps(sample.to_dict(include_raw=True)),
+            "record": lambda: json.dumps(sample.to_dict())
+        }
+        
+        print(f"{'variant':<12}{'bytes/result':>14}{'json us':>10}{'json bytes':>12}")
+        for variant, serialize in variants.items():
+            per_result = await held_bytes(detector, args.results, args.violations, variant)
+            seconds, size = time_serialization(serialize, args.iterations)
+            print(f"{variant:<12}{per_result:>14.0f}{seconds * 1e6:>10.1f}{size:>12}")
+    finally:
+        await detector.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--results", type=int, default=1000, help="Results held at once, as in a batch")
+    parser.add_argument("--violations", type=int, default=2, help="Violations per frame")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+    
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
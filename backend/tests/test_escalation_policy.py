@@ -0,0 +1,50 @@
+from app.services.escalation_policy import ACCEPT, DROP, ESCALATE, EscalationPolicy
+
+def make_policy(**kwargs) -> EscalationPolicy:
+    options = {"enabled": True, "accept_threshold": 0.95, "drop_threshold": 0.8, "type_thresholds": {}}
+    options.update(kwargs)
+    return EscalationPolicy(**options)
+
+def test_decide_bands():
+    policy = make_policy()
+    
+    assert policy.decide("red_light", 0.5) == DROP
+    assert policy.decide("red_light", 0.8) == ESCALATE
+    assert policy.decide("red_light", 0.94) == ESCALATE
+    assert policy.decide("red_light", 0.95) == ACCEPT
+
+def test_disabled_policy_escalates_everything_it_keeps():
+    policy = make_policy(enabled=False)
+    
+    assert policy.decide("red_light", 0.99) == ESCALATE
+    assert policy.decide("red_light", 0.5) == DROP
+
+def test_type_thresholds_override_defaults():
+    policy = make_policy(type_thresholds={"parking": {"accept": 0.85}, "no_helmet": {"drop": 0.9}})
+    
+    assert policy.thresholds("parking") == (0.8, 0.85)
+    assert policy.decide("parking", 0.86) == ACCEPT
+    assert policy.decide("no_helmet", 0.85) == DROP
+    assert policy.decide("red_light", 0.86) == ESCALATE
+
+def test_triage_counts_decisions_per_type():
+    policy = make_policy()
+    violations = [
+        {"type": "red light", "confidence": 0.97},
+        {"type": "red light", "confidence": 0.85},
+        {"type": "speeding", "confidence": "0.2"}
+    ]
+    
+    decisions = policy.triage(violations, lambda reported: reported.replace(" ", "_"))
+    
+    assert decisions == [ACCEPT, ESCALATE, DROP]
+    stats = policy.get_stats()
+    assert stats["escalated_frames"] == 1
+    assert stats["decisions"]["red_light"] == {ACCEPT: 1, ESCALATE: 1, DROP: 0}
+    assert stats["decisions"]["speeding"][DROP] == 1
+
+def test_frame_without_escalation():
+    policy = make_policy()
+    
+    assert policy.triage([{"type": "red_light", "confidence": 0.99}], lambda reported: reported) == [ACCEPT]
+    assert policy.get_stats()["escalation_rate"] == 0.0
\ No newline at end of file
@@ -0,0 +1,136 @@
+import cv2
+import numpy as np
+import pytest
+
+from app.services.image_preprocessing import PreparedFrame
+from app.services.local_detector import DetectorBackend, LocalDetection, LocalDetectorStage, StubDetector
+
+WIDTH, HEIGHT = 1000, 800
+
+def make_frame(width: int = WIDTH, height: int = HEIGHT) -> PreparedFrame:
+    image = np.full((height, width, 3), 90, dtype=np.uint8)
+    ok, encoded = cv2.imencode(".jpg", image)
+    assert ok
+    return PreparedFrame(encoded.tobytes())
+
+def make_stage(detections, **kwargs) -> LocalDetectorStage:
+    options = {
+        "relevant_classes": ["car", "truck", "person"],
+        "crop_enabled": True,
+        "crop_padding": 0.0,
+        "max_crop_ratio": 0.6,
+        "context_classes": ["traffic light", "stop sign"]
+    }
+    options.update(kwargs)
+    return LocalDetectorStage(StubDetector(detections), **options)
+
+class FailingDetector(DetectorBackend):
+    name = "failing"
+    
+    def detect(self, image):
+        raise RuntimeError("model crashed")
+
+@pytest.mark.asyncio
+async def test_road_user_escalates_frame():
+    stage = make_stage([("car", 0.9, [0.4, 0.4, 0.5, 0.5])], crop_enabled=False)
+    frame = make_frame()
+    
+    escalate, detections, ai_frame = await stage.evaluate(frame)
+    
+    assert escalate
+    assert [d.label for d in detections] == ["car"]
+    assert detections[0].box == [400, 320, 500, 400]
+    assert ai_frame is frame
+    assert stage.get_stats()["escalated"] == 1
+
+@pytest.mark.asyncio
+async def test_frame_without_road_users_is_skipped():
+    stage = make_stage([("dog", 0.9, [0.1, 0.1, 0.2, 0.2])])
+    frame = make_frame()
+    
+    escalate, detections, ai_frame = await stage.evaluate(frame)
+    
+    assert not escalate
+    assert detections == []
+    assert ai_frame is frame
+    assert stage.get_stats()["escalation_rate"] == 0.0
+
+@pytest.mark.asyncio
+async def test_context_classes_never_escalate():
+    stage = make_stage([("traffic light", 0.95, [0.1, 0.0, 0.15, 0.2]), ("stop sign", 0.9, [0.8, 0.1, 0.9, 0.2])])
+    
+    escalate, detections, _ = await stage.evaluate(make_frame())
+    
+    assert not escalate
+    assert detections == []
+
+@pytest.mark.asyncio
+async def test_crop_covers_road_users_and_context():
+    stage = make_stage([("car", 0.9, [0.4, 0.5, 0.6, 0.7]), ("traffic light", 0.9, [0.3, 0.1, 0.35, 0.2])])
+    
+    escalate, detections, ai_frame = await stage.evaluate(make_frame())
+    
+    assert escalate
+    # Only road users are reported, the light only widens the crop
+    assert [d.label for d in detections] == ["car"]
+    assert ai_frame.offset == (300, 80)
+    assert ai_frame.metadata["width"] == 300
+    assert ai_frame.metadata["height"] == 480
+    assert stage.get_stats()["cropped"] == 1
+
+def test_region_of_interest_padding_is_clamped_to_frame():
+    stage = make_stage([], crop_padding=0.5)
+    detections = [LocalDetection("car", 0.9, [50, 100, 250, 300])]
+    
+    # 200x200 box padded by 100 on each side, clamped at the left edge
+    assert stage._region_of_interest(detections, WIDTH, HEIGHT) == [0, 0, 350, 400]
+
+def test_region_of_interest_skips_large_and_tiny_regions():
+    stage = make_stage([])
+    
+    large = [LocalDetection("truck", 0.9, [0, 0, 900, 700])]
+    tiny = [LocalDetection("person", 0.9, [10, 10, 30, 30])]
+    
+    assert stage._region_of_interest(large, WIDTH, HEIGHT) is None
+    assert stage._region_of_interest(tiny, WIDTH, HEIGHT) is None
+
+def test_region_of_interest_disabled():
+    stage = make_stage([], crop_enabled=False)
+    
+    assert stage._region_of_interest([LocalDetection("car", 0.9, [100, 100, 300, 300])], WIDTH, HEIGHT) is None
+
+@pytest.mark.asyncio
+async def test_detections_of_cropped_frame_are_in_full_frame_pixels():
+    stage = make_stage([("car", 0.9, [0.0, 0.0, 0.5, 0.5])], crop_enabled=False)
+    roi_frame = make_frame().crop([200, 100, 600, 500])
+    
+    _, detections, _ = await stage.evaluate(roi_frame)
+    
+    assert detections[0].box == [200, 100, 400, 300]
+
+@pytest.mark.asyncio
+async def test_backend_error_fails_open():
+    stage = LocalDetectorStage(FailingDetector(), relevant_classes=["car"], crop_enabled=True)
+    frame = make_frame()
+    
+    escalate, detections, ai_frame = await stage.evaluate(frame)
+    
+    assert escalate
+    assert detections == []
+    assert ai_frame is frame
+    assert stage.get_stats()["errors"] == 1
+
+@pytest.mark.asyncio
+async def test_undecodable_frame_is_escalated():
+    stage = make_stage([("car", 0.9, [0.4, 0.4, 0.5, 0.5])])
+    frame = PreparedFrame(b"not an image")
+    
+    escalate, detections, ai_frame = await stage.evaluate(frame)
+    
+    assert escalate
+    assert detections == []
+    assert ai_frame is frame
+
+def test_detector_backend_is_abstract():
+    with pytest.raises(TypeError):
+        DetectorBackend()
\ No newline at end of file
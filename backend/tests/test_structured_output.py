@@ -0,0 +1,95 @@
+import json
+from pathlib import Path
+
+import pytest
+from pydantic import BaseModel
+
+from app.services import structured_output
+from app.services.structured_output import (
+    NO_JSON_ERROR,
+    StructuredOutputParser,
+    find_json_object,
+    gpt4o_verification_parser,
+    llama_detection_parser,
+    violation_report_parser
+)
+
+CORPUS = Path(__file__).resolve().parent.parent / "benchmarks" / "corpus" / "ai_responses.jsonl"
+
+PARSERS = {
+    "llama": llama_detection_parser,
+    "gpt4o": gpt4o_verification_parser,
+    "report": violation_report_parser
+}
+
+# Recorded answers that hold no complete JSON object
+UNPARSEABLE = {"truncated at max_tokens", "plain text"}
+
+class Answer(BaseModel):
+    count: int
+
+def load_corpus():
+    return [json.loads(line) for line in CORPUS.read_text().splitlines() if line.strip()]
+
+@pytest.mark.parametrize("entry", load_corpus(), ids=lambda entry: f"{entry['kind']}: {entry['note']}")
+def test_corpus_answers(entry):
+    result, error = PARSERS[entry["kind"]].parse(entry["content"])
+    
+    if entry["note"] in UNPARSEABLE:
+        assert result is None
+        assert error == NO_JSON_ERROR
+    else:
+        assert error is None
+        assert result is not None
+
+def test_fenced_json():
+    text = 'Analysis:\n```json\n{"violations": [{"type": "red_light"}]}\n```'
+    
+    assert find_json_object(text, ("violations",)) == {"violations": [{"type": "red_light"}]}
+
+def test_leading_and_trailing_text():
+    text = 'The frame shows {a busy junction}. {"violations": []} Note: {confidence} is approximate.'
+    
+    assert find_json_object(text, ("violations",)) == {"violations": []}
+
+def test_truncated_json():
+    text = '{"violations": [{"type": "red_light", "confidence": 0.9}, {"type": "over'
+    
+    assert find_json_object(text, ("violations",)) is None
+    assert llama_detection_parser.parse(text) == (None, NO_JSON_ERROR)
+
+def test_braces_inside_strings():
+    text = '{"violations": [{"description": "sign reads {STOP} } {", "type": "other"}]}'
+    
+    assert find_json_object(text)["violations"][0]["description"] == "sign reads {STOP} } {"
+
+def test_expected_keys_skip_other_objects():
+    text = '{"note": "preamble"} then {"verification": {"confirmed_violations": []}}'
+    
+    assert find_json_object(text, ("verification",)) == {"verification": {"confirmed_violations": []}}
+    assert find_json_object(text) == {"note": "preamble"}
+
+def test_no_json():
+    assert find_json_object("No violations visible in this frame.") is None
+    assert find_json_object("") is None
+
+def test_scan_budget_limits_decode_work(monkeypatch):
+    # Every '{"x": ' starts an object that only ends at the end of the answer, so each
+    # decode attempt scans the rest of it - the budget stops before the object at the end
+    text = '{"x": ' * 500 + '{"violations": []}'
+    
+    assert find_json_object(text, ("violations",)) is None
+    
+    monkeypatch.setattr(structured_output, "MAX_SCAN_FACTOR", 10 ** 6)
+    assert find_json_object(text, ("violations",)) == {"violations": []}
+
+def test_parser_counts_outcomes():
+    parser = StructuredOutputParser("test", Answer, ("count",))
+    
+    assert parser.parse('Counted: {"count": 3}')[0].count == 3
+    assert parser.parse("nothing here") == (None, NO_JSON_ERROR)
+    result, error = parser.parse('{"count": "many"}')
+    assert result is None and error.startswith("Response failed schema validation")
+    
+    stats = parser.get_stats()
+    assert (stats["parsed"], stats["no_json"], stats["invalid"]) == (1, 1, 1)
\ No newline at end of file
@@ -0,0 +1,83 @@
+from typing import Any, Dict, List
+
+import pytest
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from app.services import violation_store
+from app.services.violation_sink import ViolationSink
+
+def make_rows(count: int) -> List[Dict[str, Any]]:
+    return [{"id": f"v{i}"} for i in range(count)]
+
+class FakeDatabase:
+    """Stands in for save_violations, rejecting batches that contain a bad row"""
+    
+    def __init__(self, bad_ids=(), unavailable: bool = False, unavailable_after: int = None):
+        self.bad_ids = set(bad_ids)
+        self.unavailable = unavailable
+        self.unavailable_after = unavailable_after
+        self.calls: List[List[str]] = []
+        self.stored: List[str] = []
+    
+    async def __call__(self, rows: List[Dict[str, Any]]):
+        ids = [row["id"] for row in rows]
+        self.calls.append(ids)
+        if self.unavailable or (self.unavailable_after is not None and len(self.calls) > self.unavailable_after):
+            raise OperationalError("INSERT", {}, Exception("connection refused"))
+        if self.bad_ids.intersection(ids):
+            raise IntegrityError("INSERT", {}, Exception("duplicate key"))
+        self.stored.extend(ids)
+
+@pytest.mark.asyncio
+async def test_batch_is_written_in_one_insert(monkeypatch):
+    database = FakeDatabase()
+    monkeypatch.setattr(violation_store, "save_violations", database)
+    sink = ViolationSink(batch_size=8, flush_interval=0.05, max_pending=100)
+    
+    stored, unsent = await sink._insert(make_rows(4))
+    
+    assert [row["id"] for row in stored] == ["v0", "v1", "v2", "v3"]
+    assert unsent == []
+    assert database.calls == [["v0", "v1", "v2", "v3"]]
+    assert sink.batches == 1
+
+@pytest.mark.asyncio
+async def test_rejected_row_is_isolated_by_splitting_in_halves(monkeypatch):
+    database = FakeDatabase(bad_ids={"v2"})
+    monkeypatch.setattr(violation_store, "save_violations", database)
+    sink = ViolationSink(batch_size=8, flush_interval=0.05, max_pending=100)
+    
+    stored, unsent = await sink._insert(make_rows(5))
+    
+    assert [row["id"] for row in stored] == ["v0", "v1", "v3", "v4"]
+    assert unsent == []
+    assert database.stored == ["v0", "v1", "v3", "v4"]
+    assert sink.failed == 1
+    # [v0..v4] -> [v0, v1] + [v2, v3, v4] -> [v2] + [v3, v4]
+    assert database.calls == [["v0", "v1", "v2", "v3", "v4"], ["v0", "v1"], ["v2", "v3", "v4"], ["v2"], ["v3", "v4"]]
+
+@pytest.mark.asyncio
+async def test_unavailable_database_returns_rows_unsent(monkeypatch):
+    database = FakeDatabase(unavailable=True)
+    monkeypatch.setattr(violation_store, "save_violations", database)
+    sink = ViolationSink(batch_size=8, flush_interval=0.05, max_pending=100)
+    
+    stored, unsent = await sink._insert(make_rows(4))
+    
+    assert stored == []
+    assert [row["id"] for row in unsent] == ["v0", "v1", "v2", "v3"]
+    # Not split - every half would fail the same way
+    assert len(database.calls) == 1
+    assert sink.failed == 0
+
+@pytest.mark.asyncio
+async def test_outage_while_splitting_leaves_the_remainder_unsent(monkeypatch):
+    database = FakeDatabase(bad_ids={"v3"}, unavailable_after=1)
+    monkeypatch.setattr(violation_store, "save_violations", database)
+    sink = ViolationSink(batch_size=8, flush_interval=0.05, max_pending=100)
+    
+    stored, unsent = await sink._insert(make_rows(4))
+    
+    assert stored == []
+    assert [row["id"] for row in unsent] == ["v0", "v1", "v2", "v3"]
+    assert sink.failed == 0
\ No newline at end of file
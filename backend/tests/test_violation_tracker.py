@@ -0,0 +1,99 @@
+import pytest
+
+from app.services import violation_tracker
+from app.services.detection_results import ViolationRecord
+from app.services.escalation_policy import ACCEPT
+from app.services.violation_tracker import ViolationTracker
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(violation_tracker.time, "monotonic", clock)
+    return clock
+
+def violation(id: str, type: str = "red_light", confidence: float = 0.9, **kwargs) -> ViolationRecord:
+    return ViolationRecord(id, type, "high", confidence, **kwargs)
+
+def test_repeated_plate_joins_event(clock):
+    tracker = ViolationTracker(window=10, max_distance=1.5)
+    
+    new, updated = tracker.observe("cam", [violation("a", license_plate="KA01AB1234")], verified=True)
+    assert [v.id for v in new] == ["a"]
+    assert updated == []
+    
+    clock.now += 1
+    repeat = violation("b", license_plate="ka01 ab 1234")
+    new, updated = tracker.observe("cam", [repeat], verified=False)
+    
+    assert new == []
+    assert updated == []
+    assert repeat.id == "a"
+    assert repeat.is_repeat
+    assert repeat.event["frames"] == 2
+
+def test_later_frame_that_adds_details_updates_the_event(clock):
+    tracker = ViolationTracker(window=10, max_distance=1.5)
+    tracker.observe("cam", [violation("a", vehicle_type="car", vehicle_color="red", bounding_box=[100, 100, 200, 200])], verified=False)
+    
+    clock.now += 1
+    later = violation("b", confidence=0.95, license_plate="KA01AB1234", vehicle_type="car", vehicle_color="red",
+                      bounding_box=[120, 110, 220, 210])
+    new, updated = tracker.observe("cam", [later], verified=False)
+    
+    assert new == []
+    assert [record.id for record in updated] == ["a"]
+    assert updated[0].license_plate == "KA01AB1234"
+    assert updated[0].confidence == 0.95
+
+def test_different_type_or_camera_starts_new_event(clock):
+    tracker = ViolationTracker(window=10, max_distance=1.5)
+    tracker.observe("cam", [violation("a", license_plate="KA01AB1234")], verified=False)
+    
+    new, _ = tracker.observe("cam", [violation("b", type="overspeed", license_plate="KA01AB1234")], verified=False)
+    assert [v.id for v in new] == ["b"]
+    
+    new, _ = tracker.observe("other", [violation("c", license_plate="KA01AB1234")], verified=False)
+    assert [v.id for v in new] == ["c"]
+
+def test_event_closes_after_window(clock):
+    tracker = ViolationTracker(window=10, max_distance=1.5)
+    tracker.observe("cam", [violation("a", license_plate="KA01AB1234")], verified=False)
+    
+    clock.now += 11
+    new, _ = tracker.observe("cam", [violation("b", license_plate="KA01AB1234")], verified=False)
+    
+    assert [v.id for v in new] == ["b"]
+
+def test_two_vehicles_in_one_frame_are_two_events(clock):
+    tracker = ViolationTracker(window=10, max_distance=1.5)
+    first = violation("a", vehicle_type="car", vehicle_color="white", bounding_box=[100, 100, 200, 200])
+    second = violation("b", vehicle_type="car", vehicle_color="white", bounding_box=[130, 100, 230, 200])
+    
+    new, _ = tracker.observe("cam", [first, second], verified=False)
+    
+    assert [v.id for v in new] == ["a", "b"]
+    assert tracker.get_stats()["open_events"] == 2
+
+def test_distant_vehicle_without_plate_is_not_merged(clock):
+    tracker = ViolationTracker(window=10, max_distance=1.5)
+    tracker.observe("cam", [violation("a", bounding_box=[0, 0, 100, 100])], verified=False)
+    
+    new, _ = tracker.observe("cam", [violation("b", bounding_box=[800, 600, 900, 700])], verified=False)
+    
+    assert [v.id for v in new] == ["b"]
+
+def test_accepted_event_counts_as_decided(clock):
+    tracker = ViolationTracker(window=10, max_distance=1.5)
+    first = violation("a", license_plate="KA01AB1234")
+    first.escalation = ACCEPT
+    tracker.observe("cam", [first], verified=False)
+    
+    assert tracker.all_decided("cam", [violation("b", license_plate="KA01AB1234")])
+    assert not tracker.all_decided("cam", [violation("c", license_plate="MH02CD5678")])
\ No newline at end of file